@@ -1,7 +1,118 @@
 ﻿#include "FedmIscCore.h"
 #include <iostream>
+#include <map>
+#include <mutex>
 using namespace std;
 
+#define DEF_TABLE_SIZE 100  // размер таблицы транспондеров по умолчанию
+#define SNR_SIZE 32  // размер строки под идентификатор транспондера (с завершающим нулём)
+#define FIRST_BLOCK 0  // номер блока, с которого начинается чтение/запись
+#define BLOCK_COUNT 56  // число блоков для чтения/записи
+#define BLOCK_SIZE 4  // размер блока
+#define TAG_SIZE (BLOCK_COUNT * BLOCK_SIZE)  // объём данных одного транспондера
+
+// размеры таблиц транспондеров, заданные через set_table_size (для остальных ридеров — DEF_TABLE_SIZE)
+static std::map<FEDM_ISCReaderModule *, int> tableSizes;
+// защищает tableSizes: функции библиотеки вызываются одновременно из потоков разных COM-портов
+static std::mutex tableSizesMutex;
+
+
+/*
+Функция возвращает размер таблицы транспондеров, заданный для ридера
+*/
+static int get_table_size(FEDM_ISCReaderModule * reader)
+{
+    std::lock_guard<std::mutex> lock(tableSizesMutex);
+    std::map<FEDM_ISCReaderModule *, int>::iterator it = tableSizes.find(reader);
+    return it != tableSizes.end() ? it->second : DEF_TABLE_SIZE;
+}
+
+
+/*
+Функция подготавливает ридер к работе с метками (переводит в HostMode, задаёт размер таблицы)
+Возвращает FEDM_ERROR_NOT_CONNECTED, если ридер не подключён
+*/
+static int prepare_tag_access(FEDM_ISCReaderModule * reader)
+{
+    int rCode = FEDM_OK; // код ошибок ридера
+    int deviceID = 0; // серийный номер ридера; можно подать 0, тогда компонент подключится к первому обнаруженному ридеру
+
+    reader->ConnectUSB(deviceID);
+
+    if (!reader->IsConnected())
+    {
+        return FEDM_ERROR_NOT_CONNECTED;
+    }
+
+    reader->ReadReaderInfo();
+
+    // зачитываем полную конфигурацию
+    rCode = reader->ReadCompleteConfiguration(true);
+    std::cout << "back1: " << rCode << endl;
+
+    // переключаем ридер в HostMode (0)
+    rCode = reader->SetConfigPara(ReaderConfig::OperatingMode::Mode, 0, true);
+    std::cout << "back2: " << rCode << endl;
+
+    rCode = reader->ApplyConfiguration(true);
+    std::cout << "back3: " << rCode << endl;
+
+    // перед работой с тегами необходимо задать размер таблицы
+    rCode = reader->SetTableSize(FEDM_ISC_ISO_TABLE, get_table_size(reader));
+    std::cout << "back4: " << rCode << endl;
+
+    return FEDM_OK;
+}
+
+
+/*
+Функция возвращает обработчик транспондера ISO 15693 или NULL, если транспондер не найден
+*/
+static FedmIscTagHandler_ISO15693 * get_hf_tag(FEDM_ISCReaderModule * reader, char const * serialNumber)
+{
+    FedmIscTagHandler* tagHandler = reader->GetTagHandler(serialNumber);   // объект метки
+    std::cout << "tagHandler: " << tagHandler << endl;
+
+    if (tagHandler == NULL)
+    {
+        return NULL;
+    }
+    return dynamic_cast<FedmIscTagHandler_ISO15693*>(tagHandler);
+}
+
+
+/*
+Функция считывает данные с транспондера (ридер должен быть подготовлен функцией prepare_tag_access)
+*/
+static int read_blocks(FEDM_ISCReaderModule * reader, char const * serialNumber, unsigned char * readData)
+{
+    unsigned int blockSize = BLOCK_SIZE; // размер блока, отдается при чтении
+    FedmIscTagHandler_ISO15693* hfTag = get_hf_tag(reader, serialNumber);
+
+    if (hfTag == NULL)
+    {
+        return FEDM_ERROR_TAG_HANDLER_NOT_IDENTIFIED;
+    }
+    return hfTag->ReadMultipleBlocks(FIRST_BLOCK, BLOCK_COUNT, blockSize, readData);
+}
+
+
+/*
+Функция записывает данные на транспондер (ридер должен быть подготовлен функцией prepare_tag_access)
+*/
+static int write_blocks(FEDM_ISCReaderModule * reader, char const * serialNumber, unsigned char * writeData)
+{
+    unsigned int blockSize = BLOCK_SIZE; // размер блока
+    FedmIscTagHandler_ISO15693* hfTag = get_hf_tag(reader, serialNumber);
+
+    if (hfTag == NULL)
+    {
+        return FEDM_ERROR_TAG_HANDLER_NOT_IDENTIFIED;
+    }
+    return hfTag->WriteMultipleBlocks(FIRST_BLOCK, BLOCK_COUNT, blockSize, writeData);
+}
+
+
 extern "C"
 {
     __declspec(dllexport) FEDM_ISCReaderModule * new_reader()
@@ -15,7 +126,7 @@ extern "C"
         // установка шины адреса
         reader->SetBusAddress(bus_addr);
         // установка размера таблицы (до 100 меток во время инвентаризации в Host-Mode)
-        reader->SetTableSize(FEDM_ISC_ISO_TABLE, 100);
+        reader->SetTableSize(FEDM_ISC_ISO_TABLE, get_table_size(reader));
         // поддержка TagHandler
         reader->EnableTagHandler(true);
         // получить информацию о типе ридера
@@ -87,68 +198,116 @@ extern "C"
     }
 
 
+    /*
+    Функция задаёт размер таблицы транспондеров (максимальное количество меток за одну инвентаризацию)
+    */
+    __declspec(dllexport) int set_table_size(FEDM_ISCReaderModule * reader, int table_size)
+    {
+        int rCode = reader->SetTableSize(FEDM_ISC_ISO_TABLE, table_size);
+        if (rCode == 0)
+        {
+            std::lock_guard<std::mutex> lock(tableSizesMutex);
+            tableSizes[reader] = table_size;
+        }
+        return rCode;
+    }
+
+
+    /*
+    Функция копирует идентификаторы транспондеров из таблицы, заполненной последней инвентаризацией
+    Принимает:
+        snr_array - массив указателей на строки размером SNR_SIZE, в которые запишутся идентификаторы
+        capacity - количество строк в snr_array
+    Возвращает количество транспондеров в таблице (может превышать capacity)
+    */
+    __declspec(dllexport) int get_inventory(FEDM_ISCReaderModule * reader, unsigned char ** snr_array, int capacity)
+    {
+        CString sNR;
+        int length = reader->GetTableLength(FEDM_ISC_ISO_TABLE);
+
+        for (int idx = 0; idx < length && idx < capacity; idx++)
+        {
+            // получение строки с идентификатором транспондера
+            reader->GetTableData(idx, FEDM_ISC_ISO_TABLE, FEDM_ISC_DATA_SNR, sNR);
+            // запись идентификатора транспондера в массив
+            int i = 0;
+            for (; sNR[i] != '\0' && i < SNR_SIZE - 1; i++)
+            {
+                snr_array[idx][i] = (unsigned char)sNR[i];
+            }
+            snr_array[idx][i] = '\0';
+        }
+
+        return length;
+    }
+
+
+    /*
+    Функция ищет транспондеры в зоне действия антенны, в отличие от inventory не выходит за границы snr_array
+    Принимает:
+        snr_array - массив указателей на строки размером SNR_SIZE, в которые запишутся идентификаторы
+        capacity - количество строк в snr_array
+        tag_count - сюда запишется количество найденных транспондеров (может превышать capacity,
+                    тогда оставшиеся идентификаторы можно получить через get_inventory без повторной инвентаризации)
+    */
+    __declspec(dllexport) int inventory_ex(FEDM_ISCReaderModule * reader, unsigned char ** snr_array, int capacity, int * tag_count)
+    {
+        *tag_count = 0;
+
+        reader->SetData(FEDM_ISC_TMP_B0_CMD, (unsigned char)0x01);
+        reader->SetData(FEDM_ISC_TMP_B0_MODE, (unsigned char)0x00);
+        reader->ResetTable(FEDM_ISC_ISO_TABLE);
+        int rCode = reader->SendProtocol(0xB0);
+
+        if (rCode == 0)
+        {
+            *tag_count = get_inventory(reader, snr_array, capacity);
+        }
+
+        return rCode;
+    }
+
+
     /*
     Функция выполняет считывание данных с одного транспондера
     Принимает:
         serialNumber - идентификатор транспондера            
         readData - массив, в который будут записаны считанные данные
-        first_block - блок, с которого начинается считывание
-        amount - количество блоков, которые нужно считать
     */
      __declspec(dllexport) int read_tag(FEDM_ISCReaderModule * reader, char const * serialNumber, unsigned char * readData)
     {
-        int rCode = FEDM_OK; // код ошибок ридера
-        int deviceID = 0; // серийный номер ридера; можно подать 0, тогда компонент подключится к первому обнаруженному ридеру
-        int address = 0; // номер блока, с которого начинаем запись
-        int blockCnt = 56; // число блоков для записи
-        unsigned int blockSize = 4; // размер блока, отдается при чтении
-        FedmIscTagHandler* tagHandler = NULL;   // объект метки
+        int rCode = prepare_tag_access(reader);
 
-        reader->ConnectUSB(deviceID);
-
-        if (reader->IsConnected())
+        if (rCode == FEDM_OK)
         {
-            reader->ReadReaderInfo();
-
-            // зачитываем полную конфигурацию
-            rCode = reader->ReadCompleteConfiguration(true);
-            std::cout << "back1: " << rCode << endl;
-
-            // переключаем ридер в HostMode (0)
-            rCode = reader->SetConfigPara(ReaderConfig::OperatingMode::Mode, 0, true);
-            std::cout << "back2: " << rCode << endl;
+            rCode = read_blocks(reader, serialNumber, readData);
+        }
 
-            rCode = reader->ApplyConfiguration(true);
-            std::cout << "back3: " << rCode << endl;
+        return rCode;
+    }
 
-            // перед работой с тегами необходимо задать размер таблицы
-            rCode = reader->SetTableSize(FEDM_ISC_ISO_TABLE, 100);
-            std::cout << "back4: " << rCode << endl;
-                        
-            tagHandler = reader->GetTagHandler(serialNumber);
-            std::cout << "tagHandler: " << tagHandler << endl;
 
-            if (tagHandler != NULL)
-            {
-                if(dynamic_cast<FedmIscTagHandler_ISO15693*>(tagHandler) != NULL)
-                {
-                    // задаем временную переменную для работы с меткой
-                    FedmIscTagHandler_ISO15693* hfTag = (FedmIscTagHandler_ISO15693*)tagHandler;
-                    std::cout << "hfTag: " << hfTag << endl;
+    /*
+    Функция выполняет считывание данных с нескольких транспондеров за один вызов:
+    подготовка ридера к работе с метками производится один раз на все транспондеры
+    Принимает:
+        serialNumbers - массив идентификаторов транспондеров
+        count - количество транспондеров
+        readData - массив размером count * TAG_SIZE, в который будут записаны считанные данные
+        rCodes - массив размером count, в который будут записаны коды результатов по каждому транспондеру
+    Возвращает код ошибки подготовки ридера (при ошибке rCodes не заполняется)
+    */
+     __declspec(dllexport) int read_tags_batch(FEDM_ISCReaderModule * reader, char const ** serialNumbers, int count, unsigned char * readData, int * rCodes)
+    {
+        int rCode = prepare_tag_access(reader);
 
-                    //чтение
-                    rCode = hfTag->ReadMultipleBlocks(address, blockCnt, blockSize, readData);
-                }
-            }
-            else 
+        if (rCode == FEDM_OK)
+        {
+            for (int i = 0; i < count; i++)
             {
-                rCode = FEDM_ERROR_TAG_HANDLER_NOT_IDENTIFIED;
+                rCodes[i] = read_blocks(reader, serialNumbers[i], readData + i * TAG_SIZE);
             }
         }
-        else 
-        {
-            rCode = FEDM_ERROR_NOT_CONNECTED;
-        }
 
         return rCode;
     }
@@ -159,67 +318,46 @@ extern "C"
     Принимает:
         serialNumber - идентификатор транспондера          
         writeData - массив данных, которые будут записаны
-        first_block - блок, с которого начинается считывание
     */
      __declspec(dllexport) int write_tag(FEDM_ISCReaderModule * reader, char const * serialNumber,  unsigned char * writeData)    
     {
-        int rCode = FEDM_OK; // код ошибок ридера
-        int deviceID = 0; // серийный номер ридера; можно подать 0, тогда компонент подключится к первому обнаруженному ридеру
-        int address = 0; // номер блока, с которого начинаем запись
-        int blockCnt = 56; // число блоков для записи
-        unsigned int blockSize = 4; // размер блока, отдается при чтении
-        FedmIscTagHandler* tagHandler = NULL;   // объект метки
+        int rCode = prepare_tag_access(reader);
 
-        reader->ConnectUSB(deviceID);
-
-        if (reader->IsConnected())
+        if (rCode == FEDM_OK)
         {
-            reader->ReadReaderInfo();
-
-            //зачитываем полную конфигурацию
-            rCode = reader->ReadCompleteConfiguration(true);
-            std::cout << "back1: " << rCode << endl;
-
-            // переключаем ридер в HostMode (0)
-            rCode = reader->SetConfigPara(ReaderConfig::OperatingMode::Mode, 0, true);
-            std::cout << "back2: " << rCode << endl;
+            rCode = write_blocks(reader, serialNumber, writeData);
+        }
 
-            rCode = reader->ApplyConfiguration(true);
-            std::cout << "back3: " << rCode << endl;
+        return rCode;
+    }
 
-            //перед работой с тегами необходимо задать размер таблицы
-            rCode = reader->SetTableSize(FEDM_ISC_ISO_TABLE, 100);
-            std::cout << "back4: " << rCode << endl;
-                        
-            tagHandler = reader->GetTagHandler(serialNumber);
-            std::cout << "tagHandler: " << tagHandler << endl;
+    
+    /*
+    Функция выполняет запись данных на несколько транспондеров за один вызов:
+    подготовка ридера к работе с метками производится один раз на все транспондеры
+    Принимает:
+        serialNumbers - массив идентификаторов транспондеров
+        count - количество транспондеров
+        writeData - массив размером count * TAG_SIZE с данными для каждого транспондера
+        rCodes - массив размером count, в который будут записаны коды результатов по каждому транспондеру
+    Возвращает код ошибки подготовки ридера (при ошибке rCodes не заполняется)
+    */
+     __declspec(dllexport) int write_tags_batch(FEDM_ISCReaderModule * reader, char const ** serialNumbers, int count, unsigned char * writeData, int * rCodes)
+    {
+        int rCode = prepare_tag_access(reader);
 
-            if (tagHandler != NULL)
-            {
-                if(dynamic_cast<FedmIscTagHandler_ISO15693*>(tagHandler) != NULL)
-                {
-                    // задаем временную переменную для работы с меткой
-                    FedmIscTagHandler_ISO15693* hfTag = (FedmIscTagHandler_ISO15693*)tagHandler;
-                    std::cout << "hfTag: " << hfTag << endl;
-                        
-                    //запись
-                    rCode = hfTag->WriteMultipleBlocks(address, blockCnt, blockSize, writeData);
-                }
-            }
-            else 
+        if (rCode == FEDM_OK)
+        {
+            for (int i = 0; i < count; i++)
             {
-                rCode = FEDM_ERROR_TAG_HANDLER_NOT_IDENTIFIED;
+                rCodes[i] = write_blocks(reader, serialNumbers[i], writeData + i * TAG_SIZE);
             }
         }
-        else 
-        {
-            rCode = FEDM_ERROR_NOT_CONNECTED;
-        }
 
         return rCode;
     }
 
-    
+
     __declspec(dllexport) char * get_error_text(FEDM_ISCReaderModule * reader, int rCode)
     {
         return reader->GetErrorText(rCode);
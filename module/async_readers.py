@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Асинхронный (asyncio) интерфейс к объекту Readers
+
+Методы AsyncReaders повторяют методы Readers (с теми же параметрами и форматом ответов), но являются корутинами.
+Работа с метками выполняется в потоке-исполнителе COM-порта ридера (см. scheduler.py), поэтому ожидающий клиент
+занимает только корутину, а не отдельный поток. Управление ридерами выполняется в отдельном служебном потоке.
+
+Пример:
+    readers = AsyncReaders(timeout=5)
+    response = await readers.read_tags(reader_id='1', data=[])
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from logic import Readers, Errors
+
+__all__ = ('AsyncReaders',)
+
+
+class AsyncReaders(object):
+    """
+    Асинхронный фасад над Readers
+    Принимает:
+        - timeout (float, необяз.): время ожидания выполнения операции по умолчанию, с;
+          при его превышении возвращается ошибка Errors.OperationTimeout
+    """
+    def __init__(self, timeout: float = None):
+        self.timeout = timeout
+        # служебный поток для управления ридерами (добавление, обновление, удаление)
+        self._manager = ThreadPoolExecutor(max_workers=1, thread_name_prefix='readers-manager')
+
+    def close(self) -> None:
+        """Останавливает служебный поток"""
+        self._manager.shutdown(wait=True)
+
+    async def _wait(self, future, timeout, func_name: str, **kwargs) -> dict:
+        """Ожидает результат future; при превышении времени ожидания ещё не начатая операция отменяется"""
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            error = Errors.OperationTimeout
+            error.log_error(func_name, **kwargs)
+            return dict(error=error.to_dict())
+
+    async def _on_port(self, func, reader_id: str, timeout=None, **kwargs) -> dict:
+        """Выполняет метод Readers для ридера в потоке-исполнителе его COM-порта"""
+        try:
+            reader = Readers[reader_id]
+        except KeyError:
+            # обращения к оборудованию не будет: метод сразу вернёт ошибку Errors.ReaderNotExists
+            return func(reader_id=reader_id, **kwargs)
+        future = Readers.scheduler.submit(reader.port_number, func, reader_id=reader_id, **kwargs)
+        return await self._wait(future, timeout, func.__name__, reader_id=reader_id, **kwargs)
+
+    async def _manage(self, func, timeout=None, **kwargs) -> dict:
+        """Выполняет метод Readers в служебном потоке"""
+        future = self._manager.submit(lambda: func(**kwargs))
+        return await self._wait(future, timeout, func.__name__, **kwargs)
+
+    # УПРАВЛЕНИЕ РИДЕРАМИ
+
+    async def get_readers(self) -> dict:
+        return Readers.get_readers()
+
+    async def get_reader(self, reader_id: str) -> dict:
+        return Readers.get_reader(reader_id=reader_id)
+
+    async def add_reader(self, data: dict, timeout=None) -> dict:
+        return await self._manage(Readers.add_reader, timeout, data=data)
+
+    async def update_reader(self, reader_id: str, data: dict, timeout=None) -> dict:
+        return await self._manage(Readers.update_reader, timeout, reader_id=reader_id, data=data)
+
+    async def update_readers(self, data: dict, timeout=None) -> dict:
+        return await self._manage(Readers.update_readers, timeout, data=data)
+
+    async def delete_reader(self, reader_id: str, timeout=None) -> dict:
+        return await self._manage(Readers.delete_reader, timeout, reader_id=reader_id)
+
+    async def delete_readers(self, timeout=None) -> dict:
+        return await self._manage(Readers.delete_readers, timeout)
+
+    # РАБОТА С МЕТКАМИ
+
+    async def inventory(self, reader_id: str, timeout=None) -> dict:
+        return await self._on_port(Readers.inventory, reader_id, timeout)
+
+    async def read_tags(self, reader_id: str, data: list, max_age: float = None, timeout=None) -> dict:
+        # данные из кэша возвращаются сразу: в очередь COM-порта ставится только чтение, требующее обращения к ридеру
+        response = Readers.read_tags_cached(reader_id=reader_id, data=data, max_age=max_age)
+        if response is not None:
+            return response
+        return await self._on_port(Readers.read_tags, reader_id, timeout, data=data, max_age=max_age)
+
+    async def write_tags(self, reader_id: str, data: dict, clear=False, timeout=None) -> dict:
+        return await self._on_port(Readers.write_tags, reader_id, timeout, data=data, clear=clear)
+
+    async def inventory_all(self, timeout=None) -> dict:
+        """Возвращает идентификаторы меток со всех подключенных ридеров"""
+        reader_ids = Readers.index.connected()
+        return self._merge(reader_ids, await asyncio.gather(
+            *(self.inventory(reader_id=reader_id, timeout=timeout) for reader_id in reader_ids)
+        ))
+
+    async def read_tags_many(self, data: dict, timeout=None) -> dict:
+        """Возвращает информацию с меток нескольких ридеров (формат data — как у Readers.read_tags_many)"""
+        if not isinstance(data, dict):
+            return Readers.read_tags_many(data=data)
+        return self._merge(tuple(data), await asyncio.gather(
+            *(self.read_tags(reader_id=reader_id, data=tag_ids, timeout=timeout) for reader_id, tag_ids in data.items())
+        ))
+
+    @staticmethod
+    def _merge(reader_ids, results) -> dict:
+        """Объединяет ответы по нескольким ридерам в формат Readers._fan_out"""
+        responses = {}
+        errors = {}
+        for reader_id, result in zip(reader_ids, results):
+            if 'response' in result:
+                responses.update({reader_id: result['response']})
+            if 'error' in result:
+                errors.update({reader_id: result['error']})
+        return dict(error=errors, response=responses)
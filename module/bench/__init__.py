@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""
+Замеры производительности модуля без подключенного оборудования
+
+Вместо RFID.dll используется программная имитация (simulator.SimulatedLib) с задаваемой задержкой вызовов.
+Запуск выполняется из папки module:
+
+    python -m bench.logic_bench                         # замер методов Readers и Reader
+    python -m bench.logic_bench --save baseline.json    # сохранить результаты как базовые
+    python -m bench.logic_bench --compare baseline.json # сравнить с базовыми (код возврата 1 при ухудшении)
+    python -m bench.http_load --clients 32              # нагрузочное тестирование Web API
+
+Модули пакета:
+    - stats.py — процентили, сохранение и сравнение результатов
+    - logic_bench.py — замер методов объекта Readers (logic.py) и класса Reader (reader.py)
+    - http_load.py — нагрузочное тестирование Web API (server.py)
+"""
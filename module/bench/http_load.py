@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Нагрузочное тестирование Web API (server.py)
+
+Веб-сервер запускается в этом же процессе (WSGI-сервер Werkzeug с обработкой запросов в отдельных потоках) поверх
+программной имитации RFID.dll, либо нагрузка подаётся на уже запущенный сервер (--url). Заданное количество клиентов
+одновременно отправляет запросы в заданной пропорции (--mix) в течение --duration секунд (или до --requests запросов),
+каждый клиент использует одно постоянное соединение. По каждому виду запросов выводится количество запросов в секунду,
+процентили длительности и доля ошибок (ответы с кодом 4xx/5xx и разрывы соединения).
+
+    python -m bench.http_load --clients 32 --duration 10
+    python -m bench.http_load --mix inventory=1,read=1 --readers 8 --latency 0.005
+    python -m bench.http_load --url http://192.168.0.10:5000 --duration 30
+"""
+import argparse
+import collections
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+import urllib.parse
+
+from bench.logic_bench import BenchEnvironment
+from bench.stats import summarize, format_table, save_baseline, load_baseline, compare, DEF_TOLERANCE
+
+__all__ = ('REQUESTS', 'parse_mix', 'LocalServer', 'run_load')
+
+DEF_CLIENTS = 16  # количество одновременно работающих клиентов
+DEF_DURATION = 10.0  # длительность нагрузки, с
+DEF_MIX = 'readers=1,inventory=4,read=3,write=1,clear=1'  # пропорция видов запросов
+DEF_READERS = 4  # количество ридеров имитации
+DEF_TAGS = 20  # количество меток в поле каждого ридера имитации
+DEF_LATENCY = 0.002  # задержка каждого вызова библиотеки имитации, с
+DEF_TIMEOUT = 30.0  # время ожидания ответа, с
+TAG_DATA = 'load test data'  # данные, записываемые в метки
+
+
+# виды запросов: {название: функция (ридер, идентификаторы его меток, random.Random) -> (метод, путь, тело запроса)}
+REQUESTS = collections.OrderedDict((
+    ('readers', lambda reader_id, tag_ids, rnd: ('GET', '/readers/', None)),
+    ('inventory', lambda reader_id, tag_ids, rnd: ('GET', '/readers/{}/tags/inventory/'.format(reader_id), None)),
+    ('read', lambda reader_id, tag_ids, rnd: ('GET', '/readers/{}/tags/'.format(reader_id), [])),
+    ('read_cached', lambda reader_id, tag_ids, rnd: ('GET', '/readers/{}/tags/'.format(reader_id), list(tag_ids))),
+    ('write', lambda reader_id, tag_ids, rnd: (
+        'PUT', '/readers/{}/tags/'.format(reader_id), {rnd.choice(tag_ids): TAG_DATA} if tag_ids else {})),
+    ('clear', lambda reader_id, tag_ids, rnd: (
+        'DELETE', '/readers/{}/tags/'.format(reader_id), [rnd.choice(tag_ids)] if tag_ids else [])),
+    ('inventory_all', lambda reader_id, tag_ids, rnd: ('GET', '/readers/tags/inventory/', None)),
+    ('stats', lambda reader_id, tag_ids, rnd: ('GET', '/stats/', None)),
+))
+
+
+def parse_mix(mix: str) -> dict:
+    """Разбирает пропорцию запросов вида 'inventory=4,read=3' в {название: вес}"""
+    result = collections.OrderedDict()
+    for item in mix.split(','):
+        name, _, weight = item.strip().partition('=')
+        if name not in REQUESTS:
+            raise ValueError('неизвестный вид запроса: {} (возможные: {})'.format(name, ', '.join(REQUESTS)))
+        result[name] = float(weight or 1)
+    return result
+
+
+class LocalServer(object):
+    """
+    Веб-сервер server.py, запущенный в этом же процессе на свободном порту (используется как контекстный менеджер)
+    Ридеры — программная имитация RFID.dll (см. logic_bench.BenchEnvironment)
+    """
+    def __init__(self, readers: int = DEF_READERS, tags: int = DEF_TAGS, latency: float = DEF_LATENCY):
+        self.environment = BenchEnvironment(readers, tags, latency)
+        self.url = None
+
+    def __enter__(self):
+        from werkzeug.serving import make_server, WSGIRequestHandler
+        import server
+
+        class RequestHandler(WSGIRequestHandler):
+            def log_request(self, *args, **kwargs):
+                pass  # журнал запросов сервера искажал бы замеры
+
+        self.environment.__enter__()
+        self._server = make_server('127.0.0.1', 0, server.app, threaded=True, request_handler=RequestHandler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name='http-load-server', daemon=True)
+        self._thread.start()
+        self.url = 'http://127.0.0.1:{}'.format(self._server.server_port)
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._thread.join()
+        self._server.server_close()
+        self.environment.__exit__(*exc_info)
+
+
+class _Client(object):
+    """Клиент с постоянным соединением; при разрыве соединение открывается заново"""
+    def __init__(self, url: str, timeout: float = DEF_TIMEOUT):
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.timeout = timeout
+        self.connection = None
+
+    def request(self, method: str, path: str, body=None) -> tuple:
+        """Выполняет запрос и возвращает (код ответа, тело ответа)"""
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        headers = {}
+        if body is not None:
+            body = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        try:
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except Exception:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def _discover(url: str) -> dict:
+    """Возвращает {идентификатор подключенного ридера: идентификаторы меток в его поле}"""
+    client = _Client(url)
+    try:
+        status, body = client.request('GET', '/readers/')
+        if status != 200:
+            raise RuntimeError('GET /readers/: код ответа {}'.format(status))
+        readers = collections.OrderedDict()
+        for reader_id, settings in sorted(json.loads(body.decode('utf-8'))['response'].items()):
+            if settings['state']:
+                status, body = client.request('GET', '/readers/{}/tags/inventory/'.format(reader_id))
+                readers[reader_id] = tuple(json.loads(body.decode('utf-8')).get('response', ())) \
+                    if status == 200 else ()
+        return readers
+    finally:
+        client.close()
+
+
+def run_load(url: str, mix: dict, clients: int = DEF_CLIENTS, duration: float = DEF_DURATION,
+             requests: int = None, seed: int = 1) -> dict:
+    """
+    Подаёт нагрузку на веб-сервер
+    Принимает:
+        - url (str): адрес сервера, например http://127.0.0.1:5000
+        - mix (dict): {вид запроса: вес} (см. REQUESTS, parse_mix)
+        - clients (int): количество одновременно работающих клиентов
+        - duration (float): длительность нагрузки, с
+        - requests (int): общее количество запросов (если задано, нагрузка заканчивается по нему, а не по времени)
+        - seed (int): начальное значение генераторов случайных чисел клиентов
+    Возвращает:
+        - (dict) - {вид запроса: сводка (см. stats.summarize) с долей ошибок (error_rate)
+          и количеством ответов по кодам (statuses)}, а также сводка по всем запросам ('total')
+    """
+    readers = _discover(url)
+    if not readers:
+        raise RuntimeError('на сервере {} нет подключенных ридеров'.format(url))
+    reader_ids = tuple(readers)
+    names = tuple(mix)
+    weights = tuple(mix[name] for name in names)
+
+    lock = threading.Lock()
+    records = []  # (вид запроса, длительность, код ответа или None при разрыве соединения)
+    remaining = [requests]
+    deadline = time.perf_counter() + duration
+
+    def take() -> bool:
+        if requests is None:
+            return time.perf_counter() < deadline
+        with lock:
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def client_loop(number: int):
+        rnd = random.Random(seed + number)
+        client = _Client(url)
+        local = []
+        try:
+            while take():
+                name = rnd.choices(names, weights)[0]
+                reader_id = rnd.choice(reader_ids)
+                method, path, body = REQUESTS[name](reader_id, readers[reader_id], rnd)
+                start = time.perf_counter()
+                try:
+                    status = client.request(method, path, body)[0]
+                except Exception:
+                    status = None
+                local.append((name, time.perf_counter() - start, status))
+        finally:
+            client.close()
+            with lock:
+                records.extend(local)
+
+    threads = [threading.Thread(target=client_loop, args=(number,)) for number in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    grouped = collections.OrderedDict((name, []) for name in names + ('total',))
+    for record in records:
+        grouped[record[0]].append(record)
+        grouped['total'].append(record)
+    results = collections.OrderedDict()
+    for name, group in grouped.items():
+        errors = sum(1 for _, _, status in group if status is None or status >= 400)
+        result = summarize([latency for _, latency, _ in group], elapsed, errors)
+        result['error_rate'] = errors / len(group) if group else 0.0
+        statuses = collections.Counter('error' if status is None else str(status) for _, _, status in group)
+        result['statuses'] = dict(sorted(statuses.items()))
+        results[name] = result
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Нагрузочное тестирование Web API (server.py)')
+    parser.add_argument('--url', help='адрес запущенного сервера (по умолчанию сервер запускается в этом процессе '
+                                      'поверх имитации RFID.dll)')
+    parser.add_argument('--mix', default=DEF_MIX,
+                        help='пропорция запросов, например inventory=4,read=3 (виды: {})'.format(', '.join(REQUESTS)))
+    parser.add_argument('--clients', type=int, default=DEF_CLIENTS, help='количество одновременно работающих клиентов')
+    parser.add_argument('--duration', type=float, default=DEF_DURATION, help='длительность нагрузки, с')
+    parser.add_argument('--requests', type=int, help='общее количество запросов (вместо --duration)')
+    parser.add_argument('--readers', type=int, default=DEF_READERS, help='количество ридеров имитации')
+    parser.add_argument('--tags', type=int, default=DEF_TAGS, help='количество меток в поле ридера имитации')
+    parser.add_argument('--latency', type=float, default=DEF_LATENCY, help='задержка вызова библиотеки имитации, с')
+    parser.add_argument('--save', metavar='PATH', help='сохранить результаты как базовые')
+    parser.add_argument('--compare', metavar='PATH', help='сравнить результаты с базовыми')
+    parser.add_argument('--tolerance', type=float, default=DEF_TOLERANCE,
+                        help='допустимое ухудшение относительно базовых результатов (доля)')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    if args.url:
+        results = run_load(args.url, mix, args.clients, args.duration, args.requests)
+    else:
+        with LocalServer(args.readers, args.tags, args.latency) as server:
+            results = run_load(server.url, mix, args.clients, args.duration, args.requests)
+
+    print(format_table(results))
+    for name, result in results.items():
+        print('{:<14} ошибки: {:6.2%}   ответы: {}'.format(name, result['error_rate'], result['statuses']))
+
+    if args.save:
+        save_baseline(args.save, results, {key: value for key, value in vars(args).items()
+                                           if key not in ('save', 'compare')})
+        print('Результаты сохранены: {}'.format(args.save))
+    if args.compare:
+        regressions = compare(results, load_baseline(args.compare), args.tolerance)
+        for regression in regressions:
+            print('УХУДШЕНИЕ: ' + regression)
+        if regressions:
+            sys.exit(1)
+        print('Ухудшений относительно {} нет'.format(args.compare))
+
+
+if __name__ == '__main__':
+    main()
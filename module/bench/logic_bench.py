@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+Замер методов объекта Readers (logic.py) и класса Reader (reader.py) с программной имитацией RFID.dll
+
+Для каждого сочетания количества ридеров, количества меток на паллете и задержки вызовов библиотеки создаётся
+новый набор подключенных ридеров, после чего каждый сценарий выполняется заданное количество раз (при --clients > 1 —
+одновременно из нескольких потоков). Для каждого сценария выводится количество операций в секунду и процентили
+длительности операции.
+
+    python -m bench.logic_bench --readers 1 4 --tags 10 100 --latency 0 0.002
+    python -m bench.logic_bench --scenarios logic.read_tags reader.read_tags_batch --clients 8
+    python -m bench.logic_bench --save baseline.json
+    python -m bench.logic_bench --compare baseline.json --tolerance 0.3
+"""
+import argparse
+import collections
+import itertools
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import reader
+from logic import Readers
+from metrics import METRICS
+from reader import Reader
+from simulator import SimulatedLib
+
+from bench.stats import summarize, format_table, save_baseline, load_baseline, compare, DEF_TOLERANCE
+
+__all__ = ('BenchEnvironment', 'SCENARIOS', 'run_scenario', 'run')
+
+DEF_READERS = (1, 4, 16)  # количество ридеров
+DEF_TAGS = (10, 100)  # количество меток в поле каждого ридера
+DEF_LATENCY = (0.0, 0.002)  # задержка каждого вызова библиотеки, с
+DEF_ITERATIONS = 200  # количество операций в одном замере
+DEF_WARMUP = 10  # количество операций перед замером (не учитываются)
+DEF_PORTS = 4  # количество COM-портов, по которым распределяются ридеры
+MAX_READERS = 128  # адреса шины ридеров при update_readers меняются в пределах 0..255
+TAG_DATA = 'benchmark data ' * 4  # данные, записываемые в метки
+
+
+class BenchEnvironment(object):
+    """
+    Набор подключенных ридеров на программной имитации RFID.dll (используется как контекстный менеджер)
+    На время замера объект Readers работает с временным файлом настроек; прежние ридеры и библиотека
+    восстанавливаются при выходе
+    Принимает:
+        - readers (int): количество ридеров
+        - tags (int): количество меток в поле каждого ридера
+        - latency (float): задержка каждого вызова библиотеки, с
+        - ports (int): количество COM-портов, по которым распределяются ридеры
+    """
+    def __init__(self, readers: int, tags: int, latency: float, ports: int = DEF_PORTS):
+        if not 0 < readers <= MAX_READERS:
+            raise ValueError('количество ридеров должно быть от 1 до {}'.format(MAX_READERS))
+        self.readers = readers
+        self.tags = tags
+        self.latency = latency
+        self.ports = ports
+        self.lib = None
+        self.reader_ids = []
+        self.tag_ids = {}  # {идентификатор ридера: идентификаторы меток в его поле}
+        self.tag_data = {}  # {идентификатор ридера: {идентификатор метки: данные для записи}}
+        self.raw_readers = []  # объекты Reader для замеров без logic.py (на отдельных COM-портах)
+        self.raw_tag_ids = []
+
+    def __enter__(self):
+        self.lib = SimulatedLib(latency=self.latency, tags_per_reader=self.tags, seed=1)
+        self._prev_lib = reader.RFID_LIB
+        reader.set_backend(self.lib)
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self._prev_file = Readers.file
+        Readers.file = os.path.join(self._tmp_dir.name, 'reader_settings.ini')
+        Readers._readers = {}
+        Readers.tag_cache.invalidate()
+        METRICS.reset()
+
+        for i in range(self.readers):
+            reader_id = str(i)
+            Readers.add_reader(data={'reader_id': reader_id, 'bus_addr': i, 'port_number': i % self.ports,
+                                     'state': True})
+            self.reader_ids.append(reader_id)
+            self.tag_ids[reader_id] = Readers.inventory(reader_id=reader_id)['response']
+            self.tag_data[reader_id] = dict.fromkeys(self.tag_ids[reader_id], TAG_DATA)
+
+            raw_reader = Reader(i, 100 + i % self.ports)
+            raw_reader.connect()
+            self.raw_readers.append(raw_reader)
+            self.raw_tag_ids.append(raw_reader.inventory())
+        return self
+
+    def __exit__(self, *exc_info):
+        for reader_id in Readers:
+            Readers[reader_id].disconnect()
+        for raw_reader in self.raw_readers:
+            raw_reader.disconnect()
+        Readers.flush()
+        Readers._readers = None
+        Readers.file = self._prev_file
+        Readers.tag_cache.invalidate()
+        reader.set_backend(self._prev_lib)
+        self._tmp_dir.cleanup()
+
+    def reader_id(self, i: int) -> str:
+        """Идентификатор ридера для i-й операции (ридеры перебираются по кругу)"""
+        return self.reader_ids[i % self.readers]
+
+    def connect_all(self, state: bool) -> None:
+        for reader_id in self.reader_ids:
+            Readers.update_reader(reader_id=reader_id, data={'state': state})
+
+
+def _nothing(*args) -> None:
+    pass
+
+
+# сценарий: функция операции func(env, i) и необязательные подготовка и восстановление окружения (setup, teardown)
+# и действие после каждой операции (after), время которых не учитывается
+Scenario = collections.namedtuple('Scenario', ('func', 'setup', 'teardown', 'after'))
+
+
+def _scenario(func, setup=_nothing, teardown=_nothing, after=_nothing) -> Scenario:
+    return Scenario(func, setup, teardown, after)
+
+
+def _read_tags_cached_setup(env: BenchEnvironment) -> None:
+    for reader_id in env.reader_ids:
+        Readers.read_tags(reader_id=reader_id, data=env.tag_ids[reader_id])
+
+
+def _add_reader(env: BenchEnvironment, i: int) -> dict:
+    # адреса вне диапазона адресов ридеров окружения
+    return Readers.add_reader(data={'reader_id': 'bench{}'.format(i), 'bus_addr': i % 256,
+                                    'port_number': 1000 + i // 256})
+
+
+def _update_readers(env: BenchEnvironment, i: int) -> dict:
+    # адрес шины каждого ридера чередуется между его номером и номером + MAX_READERS, чтобы каждый вызов что-то менял
+    offset = MAX_READERS if i % 2 == 0 else 0
+    return Readers.update_readers(data={reader_id: {'bus_addr': int(reader_id) + offset}
+                                        for reader_id in env.reader_ids})
+
+
+SCENARIOS = collections.OrderedDict((
+    ('logic.get_readers', _scenario(lambda env, i: Readers.get_readers())),
+    ('logic.inventory', _scenario(lambda env, i: Readers.inventory(reader_id=env.reader_id(i)))),
+    ('logic.inventory_all', _scenario(lambda env, i: Readers.inventory_all())),
+    ('logic.read_tags', _scenario(lambda env, i: Readers.read_tags(reader_id=env.reader_id(i), data=[], max_age=0))),
+    ('logic.read_tags_cached', _scenario(
+        lambda env, i: Readers.read_tags(reader_id=env.reader_id(i), data=env.tag_ids[env.reader_id(i)]),
+        setup=_read_tags_cached_setup)),
+    ('logic.write_tags', _scenario(
+        lambda env, i: Readers.write_tags(reader_id=env.reader_id(i), data=env.tag_data[env.reader_id(i)]))),
+    ('logic.add_reader', _scenario(
+        _add_reader, after=lambda env, i: Readers.delete_reader(reader_id='bench{}'.format(i)))),
+    ('logic.update_readers', _scenario(
+        _update_readers, setup=lambda env: env.connect_all(False), teardown=lambda env: env.connect_all(True))),
+    ('reader.inventory', _scenario(lambda env, i: env.raw_readers[i % env.readers].inventory())),
+    ('reader.read_tags_batch', _scenario(
+        lambda env, i: env.raw_readers[i % env.readers].read_tags_batch(env.raw_tag_ids[i % env.readers]))),
+    ('reader.write_tags_batch', _scenario(
+        lambda env, i: env.raw_readers[i % env.readers].write_tags_batch(
+            dict.fromkeys(env.raw_tag_ids[i % env.readers], TAG_DATA)))),
+))
+
+
+def _failed(result) -> bool:
+    """Завершилась ли операция ошибкой (ответ Readers с ошибкой или код ошибки Reader)"""
+    if isinstance(result, dict):
+        return bool(result.get('error'))
+    return isinstance(result, int) and result != 0
+
+
+def run_scenario(env: BenchEnvironment, scenario: Scenario, iterations: int = DEF_ITERATIONS,
+                 clients: int = 1, warmup: int = DEF_WARMUP) -> dict:
+    """
+    Выполняет сценарий iterations раз из clients потоков и возвращает сводку (см. stats.summarize)
+    Операции прогрева нумеруются после операций замера, чтобы не пересекаться с ними по идентификаторам
+    """
+    scenario.setup(env)
+    try:
+        for i in range(iterations, iterations + warmup):
+            scenario.func(env, i)
+            scenario.after(env, i)
+
+        counter = itertools.count()
+        latencies = []
+        errors = []
+
+        def client():
+            while True:
+                i = next(counter)
+                if i >= iterations:
+                    return
+                start = time.perf_counter()
+                result = scenario.func(env, i)
+                latencies.append(time.perf_counter() - start)
+                if _failed(result):
+                    errors.append(i)
+                scenario.after(env, i)
+
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        scenario.teardown(env)
+    return summarize(latencies, elapsed, len(errors))
+
+
+def run(readers=DEF_READERS, tags=DEF_TAGS, latency=DEF_LATENCY, scenarios=None, iterations: int = DEF_ITERATIONS,
+        clients: int = 1, warmup: int = DEF_WARMUP, ports: int = DEF_PORTS, progress=None) -> dict:
+    """
+    Выполняет сценарии для всех сочетаний readers × tags × latency
+    Возвращает:
+        - (dict) - {'сценарий r=ридеры t=метки lat=задержка_мс': сводка}
+    """
+    results = collections.OrderedDict()
+    for readers_count, tags_count, latency_value in itertools.product(readers, tags, latency):
+        with BenchEnvironment(readers_count, tags_count, latency_value, ports) as env:
+            for name in scenarios or SCENARIOS:
+                key = '{} r={} t={} lat={:g}ms'.format(name, readers_count, tags_count, latency_value * 1000)
+                results[key] = run_scenario(env, SCENARIOS[name], iterations, clients, warmup)
+                if progress is not None:
+                    progress(key, results[key])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер производительности logic.py и reader.py без оборудования')
+    parser.add_argument('--readers', type=int, nargs='+', default=DEF_READERS, help='количество ридеров')
+    parser.add_argument('--tags', type=int, nargs='+', default=DEF_TAGS, help='количество меток в поле ридера')
+    parser.add_argument('--latency', type=float, nargs='+', default=DEF_LATENCY,
+                        help='задержка каждого вызова библиотеки, с')
+    parser.add_argument('--scenarios', nargs='+', choices=tuple(SCENARIOS), help='сценарии (по умолчанию все)')
+    parser.add_argument('--iterations', type=int, default=DEF_ITERATIONS, help='количество операций в замере')
+    parser.add_argument('--warmup', type=int, default=DEF_WARMUP, help='количество операций перед замером')
+    parser.add_argument('--clients', type=int, default=1, help='количество одновременно работающих потоков')
+    parser.add_argument('--ports', type=int, default=DEF_PORTS, help='количество COM-портов')
+    parser.add_argument('--no-metrics', action='store_true', help='отключить сбор метрик (см. metrics.py)')
+    parser.add_argument('--save', metavar='PATH', help='сохранить результаты как базовые')
+    parser.add_argument('--compare', metavar='PATH', help='сравнить результаты с базовыми')
+    parser.add_argument('--tolerance', type=float, default=DEF_TOLERANCE,
+                        help='допустимое ухудшение относительно базовых результатов (доля)')
+    args = parser.parse_args()
+
+    METRICS.enabled = not args.no_metrics
+    results = run(args.readers, args.tags, args.latency, args.scenarios, args.iterations, args.clients,
+                  args.warmup, args.ports, progress=lambda key, result: print('.', end='', flush=True))
+    print()
+    print(format_table(results))
+
+    if args.save:
+        save_baseline(args.save, results, {key: value for key, value in vars(args).items()
+                                           if key not in ('save', 'compare')})
+        print('Результаты сохранены: {}'.format(args.save))
+    if args.compare:
+        regressions = compare(results, load_baseline(args.compare), args.tolerance)
+        for regression in regressions:
+            print('УХУДШЕНИЕ: ' + regression)
+        if regressions:
+            sys.exit(1)
+        print('Ухудшений относительно {} нет'.format(args.compare))
+
+
+if __name__ == '__main__':
+    main()
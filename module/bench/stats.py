@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""Обработка результатов замеров: процентили, таблица результатов, сохранение и сравнение с базовыми"""
+import datetime
+import json
+import platform
+
+__all__ = ('percentile', 'summarize', 'format_table', 'save_baseline', 'load_baseline', 'compare')
+
+DEF_TOLERANCE = 0.2  # допустимое ухудшение относительно базовых результатов (доля)
+MIN_P99_DELTA = 0.1  # рост p99 меньше этой величины не считается ухудшением (погрешность таймера и планировщика), мс
+
+
+def percentile(values: list, q: float) -> float:
+    """Возвращает процентиль q (0..100) отсортированного списка values (метод ближайшего ранга)"""
+    if not values:
+        return 0.0
+    rank = max(1, -(-len(values) * q // 100))  # округление вверх
+    return values[int(rank) - 1]
+
+
+def summarize(latencies: list, elapsed: float, errors: int = 0) -> dict:
+    """
+    Возвращает сводку замера
+    Принимает:
+        - latencies (list): длительности отдельных операций, с
+        - elapsed (float): общее время замера, с
+        - errors (int): количество операций, завершившихся ошибкой
+    Возвращает:
+        - (dict) - {'ops': ..., 'errors': ..., 'ops_per_sec': ..., 'p50': ..., 'p95': ..., 'p99': ..., 'max': ...};
+          процентили — в миллисекундах
+    """
+    values = sorted(latencies)
+    return {
+        'ops': len(values),
+        'errors': errors,
+        'ops_per_sec': len(values) / elapsed if elapsed > 0 else 0.0,
+        'p50': percentile(values, 50) * 1000,
+        'p95': percentile(values, 95) * 1000,
+        'p99': percentile(values, 99) * 1000,
+        'max': (values[-1] if values else 0.0) * 1000,
+    }
+
+
+def format_table(results: dict) -> str:
+    """Возвращает результаты в виде текстовой таблицы"""
+    header = '{:<48} {:>8} {:>7} {:>11} {:>9} {:>9} {:>9}'.format(
+        'замер', 'ops', 'errors', 'ops/s', 'p50, мс', 'p95, мс', 'p99, мс')
+    lines = [header, '-' * len(header)]
+    for name, result in results.items():
+        lines.append('{:<48} {:>8} {:>7} {:>11.1f} {:>9.3f} {:>9.3f} {:>9.3f}'.format(
+            name, result['ops'], result['errors'], result['ops_per_sec'], result['p50'], result['p95'], result['p99']))
+    return '\n'.join(lines)
+
+
+def save_baseline(path: str, results: dict, params: dict = None) -> None:
+    """Сохраняет результаты в файл JSON вместе со сведениями об окружении"""
+    data = {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'params': params or {},
+        },
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def load_baseline(path: str) -> dict:
+    """Возвращает результаты из файла, сохранённого save_baseline"""
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)['results']
+
+
+def compare(results: dict, baseline: dict, tolerance: float = DEF_TOLERANCE) -> list:
+    """
+    Сравнивает результаты с базовыми
+    Ухудшением считается снижение ops/s или рост p99 больше чем на долю tolerance (для p99 — не менее MIN_P99_DELTA)
+    Возвращает:
+        - (list) - описания ухудшений (пустой список, если ухудшений нет)
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['ops_per_sec'] < base['ops_per_sec'] * (1 - tolerance):
+            regressions.append('{}: ops/s {:.1f} (было {:.1f})'.format(name, result['ops_per_sec'], base['ops_per_sec']))
+        if result['p99'] > max(base['p99'] * (1 + tolerance), base['p99'] + MIN_P99_DELTA):
+            regressions.append('{}: p99 {:.3f} мс (было {:.3f} мс)'.format(name, result['p99'], base['p99']))
+    return regressions
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш данных меток
+
+Данные метки меняются только при записи через этот же модуль, поэтому повторное чтение той же метки в течение
+короткого времени можно выполнить из памяти, не обращаясь к ридеру. TagCache хранит данные меток по ключу
+(идентификатор ридера, идентификатор метки) не дольше ttl секунд, обновляется при успешной записи и вытесняет
+давно не использованные записи, когда суммарный объём данных превышает max_bytes. Метка может находиться в поле
+разных ридеров (перемещаться между ними), поэтому запись в метку удаляет её данные, полученные через другие ридеры.
+"""
+import collections
+import threading
+import time
+
+__all__ = ('TagCache',)
+
+DEF_CACHE_TTL = 5.0  # время хранения данных метки по умолчанию, с
+DEF_CACHE_SIZE = 4 * 1024 * 1024  # объём кэша по умолчанию, байт
+ENTRY_OVERHEAD = 200  # приблизительный объём служебных данных одной записи (ключ, кортеж, узел словаря), байт
+
+
+class TagCache(object):
+    """
+    Кэш данных меток с ограничением времени хранения и объёма (вытесняются давно не использованные записи)
+    Принимает:
+        - ttl (float): время хранения данных метки, с; 0 — кэш отключён
+        - max_bytes (int): максимальный объём кэша, байт
+    """
+    def __init__(self, ttl: float = DEF_CACHE_TTL, max_bytes: int = DEF_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # {(идентификатор ридера, идентификатор метки): (данные, время записи, объём)}, порядок — от давних к новым
+        self._entries = collections.OrderedDict()
+        self._readers = {}  # {идентификатор метки: идентификаторы ридеров, через которые получены её данные}
+        self._size = 0  # текущий объём кэша, байт
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _entry_size(key: tuple, data: str) -> int:
+        return ENTRY_OVERHEAD + len(str(key[0])) + len(str(key[1])) + len(data)
+
+    def _pop(self, key: tuple) -> None:
+        self._size -= self._entries.pop(key)[2]
+        self._forget(key)
+
+    def _forget(self, key: tuple) -> None:
+        reader_ids = self._readers[key[1]]
+        reader_ids.discard(key[0])
+        if not reader_ids:
+            del self._readers[key[1]]
+
+    def get(self, reader_id: str, tag_id: str, max_age: float = None) -> str or None:
+        """
+        Возвращает данные метки, если они были получены не ранее max_age секунд назад (по умолчанию и не более — ttl)
+        Возвращает None, если данных в кэше нет или они устарели
+        """
+        max_age = self.ttl if max_age is None else min(max_age, self.ttl)
+        key = (reader_id, tag_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or max_age <= 0:
+                self.misses += 1
+                return None
+            age = time.monotonic() - entry[1]
+            if age > max_age:
+                if age > self.ttl:  # устаревшие записи удаляются при обращении к ним (см. также put)
+                    self._pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, reader_id: str, tag_id: str, data: str) -> None:
+        """Сохраняет данные метки"""
+        if self.ttl <= 0:
+            return
+        key = (reader_id, tag_id)
+        size = self._entry_size(key, data)
+        if size > self.max_bytes:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (data, now, size)
+            self._readers.setdefault(tag_id, set()).add(reader_id)
+            self._size += size
+            # вытесняются давно не использованные записи сверх объёма, а также устаревшие записи в начале очереди
+            while self._size > self.max_bytes or now - next(iter(self._entries.values()))[1] > self.ttl:
+                self._pop(next(iter(self._entries)))
+
+    def invalidate(self, reader_id: str = None, tag_id: str = None) -> None:
+        """
+        Удаляет данные из кэша
+        Без параметров — все данные, с reader_id — данные меток ридера, с tag_id — данные метки, полученные через все
+        ридеры, с reader_id и tag_id — данные метки, полученные через один ридер
+        """
+        with self._lock:
+            if reader_id is None and tag_id is not None:
+                for key in [(other_id, tag_id) for other_id in self._readers.get(tag_id, ())]:
+                    self._pop(key)
+            elif reader_id is None:
+                self._entries.clear()
+                self._readers.clear()
+                self._size = 0
+            elif tag_id is not None:
+                if (reader_id, tag_id) in self._entries:
+                    self._pop((reader_id, tag_id))
+            else:
+                for key in [key for key in self._entries if key[0] == reader_id]:
+                    self._pop(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'size': self._size,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
@@ -1,20 +1,7 @@
 # -*- coding: utf-8 -*-
 # перечень кодов ошибок и их описаний, которые могут возникнуть при работе с ридером
 # перечень получен для FEIG SDK v.Win-V4.7.0
-
-if __name__ == '__main__':
-    # примерный код для получения списка ошибок (не идеальный):
-    from collections import OrderedDict
-    from reader import Reader
-    my_reader = Reader(1, 1)
-    result = OrderedDict()
-    for i in range(0, -10000, -1):
-        _ = my_reader.get_error_text(i)
-        if 'Невалидный код ошибки' not in _:
-            result.update({i: _})
-            # print(i, my_reader.get_error_text(i))
-    print('{', *('{}: \'{}\','.format(code, msg) for code, msg in result.items()), '}', sep='\n')
-
+# файл сформирован скриптом gen_error_codes.py (для обновления перечня запустить его при подключенной RFID.dll)
 
 error_codes = {
     0: 'OK',
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Шина событий внутри процесса
+
+События (появление и пропажа меток, подключение и отключение ридеров) публикуются в EventBus один раз, а читаются
+любым количеством подписчиков. Каждому событию присваивается возрастающий номер (курсор): подписчик запоминает номер
+последнего полученного события и при следующем обращении получает только более новые события, поэтому после
+переподключения может продолжить чтение с того же места. Шина хранит ограниченное количество последних событий.
+"""
+import collections
+import threading
+import time
+
+__all__ = ('EventBus',)
+
+DEF_BUFFER_SIZE = 1000  # количество последних событий, хранящихся в шине
+
+
+class EventBus(object):
+    """
+    Кольцевой буфер событий с ожиданием новых событий
+    Принимает:
+        - capacity (int): количество последних событий, хранящихся в шине
+    """
+    def __init__(self, capacity: int = DEF_BUFFER_SIZE):
+        self._events = collections.deque(maxlen=capacity)  # события вида (номер, событие)
+        self._last_id = 0  # номер последнего опубликованного события
+        self._condition = threading.Condition()
+
+    @property
+    def cursor(self) -> int:
+        """Номер последнего опубликованного события"""
+        return self._last_id
+
+    def publish(self, event: dict) -> int:
+        """
+        Публикует событие и будит ожидающих подписчиков
+        Возвращает:
+            - (int) - номер события (добавляется в событие по ключу 'id')
+        """
+        with self._condition:
+            self._last_id += 1
+            self._events.append((self._last_id, dict(event, id=self._last_id)))
+            self._condition.notify_all()
+            return self._last_id
+
+    def _since(self, cursor: int) -> list:
+        if cursor >= self._last_id:
+            return []
+        # номера событий в буфере идут подряд, поэтому начало выборки вычисляется без перебора
+        start = max(0, len(self._events) - (self._last_id - cursor))
+        return [event for _, event in tuple(self._events)[start:]]
+
+    def get(self, cursor: int = 0, timeout: float = 0.0) -> tuple:
+        """
+        Возвращает события, опубликованные после события с номером cursor
+        Если таких событий нет, ожидает их появления не дольше timeout секунд
+        Если часть событий уже вытеснена из буфера, возвращаются все оставшиеся
+        Возвращает:
+            - (tuple) - (список событий, курсор для следующего запроса)
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            if cursor > self._last_id:  # курсор из прошлого запуска модуля
+                cursor = 0
+            while cursor >= self._last_id:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return self._since(cursor), self._last_id
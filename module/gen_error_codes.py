@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Формирование перечня кодов ошибок (error_codes.py)
+
+Перебирает коды ошибок, запрашивает их описания у RFID.dll и записывает найденные в error_codes.py.
+Во время работы модуля тексты ошибок берутся из этого перечня без обращения к библиотеке, поэтому после обновления
+FEIG SDK перечень нужно сформировать заново:
+
+    python gen_error_codes.py
+    python gen_error_codes.py --stop -5000 --output error_codes.py
+"""
+import argparse
+import ctypes
+import os
+
+from reader import get_library, _is_known_error_text
+
+HEADER = '''# -*- coding: utf-8 -*-
+# перечень кодов ошибок и их описаний, которые могут возникнуть при работе с ридером
+# перечень получен для {sdk}
+# файл сформирован скриптом gen_error_codes.py (для обновления перечня запустить его при подключенной RFID.dll)
+
+'''
+
+
+def collect(start: int = 0, stop: int = -10000) -> dict:
+    """Возвращает {код: описание} для всех кодов от start до stop (не включая), известных библиотеке"""
+    lib = get_library()
+    handle = lib.new_reader()
+    result = {}
+    for code in range(start, stop, -1 if stop < start else 1):
+        text = lib.get_error_text(handle, ctypes.c_int(code))
+        text = text.decode('ascii') if isinstance(text, bytes) else text
+        if _is_known_error_text(text):
+            result[code] = text
+    return result
+
+
+def render(codes: dict, sdk: str) -> str:
+    """Возвращает текст модуля error_codes.py"""
+    lines = []
+    for code, text in codes.items():
+        # описания записываются как есть (в том числе с символами табуляции), экранируются только кавычки
+        literal = text.replace('\\', '\\\\').replace("'", "\\'")
+        lines.append("    {}: '{}',".format(code, literal))
+    return HEADER.format(sdk=sdk) + 'error_codes = {\n' + '\n'.join(lines) + '\n}\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Формирование перечня кодов ошибок RFID.dll')
+    parser.add_argument('--start', type=int, default=0, help='первый проверяемый код')
+    parser.add_argument('--stop', type=int, default=-10000, help='код, на котором перебор останавливается')
+    parser.add_argument('--sdk', default='FEIG SDK v.Win-V4.7.0', help='версия FEIG SDK (для заголовка файла)')
+    parser.add_argument('--output', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'error_codes.py'),
+                        help='путь к формируемому файлу')
+    args = parser.parse_args()
+
+    codes = collect(args.start, args.stop)
+    with open(args.output, 'w', encoding='utf-8') as file:
+        file.write(render(codes, args.sdk))
+    print('Записано кодов ошибок: {} ({})'.format(len(codes), args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -353,7 +353,9 @@ class Application(tk.Frame):
 
         response = Readers.write_tags(reader_id=reader_id, data={tag_id: tag_data})
         if 'error' in response:
-            show_error({'error': response['error'][tag_id]})
+            error = response['error']
+            # ошибка запроса (например, некорректные данные) или ошибка записи метки
+            show_error({'error': error if 'error_code' in error else error[tag_id]})
             return
 
         messagebox.showinfo(message='Информация записана на метку')
@@ -370,7 +372,9 @@ class Application(tk.Frame):
 
         response = Readers.write_tags(reader_id=reader_id, data={tag_id: 0}, clear=True)
         if 'error' in response:
-            show_error({'error': response['error'][tag_id]})
+            error = response['error']
+            # ошибка запроса (например, некорректные данные) или ошибка записи метки
+            show_error({'error': error if 'error_code' in error else error[tag_id]})
             return
 
         self.tag_data_text.delete('0.0', tk.END)  # очищаем поле данных с метки
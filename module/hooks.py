@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Точки подключения для трассировки и профилирования
+
+Каждый уровень модуля сообщает о начале и окончании своих операций: Web API (layer='http'), методы объекта Readers
+(layer='logic', проверка параметров — операция 'check_for_errors'), методы Reader с перекодированием данных
+(layer='reader') и вызовы библиотеки (layer='library'). Для каждой операции создаётся Span с идентификатором ридера,
+названием операции, идентификатором метки, длительностью и кодом результата. Span, начатый во время выполнения
+другого, становится его дочерним (в том числе при выполнении команды в потоке COM-порта, см. scheduler.py), поэтому
+время запроса можно разложить по уровням.
+
+Функции before(span) и after(span), добавленные через HOOKS.add, вызываются в начале и в конце каждой операции.
+SpanExporter записывает завершённые операции в файл (по одному JSON-объекту на строку); при заданной переменной
+окружения RFID_TRACE_FILE он подключается автоматически (см. logic.py). Без подключённых функций каждая операция
+обходится одной проверкой флага HOOKS.enabled.
+"""
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+
+__all__ = ('Span', 'Hooks', 'SpanExporter', 'HOOKS')
+
+
+class Span(object):
+    """Операция: уровень, название, ридер, метка, время начала, длительность и код результата"""
+    __slots__ = ('span_id', 'trace_id', 'parent', 'layer', 'operation', 'reader_id', 'tag_id',
+                 'start', 'duration', 'r_code', 'error', '_started')
+
+    def __init__(self, span_id: int, parent, layer: str, operation: str, reader_id=None, tag_id=None):
+        self.span_id = span_id
+        self.parent = parent  # Span, во время выполнения которого начата операция
+        self.trace_id = parent.trace_id if parent is not None else span_id  # идентификатор корневой операции
+        self.layer = layer
+        self.operation = operation
+        self.reader_id = reader_id
+        self.tag_id = tag_id
+        self.start = time.time()  # время начала (Unix time), с
+        self.duration = None  # длительность, с (известна после окончания операции)
+        self.r_code = None  # код результата: код ошибки библиотеки или модуля, для http — код ответа
+        self.error = None  # исключение, прервавшее операцию
+        self._started = time.perf_counter()
+
+    def to_dict(self) -> dict:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent.span_id if self.parent is not None else None,
+            'layer': self.layer,
+            'operation': self.operation,
+            'reader_id': self.reader_id,
+            'tag_id': self.tag_id,
+            'start': self.start,
+            'duration': self.duration,
+            'r_code': self.r_code,
+            'error': repr(self.error) if self.error is not None else None,
+        }
+
+
+class Hooks(object):
+    """Реестр функций, вызываемых в начале (before) и в конце (after) каждой операции"""
+    def __init__(self):
+        self.enabled = False  # подключена ли хотя бы одна функция
+        self._before = ()
+        self._after = ()
+        self._lock = threading.Lock()
+        self._local = threading.local()  # текущая операция потока
+        self._ids = itertools.count(1)
+
+    def add(self, before=None, after=None) -> None:
+        """Подключает функции before(span) и after(span)"""
+        with self._lock:
+            if before is not None:
+                self._before += (before,)
+            if after is not None:
+                self._after += (after,)
+            self.enabled = bool(self._before or self._after)
+
+    def remove(self, before=None, after=None) -> None:
+        """Отключает функции, подключённые через add"""
+        with self._lock:
+            self._before = tuple(hook for hook in self._before if hook != before)
+            self._after = tuple(hook for hook in self._after if hook != after)
+            self.enabled = bool(self._before or self._after)
+
+    def current(self) -> Span or None:
+        """Возвращает операцию, выполняемую в текущем потоке"""
+        return getattr(self._local, 'span', None)
+
+    def start(self, layer: str, operation: str, reader_id=None, tag_id=None) -> Span:
+        """Начинает операцию в текущем потоке и вызывает функции before"""
+        span = Span(next(self._ids), self.current(), layer, operation, reader_id, tag_id)
+        self._local.span = span
+        self._call(self._before, span)
+        return span
+
+    def finish(self, span: Span, r_code=None, error: BaseException = None) -> None:
+        """Завершает операцию, начатую через start, и вызывает функции after"""
+        span.duration = time.perf_counter() - span._started
+        span.r_code = r_code
+        span.error = error
+        self._local.span = span.parent
+        self._call(self._after, span)
+
+    def call(self, layer: str, operation: str, reader_id, tag_id, r_code, func, args: tuple = (),
+             kwargs: dict = None):
+        """
+        Выполняет func(*args, **kwargs) как операцию (между start и finish) и возвращает её результат
+        Принимает:
+            - layer, operation, reader_id, tag_id: параметры операции (см. Span)
+            - r_code: функция, возвращающая код результата по результату func
+            - func: функция, args (tuple) и kwargs (dict) - её параметры (передаются отдельно, так как среди них
+              может быть reader_id)
+        """
+        span = self.start(layer, operation, reader_id, tag_id)
+        try:
+            result = func(*args, **(kwargs or {}))
+        except BaseException as e:
+            self.finish(span, error=e)
+            raise
+        self.finish(span, r_code(result))
+        return result
+
+    def attach(self, span: Span or None):
+        """Делает span текущей операцией потока до выхода из блока with (для команд, выполняемых в другом потоке)"""
+        return _Attached(self, span)
+
+    @staticmethod
+    def _call(hooks: tuple, span: Span) -> None:
+        for hook in hooks:
+            try:
+                hook(span)
+            except Exception:
+                logging.exception('[hooks] ошибка в функции трассировки %r', hook)
+
+
+class _Attached(object):
+    __slots__ = ('_hooks', '_span', '_previous')
+
+    def __init__(self, hooks: Hooks, span: Span or None):
+        self._hooks = hooks
+        self._span = span
+
+    def __enter__(self):
+        self._previous = self._hooks.current()
+        self._hooks._local.span = self._span
+
+    def __exit__(self, *exc_info):
+        self._hooks._local.span = self._previous
+
+
+class SpanExporter(object):
+    """
+    Записывает завершённые операции в файл по одному JSON-объекту на строку
+    Запись выполняется в фоновом потоке, поэтому не задерживает операции с ридерами
+    Использование:
+        exporter = SpanExporter('trace.jsonl')
+        HOOKS.add(after=exporter)
+        ...
+        HOOKS.remove(after=exporter)
+        exporter.close()
+    Принимает:
+        - path (str): путь к файлу (записи добавляются в конец файла)
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='span-exporter', daemon=True)
+        self._thread.start()
+
+    def __call__(self, span: Span) -> None:
+        self._queue.put(span)
+
+    def _run(self) -> None:
+        with open(self.path, 'a', encoding='utf-8') as file:
+            while True:
+                span = self._queue.get()
+                if span is None:  # сигнал завершения работы
+                    break
+                file.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + '\n')
+                if self._queue.empty():
+                    file.flush()
+
+    def close(self) -> None:
+        """Записывает операции, ожидающие в очереди, и закрывает файл"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+HOOKS = Hooks()
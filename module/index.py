@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Индексы реестра ридеров
+
+ReaderIndex поддерживает в актуальном состоянии ответы на частые вопросы о ридерах — какие ридеры подключены,
+какие ридеры используют COM-порт, есть ли ридер с данным адресом — без перебора всех ридеров. Индексы обновляются
+при добавлении, удалении и переименовании ридеров, а также при изменении состояния и адреса самого ридера
+(ридер сообщает об этом через атрибут observer, см. reader.Reader). Идентификатор, под которым ридер добавлен
+в индексы, записывается в атрибут ридера reader_id (используется в метриках).
+"""
+import threading
+
+__all__ = ('ReaderIndex',)
+
+
+class ReaderIndex(object):
+    """Индексы ридеров: подключенные ридеры, ридеры по номеру COM-порта и по адресу (номер порта, адрес шины)"""
+    def __init__(self):
+        self._ids = {}  # {Reader: идентификатор ридера}
+        self._connected = set()  # идентификаторы подключенных ридеров
+        self._by_port = {}  # {номер порта: {идентификатор ридера, ...}}
+        self._by_address = {}  # {(номер порта, адрес шины): {идентификатор ридера, ...}}
+        self._lock = threading.RLock()
+
+    # ОБНОВЛЕНИЕ ИНДЕКСОВ
+
+    @staticmethod
+    def _link(index: dict, key, reader_id: str) -> None:
+        index.setdefault(key, set()).add(reader_id)
+
+    @staticmethod
+    def _unlink(index: dict, key, reader_id: str) -> None:
+        reader_ids = index.get(key)
+        if reader_ids is not None:
+            reader_ids.discard(reader_id)
+            if not reader_ids:
+                del index[key]
+
+    def _attach(self, reader_id: str, reader) -> None:
+        self._ids[reader] = reader_id
+        if reader.connected:
+            self._connected.add(reader_id)
+        self._link(self._by_port, reader.port_number, reader_id)
+        self._link(self._by_address, (reader.port_number, reader.bus_addr), reader_id)
+
+    def _detach(self, reader_id: str, reader) -> None:
+        self._ids.pop(reader, None)
+        self._connected.discard(reader_id)
+        self._unlink(self._by_port, reader.port_number, reader_id)
+        self._unlink(self._by_address, (reader.port_number, reader.bus_addr), reader_id)
+
+    def add(self, reader_id: str, reader) -> None:
+        """Добавляет ридер в индексы (ридер, ранее добавленный под другим идентификатором, переносится)"""
+        with self._lock:
+            if reader in self._ids:
+                self._detach(self._ids[reader], reader)
+            self._attach(reader_id, reader)
+            reader.observer = self._on_change
+            reader.reader_id = reader_id
+
+    def remove(self, reader_id: str, reader) -> None:
+        """Удаляет ридер из индексов"""
+        with self._lock:
+            if self._ids.get(reader) == reader_id:
+                self._detach(reader_id, reader)
+                reader.observer = None
+                reader.reader_id = None
+
+    def reset(self, readers: dict) -> None:
+        """Перестраивает индексы по словарю ридеров"""
+        with self._lock:
+            for reader in self._ids:
+                reader.observer = None
+                reader.reader_id = None
+            self._ids = {}
+            self._connected = set()
+            self._by_port = {}
+            self._by_address = {}
+            for reader_id, reader in readers.items():
+                self.add(reader_id, reader)
+
+    def _on_change(self, reader, attr: str, old, new) -> None:
+        """Вызывается ридером при изменении атрибута connected, port_number или bus_addr"""
+        with self._lock:
+            reader_id = self._ids.get(reader)
+            if reader_id is None:
+                return
+            if attr == 'connected':
+                if new:
+                    self._connected.add(reader_id)
+                else:
+                    self._connected.discard(reader_id)
+                return
+            port_number, bus_addr = reader.port_number, reader.bus_addr
+            if attr == 'port_number':
+                self._unlink(self._by_port, old, reader_id)
+                self._link(self._by_port, new, reader_id)
+                self._unlink(self._by_address, (old, bus_addr), reader_id)
+            else:
+                self._unlink(self._by_address, (port_number, old), reader_id)
+            self._link(self._by_address, (port_number, bus_addr), reader_id)
+
+    # ЗАПРОСЫ
+
+    def any_connected(self) -> bool:
+        return bool(self._connected)
+
+    def connected(self) -> tuple:
+        """Идентификаторы подключенных ридеров"""
+        with self._lock:
+            return tuple(self._connected)
+
+    def on_port(self, port_number: int) -> tuple:
+        """Идентификаторы ридеров, использующих COM-порт"""
+        with self._lock:
+            return tuple(self._by_port.get(port_number, ()))
+
+    def ports(self) -> dict:
+        """{номер порта: идентификаторы ридеров}"""
+        with self._lock:
+            return {port_number: tuple(reader_ids) for port_number, reader_ids in self._by_port.items()}
+
+    def at_address(self, port_number: int, bus_addr: int) -> tuple:
+        """Идентификаторы ридеров с данным адресом (номер порта, адрес шины)"""
+        with self._lock:
+            return tuple(self._by_address.get((port_number, bus_addr), ()))
@@ -1,39 +1,177 @@
 # -*- coding: utf-8 -*-
+import atexit
 import configparser as cp
+import functools
 import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from reader import Reader
+from cache import TagCache, DEF_CACHE_TTL, DEF_CACHE_SIZE
+from events import EventBus
+from hooks import HOOKS, SpanExporter
+from index import ReaderIndex
+from logs import setup_logging, CallArgs, DEF_REPEAT_INTERVAL
+from metrics import METRICS
+from reader import Reader, DEF_TABLE_SIZE, TAG_SIZE, TAG_ID_SIZE
+from scanner import InventoryScanner, DEF_SCAN_INTERVAL, DEF_MISSED_ROUNDS
+from scheduler import PortScheduler
+from singleflight import SingleFlight
 
 __all__ = ('Readers',)
 
-# конфигурация логирования
-# "[MODULE] LEVEL: 0000-00-00 00:00:00,000   MSG"
-logging.basicConfig(format='[%(module)s] %(levelname)s: %(asctime)-15s   %(message)s', level=logging.WARNING)
+DEF_SAVE_DELAY = 1.0  # задержка записи изменённых настроек ридеров в файл по умолчанию, с
 
+# конфигурация логирования (см. logs.py): запись в фоновом потоке, повторы одной ошибки объединяются
+# "[MODULE] LEVEL: 0000-00-00 00:00:00,000   MSG" или JSON при RFID_LOG_FORMAT=json
+setup_logging(level=logging.WARNING, json_format=os.environ.get('RFID_LOG_FORMAT') == 'json',
+              repeat_interval=float(os.environ.get('RFID_LOG_REPEAT_INTERVAL', DEF_REPEAT_INTERVAL)))
 
-def check_for_errors(*errors):
+# запись операций всех уровней (Web API, Readers, Reader, библиотека) в файл для анализа задержек (см. hooks.py)
+if os.environ.get('RFID_TRACE_FILE'):
+    _span_exporter = SpanExporter(os.environ['RFID_TRACE_FILE'])
+    HOOKS.add(after=_span_exporter)
+    atexit.register(_span_exporter.close)
+
+
+def compile_validator(checks) -> callable:
+    """
+    Собирает проверки в одну функцию один раз (при объявлении метода), а не при каждом вызове
+    Принимает:
+        - checks (iterable): ошибки (Errors.Error), пары (путь к параметру, ошибка)
+          или тройки (путь к параметру, ошибка, функция проверки вместо error.check);
+          путь — кортеж: () — проверка без параметров, ('param',) — параметр метода,
+          ('param', 'key') — значение по ключу key словаря, переданного в параметре param;
+          None — функция проверки получает все параметры (для проверок, зависящих от нескольких параметров).
+          Для ошибки без пути используется её параметр (error.param).
+          Проверка по пути выполняется, только если параметр (ключ) передан
+    Возвращает:
+        - функцию, принимающую словарь параметров (kwargs) и возвращающую первую найденную ошибку или None
+    """
+    compiled = []
+    for check in checks:
+        if not isinstance(check, tuple):
+            check = ((check.param,) if check.param else (), check)
+        path, error, func = check if len(check) == 3 else check + (check[1].check,)
+        compiled.append((_compile_check(path, func), error))
+    compiled = tuple(compiled)
+
+    def validate(kwargs: dict):
+        for check, error in compiled:
+            if check(kwargs):
+                return error
+        return None
+    return validate
+
+
+def _compile_check(path: tuple, check) -> callable:
+    if path is None:
+        return check
+    if len(path) == 0:
+        return lambda kwargs: check()
+    if len(path) == 1:
+        param, = path
+        return lambda kwargs: param in kwargs and check(kwargs[param])
+    param, key = path
+    return lambda kwargs: param in kwargs and isinstance(kwargs[param], dict) and key in kwargs[param] \
+        and check(kwargs[param][key])
+
+
+def check_for_errors(*errors, schema=()):
     """
     Декоратор для проверки наличия ошибок во время работы с RFID
     Применяется только к методам
 
     Принимает:
-        - *errors (Errors.Error): ошибки, на которые необходимо провести проверку
+        - *errors (Errors.Error или пара (путь к параметру, Errors.Error)): ошибки, на которые необходимо провести
+          проверку и которые требуют обращения к ридерам (см. compile_validator)
+        - schema (tuple): проверки переданных данных без обращения к ридерам; выполняются первыми
+    Проверки данных доступны отдельно через атрибут validate декорированного метода:
+    Readers.add_reader.validate(data=...) возвращает словарь с ошибкой или None
     """
     # WARN для верной работы декоратора необходимо всегда указывать названия параметров при вызове декорируемых методов
+    validate_schema = compile_validator(schema)
+    validate = compile_validator(schema + errors)
+
     def check_decorator(func):
-        def wrapper(self, *args, **kwargs):  # указан self, так как декоратор применяется к методам
-            for error in errors:
-                if len(args) > 0:
-                    Errors.ArgsWithoutKeywords.log_error(func.__name__, *args, **kwargs)
-                if (error.param is None and error.check()) \
-                        or (error.param in kwargs and error.check(kwargs[error.param])):
-                    error.log_error(func.__name__, *args, **kwargs)
-                    return dict(error=error.to_dict())
+        def checked(self, *args, **kwargs):
+            if args:
+                Errors.ArgsWithoutKeywords.log_error(func.__name__, *args, **kwargs)
+            if HOOKS.enabled:
+                error = HOOKS.call('logic', 'check_for_errors', kwargs.get('reader_id'), None,
+                                   lambda e: e.code if e is not None else 0, validate, (kwargs,))
+            else:
+                error = validate(kwargs)
+            if error is not None:
+                error.log_error(func.__name__, *args, **kwargs)
+                return dict(error=error.to_dict())
             return func(self, *args, **kwargs)
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):  # указан self, так как декоратор применяется к методам
+            if HOOKS.enabled:
+                return HOOKS.call('logic', func.__name__, kwargs.get('reader_id'), None, _response_code,
+                                  checked, (self,) + args, kwargs)
+            return checked(self, *args, **kwargs)
+
+        def validate_request(**kwargs) -> dict or None:
+            """Проверяет переданные данные, не обращаясь к ридерам"""
+            error = validate_schema(kwargs)
+            if error is None:
+                return None
+            error.log_error(func.__name__, **kwargs)
+            return dict(error=error.to_dict())
+
+        wrapper.validate = validate_request
         return wrapper
     return check_decorator
 
 
+def _response_code(result) -> int:
+    """
+    Код результата метода Readers для трассировки: код ошибки или 0
+    Для ответов по нескольким ридерам (меткам) — код первой ошибки
+    """
+    error = result.get('error') if isinstance(result, dict) else None
+    while isinstance(error, dict) and error and 'error_code' not in error:
+        error = next(iter(error.values()))
+    return error['error_code'] if isinstance(error, dict) and 'error_code' in error else 0
+
+
+def _is_tag_id(tag_id) -> bool:
+    """Проверяет идентификатор метки: непустая ASCII-строка, помещающаяся в буфер под идентификатор"""
+    if not isinstance(tag_id, str) or not 0 < len(tag_id) < TAG_ID_SIZE:
+        return False
+    try:
+        tag_id.encode('ascii')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def _is_tag_data(tag_data) -> bool:
+    """Проверяет данные для записи в метку: строка в кодировке CP866, помещающаяся в метку"""
+    if not isinstance(tag_data, str) or len(tag_data) > TAG_SIZE:
+        return False
+    try:
+        tag_data.encode('cp866')
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+def _is_invalid_write(kwargs: dict) -> bool:
+    """
+    Проверка параметров write_tags: для записи (не очистки) нужны данные меток {идентификатор_метки: данные};
+    при очистке значения словаря не используются и не проверяются
+    """
+    data = kwargs.get('data')
+    return not kwargs.get('clear') and (not isinstance(data, dict) or not all(map(_is_tag_data, data.values())))
+
+
 class Errors:
     """Вспомогательный объект для хранения возникающих ошибок (кодов и описаний)"""
     # TODO попытаться привести к более красивому виду
@@ -56,18 +194,19 @@ class Errors:
             """
             Производит логирование ошибки с использованием специального шаблона
             Шаблон: [func_name(params)] msg
+            Сообщение формируется не при вызове, а при выводе в фоновом потоке (см. logs.py);
+            повторы ошибки с тем же кодом для того же ридера и функции объединяются
             Принимает:
                 - func_name (str): имя функции, в которой произошла ошибка
                 - *args, **kwargs: данные, которые привели к ошибке
             """
-            result = '[{}({})] {}'.format(
-                func_name,
-                ', '.join(tuple(map(repr, args)))
-                + (', ' if args and kwargs else '')
-                + ', '.join(tuple(map(lambda k: '{}={!r}'.format(k, kwargs[k]), kwargs))),
-                self.msg
-            )
-            logging.warning(result)
+            if not logging.root.isEnabledFor(logging.WARNING):
+                return
+            logging.warning('[%s(%s)] %s', func_name, CallArgs(args, kwargs), self.msg, extra={
+                'func_name': func_name,
+                'error_code': self.code,
+                'reader_id': kwargs.get('reader_id'),
+            })
 
         def auto_check(self, func_name, *args):
             """
@@ -90,7 +229,8 @@ class Errors:
     )
     InvalidParameterSet = Error(
         1, 'Некорректный набор параметров',
-        'data', lambda x: not all(map(lambda i: i in x, ('reader_id', 'bus_addr', 'port_number'))))
+        'data', lambda x: not isinstance(x, dict)
+        or not all(map(lambda i: i in x, ('reader_id', 'bus_addr', 'port_number'))))
     InvalidReaderId = Error(
         2, 'Некорректное значение идентификатора ридера',
         'reader_id', lambda x: not isinstance(x, str)
@@ -105,9 +245,11 @@ class Errors:
         5, 'Некорректное значение параметра состояния ридера',
         'state', lambda x: not isinstance(x, bool))
     InvalidTagId = Error(
-        6, 'Некорректное значение идентификатора метки')
+        6, 'Некорректное значение идентификатора метки',
+        'data', lambda x: not isinstance(x, (list, tuple, dict)) or not all(map(_is_tag_id, x)))
     InvalidTagData = Error(
-        7, 'Некорректное значение данных для записи в метку')
+        7, 'Некорректное значение данных для записи в метку',
+        'data', lambda x: isinstance(x, dict) and not all(map(_is_tag_data, x.values())))
     ReaderExists = Error(
         8, 'Ридер с данным идентификатором существует',
         'reader_id', lambda x: x in Readers)
@@ -122,31 +264,128 @@ class Errors:
         'reader_id', lambda x: Readers[x].connected is False)
     OneOrMoreReadersAreConnected = Error(
         12, 'Операция не может совершена, так как один или больше ридеров подключены',
-        None, lambda: not all(map(lambda rid: Readers[rid].connected is False, Readers)))
+        None, lambda: Readers.index.any_connected())
     ReadersListAlreadyIsEmpty = Error(
         13, 'Список ридеров уже пуст',
         None, lambda: len(Readers) == 0)
+    OperationTimeout = Error(
+        14, 'Превышено время ожидания выполнения операции')
+    InvalidScanParameters = Error(
+        15, 'Некорректные параметры фонового сканирования',
+        'data', lambda x: not isinstance(x, dict)
+        or not isinstance(x.get('interval', DEF_SCAN_INTERVAL), (int, float))
+        or isinstance(x.get('interval', DEF_SCAN_INTERVAL), bool)
+        or not x.get('interval', DEF_SCAN_INTERVAL) > 0
+        or not isinstance(x.get('missed_rounds', DEF_MISSED_ROUNDS), int)
+        or isinstance(x.get('missed_rounds', DEF_MISSED_ROUNDS), bool)
+        or not x.get('missed_rounds', DEF_MISSED_ROUNDS) >= 1)
+    ReaderAddressIsUsed = Error(
+        16, 'Ридер с данными номером порта и адресом шины существует',
+        'data', lambda x: len(Readers.index.at_address(x['port_number'], x['bus_addr'])) > 0)
     # ошибка для внутренней работы (только для вывода в лог)
     # TODO если работа будет осуществляться не через WebAPI, то должно быть передано: передавать в любом случае?
     ArgsWithoutKeywords = Error(
         100, 'Вызван метод без указания названий параметров, что может привести к неверной работе')
 
 
+# схемы проверки данных запросов (без обращения к ридерам), см. check_for_errors
+READER_SCHEMA = (
+    (('data', 'reader_id'), Errors.InvalidReaderId),
+    (('data', 'bus_addr'), Errors.InvalidReaderBusAddr),
+    (('data', 'port_number'), Errors.InvalidReaderPortNumber),
+    (('data', 'state'), Errors.InvalidReaderState),
+)
+READER_UPDATE_SCHEMA = (
+    # в запросе должен быть хотя бы один параметр на обновление
+    (('data',), Errors.InvalidParameterSet,
+     lambda x: not isinstance(x, dict)
+     or all(map(lambda i: i not in x, ('reader_id', 'bus_addr', 'port_number', 'state')))),
+) + READER_SCHEMA
+validate_reader_update = compile_validator(READER_UPDATE_SCHEMA)
+READ_TAGS_SCHEMA = (
+    # None или пустой список — считывание с меток, находящихся в зоне действия антенны
+    (('data',), Errors.InvalidTagId, lambda x: x is not None and Errors.InvalidTagId.check(x)),
+    (('max_age',), Errors.InvalidRequest,
+     lambda x: x is not None and (not isinstance(x, (int, float)) or isinstance(x, bool)
+                                  or not math.isfinite(x) or x < 0)),
+)
+
+
 class _Readers:
     """Хранение настроек ридеров и их состояний"""
     def __init__(self):
-        self.file = 'reader_settings.ini'  # путь к файлу с настройками ридеров
+        self.file = os.environ.get('RFID_SETTINGS', 'reader_settings.ini')  # путь к файлу с настройками ридеров
         # вид поля _readers:
         # {'идентификатор_ридера': Reader(1, 1),
         # ...}
-        self._readers = {}
-        self._read_settings()  # чтение настроек из файла при инициализации
+        # WARN: словарь ридеров никогда не изменяется на месте: при каждом изменении создаётся новый словарь
+        # (copy-on-write), поэтому чтение не требует блокировок, а изменения выполняются под _write_lock
+        self._readers_cache = None  # настройки читаются из файла при первом обращении к ридерам
+        self._write_lock = threading.RLock()
+        # индексы ридеров (подключенные, по COM-порту, по адресу); обновляются вместе со словарём ридеров
+        self._index = ReaderIndex()
+        # изменённые настройки записываются в файл не сразу, а в фоне через save_delay секунд (0 — сразу), чтобы
+        # несколько изменений подряд приводили к одной записи; при завершении работы запись выполняется в любом случае
+        self.save_delay = float(os.environ.get('RFID_SAVE_DELAY', DEF_SAVE_DELAY))
+        self._dirty_file = None  # файл, в который ещё не записаны изменения настроек (None — изменений нет)
+        self._save_timer = None
+        self._save_lock = threading.Lock()  # защищает _dirty_file и _save_timer
+        self._flush_lock = threading.Lock()  # запись в файл из нескольких потоков по очереди
+        atexit.register(self.flush)
+        # пул потоков для параллельной работы с несколькими ридерами; создаётся при первом обращении
+        self.max_workers = int(os.environ.get('RFID_MAX_WORKERS', 16))
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # очереди команд к ридерам: команды к ридерам одного COM-порта выполняются последовательно
+        self.scheduler = PortScheduler()
+        # одинаковые одновременные обращения к ридеру выполняются за одно обращение к оборудованию
+        self.flights = SingleFlight()
+        # фоновая инвентаризация: {идентификатор ридера: InventoryScanner}
+        self._scanners = {}
+        # кэш данных меток; обновляется при записи, RFID_TAG_CACHE_TTL=0 отключает кэш
+        self.tag_cache = TagCache(
+            float(os.environ.get('RFID_TAG_CACHE_TTL', DEF_CACHE_TTL)),
+            int(os.environ.get('RFID_TAG_CACHE_SIZE', DEF_CACHE_SIZE)),
+        )
+        # шина событий: метки (arrived, departed) и состояния ридеров (connected, disconnected)
+        self.events = EventBus()
+        # обработчики событий (кортеж заменяется целиком при изменении)
+        self._listeners = ()
+
+    @property
+    def _readers(self) -> dict:
+        """Текущий снимок словаря ридеров (не изменять на месте)"""
+        readers = self._readers_cache
+        if readers is None:
+            with self._write_lock:
+                if self._readers_cache is None:
+                    self._readers_cache = self._read_settings()
+                    self._index.reset(self._readers_cache)
+                readers = self._readers_cache
+        return readers
+
+    @_readers.setter
+    def _readers(self, value: dict):
+        with self._write_lock:
+            self._readers_cache = value
+            self._index.reset(value or {})
+
+    @property
+    def index(self) -> ReaderIndex:
+        """Индексы ридеров: подключенные ридеры, ридеры по номеру COM-порта и по адресу"""
+        self._readers  # настройки ридеров читаются при первом обращении
+        return self._index
 
     def __contains__(self, item):
         return item in self._readers
 
     def __delitem__(self, key):
-        del self._readers[key]
+        with self._write_lock:
+            if key not in self._readers:  # ридер уже удалён другим потоком
+                return
+            readers = dict(self._readers)
+            self._index.remove(key, readers.pop(key))
+            self._readers_cache = readers
 
     def __getitem__(self, item):
         return self._readers[item]
@@ -158,47 +397,246 @@ class _Readers:
         yield from self._readers
 
     def _update(self, other: dict):
-        self._readers.update(other)
+        with self._write_lock:
+            readers = dict(self._readers)
+            for reader_id, reader in other.items():
+                if reader_id in readers:
+                    self._index.remove(reader_id, readers[reader_id])
+                self._index.add(reader_id, reader)
+            readers.update(other)
+            self._readers_cache = readers
+
+    def _rename(self, reader_id: str, new_reader_id: str):
+        """Атомарно меняет идентификатор ридера"""
+        with self._write_lock:
+            readers = dict(self._readers)
+            readers[new_reader_id] = readers.pop(reader_id)
+            self._index.remove(reader_id, readers[new_reader_id])
+            self._index.add(new_reader_id, readers[new_reader_id])
+            self._readers_cache = readers
 
     def _items(self):
         return self._readers.items()
 
-    def _read_settings(self):
-        """Читает настройки из файла"""
+    def _executor(self) -> ThreadPoolExecutor:
+        """Возвращает пул потоков для работы с несколькими ридерами, создавая его при первом вызове"""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='readers')
+            return self._pool
+
+    def _call(self, reader: Reader, func, *args):
+        """Выполняет обращение к ридеру (func) в очереди команд его COM-порта"""
+        return self.scheduler.call(reader.port_number, func, *args)
+
+    def _call_shared(self, reader: Reader, func, *args):
+        """
+        Выполняет обращение к ридеру (func) в очереди команд его COM-порта
+        Одновременные одинаковые обращения к одному ридеру объединяются в одно
+        """
+        # WARN: поток-исполнитель порта не должен ждать обращения, стоящего в очереди этого же порта
+        if self.scheduler.in_worker(reader.port_number):
+            return self._call(reader, func, *args)
+        # название операции в статистике — без подчёркивания для служебных методов (_read_tags_batch)
+        key = (func.__name__.lstrip('_'), reader) + args
+
+        def command():
+            # ключ снимается в потоке COM-порта сразу после обращения: обращение, начатое после выполнения следующей
+            # команды порта (например, записи меток), не получит результат, полученный до неё
+            try:
+                return func(*args)
+            finally:
+                self.flights.land(key)
+
+        return self.flights.do(key, self._call, reader, command)
+
+    def _read_tags_batch(self, reader_id: str, reader: Reader, tag_ids: tuple):
+        """
+        Считывает данные меток и сохраняет их в кэш (выполняется в очереди команд COM-порта)
+        Кэш обновляется до освобождения порта, поэтому данные, считанные до записи в метку,
+        не могут попасть в кэш позже записанных
+        """
+        results = reader.read_tags_batch(tag_ids)
+        if not isinstance(results, int):
+            for tag_id, result in zip(tag_ids, results):
+                if not isinstance(result, int):
+                    self.tag_cache.put(reader_id, tag_id, result)
+        return results
+
+    def _write_tags_batch(self, reader_id: str, reader: Reader, tags: dict):
+        """
+        Записывает данные в метки и обновляет кэш до освобождения порта (выполняется в очереди команд COM-порта)
+        Данные записанных меток, полученные через другие ридеры, удаляются из кэша: метки перемещаются между ридерами
+        """
+        r_codes = reader.write_tags_batch(tags)
+        if isinstance(r_codes, int):
+            for tag_id in tags:  # неизвестно, какие метки успели записаться
+                self.tag_cache.invalidate(tag_id=tag_id)
+            return r_codes
+        for (tag_id, tag_data), r_code in zip(tags.items(), r_codes):
+            self.tag_cache.invalidate(tag_id=tag_id)
+            if r_code == 0:
+                # в кэш попадают данные в том виде, в котором их вернёт чтение: с дополнением нулями до объёма метки
+                self.tag_cache.put(reader_id, tag_id, tag_data[:TAG_SIZE].ljust(TAG_SIZE, '\0'))
+        return r_codes
+
+    @staticmethod
+    def _in_span(span, func, *args, **kwargs):
+        """Выполняет func в другом потоке как часть операции span (см. hooks.py)"""
+        if span is None:
+            return func(*args, **kwargs)
+        with HOOKS.attach(span):
+            return func(*args, **kwargs)
+
+    def _fan_out(self, func, tasks: dict) -> dict:
+        """
+        Параллельно вызывает метод func для нескольких ридеров и объединяет результаты
+        Обращения к ридерам одного COM-порта при этом всё равно выполняются последовательно (см. _call)
+        Принимает:
+            - func: метод класса _Readers, принимающий параметр reader_id
+            - tasks (dict): {идентификатор ридера: словарь с остальными параметрами для func}
+        Возвращает:
+            - (dict) - {'response': {идентификатор ридера: ответ}, 'error': {идентификатор ридера: ошибка}}
+        """
+        span = HOOKS.current() if HOOKS.enabled else None
+        futures = {
+            reader_id: self._executor().submit(self._in_span, span, func, reader_id=reader_id, **kwargs)
+            for reader_id, kwargs in tasks.items()
+        }
+
+        responses = {}
+        errors = {}
+        for reader_id, future in futures.items():
+            result = future.result()
+            if 'response' in result:
+                responses.update({reader_id: result['response']})
+            if 'error' in result:
+                errors.update({reader_id: result['error']})
+
+        return dict(error=errors, response=responses)
+
+    def _read_settings(self) -> dict:
+        """Читает настройки из файла и возвращает словарь ридеров"""
         settings = cp.ConfigParser()
         settings.read(self.file)
-        self._update({
+        return {
              reader_id: Reader(
                  int(settings[reader_id]['bus_addr']),
-                 int(settings[reader_id]['port_number'])
+                 int(settings[reader_id]['port_number']),
+                 int(settings[reader_id].get('table_size', DEF_TABLE_SIZE)),
              )
              for reader_id in settings if reader_id != 'DEFAULT'
-        })
+        }
 
     def _save_settings(self):
-        """Записывает настройки в файл"""
+        """Отмечает, что настройки изменены; запись в файл выполняется в фоне (см. save_delay и flush)"""
+        if self._dirty_file is not None and self._dirty_file != self.file:  # изменился путь к файлу настроек
+            self.flush()
+        with self._save_lock:
+            self._dirty_file = self.file
+            if self.save_delay > 0 and self._save_timer is None:
+                self._save_timer = threading.Timer(self.save_delay, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+        if self.save_delay <= 0:
+            self.flush()
+
+    def flush(self) -> None:
+        """Записывает изменённые настройки в файл, не дожидаясь окончания задержки"""
+        with self._flush_lock:
+            with self._save_lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                file, self._dirty_file = self._dirty_file, None
+            if file is not None and not self._write_settings(file):
+                with self._save_lock:
+                    # изменения не записаны: файл остаётся отмеченным, запись повторится при следующем flush
+                    # (очередном изменении настроек или завершении работы), если за это время путь не изменился
+                    if self._dirty_file is None:
+                        self._dirty_file = file
+
+    def shutdown(self) -> None:
+        """
+        Завершает работу с ридерами (при остановке сервера): останавливает фоновую инвентаризацию, отключает
+        подключенные ридеры после выполнения уже поставленных в очереди команд, останавливает потоки-исполнители
+        и записывает изменённые настройки в файл
+        При следующем обращении к ридерам потоки создаются заново
+        """
+        with self._write_lock:
+            scanners, self._scanners = self._scanners, {}
+        for scanner in scanners.values():
+            scanner.stop()
+
+        futures = {}
+        for reader_id in self.index.connected():
+            reader = self._readers.get(reader_id)
+            if reader is not None:
+                futures[reader_id] = self.scheduler.submit(reader.port_number, reader.disconnect)
+        for reader_id, future in futures.items():
+            try:
+                future.result()
+            except Exception:
+                logging.exception('[shutdown] не удалось отключить ридер %r', reader_id)
+            else:
+                self._emit_state(reader_id, False)
+
+        self.scheduler.shutdown()
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown()
+        self.flush()
+
+    def _write_settings(self, file: str) -> bool:
+        """
+        Записывает настройки в файл: во временный файл рядом с ним, который затем заменяет исходный
+        Возвращает:
+            - (bool) - записаны ли настройки
+        """
         settings = cp.ConfigParser()
         for reader_id, reader in sorted(self._items(), key=lambda x: x[0]):
             settings[reader_id] = {
                 'bus_addr': reader.bus_addr,
                 'port_number': reader.port_number
             }
-        with open(self.file, 'w') as file:
-            settings.write(file)
+            if reader.table_size != DEF_TABLE_SIZE:  # необязательный параметр
+                settings[reader_id]['table_size'] = str(reader.table_size)
+        directory, name = os.path.split(os.path.abspath(file))
+        tmp_file = None
+        try:
+            fd, tmp_file = tempfile.mkstemp(prefix=name + '.', suffix='.tmp', dir=directory)
+            with os.fdopen(fd, 'w') as tmp:
+                settings.write(tmp)
+                tmp.flush()
+                os.fsync(tmp.fileno())
+            # права доступа сохраняются такими же, как у исходного файла (mkstemp создаёт файл с правами 0600)
+            os.chmod(tmp_file, os.stat(file).st_mode & 0o777 if os.path.exists(file) else 0o644)
+            os.replace(tmp_file, file)  # файл настроек никогда не остаётся записанным наполовину
+        except OSError:
+            logging.exception('[_write_settings] не удалось записать настройки ридеров в %s', file)
+            if tmp_file is not None and os.path.exists(tmp_file):
+                try:
+                    os.remove(tmp_file)
+                except OSError:
+                    pass
+            return False
+        return True
 
     def get_readers(self):
         """Возвращает информацию о ридерах: идентификаторы, настройки, состояния"""
         result = {
             reader_id: {
-                'bus_addr': self[reader_id].bus_addr,
-                'port_number': self[reader_id].port_number,
-                'state': self[reader_id].connected,
+                'bus_addr': reader.bus_addr,
+                'port_number': reader.port_number,
+                'state': reader.connected,
             }
-            for reader_id in self
+            for reader_id, reader in self._items()
             }
         return dict(response=result)
 
-    @check_for_errors(Errors.InvalidParameterSet)
+    @check_for_errors((('data', 'reader_id'), Errors.ReaderExists), Errors.ReaderAddressIsUsed,
+                      schema=(Errors.InvalidParameterSet,) + READER_SCHEMA)
     def add_reader(self, data: dict):
         """
         Добавляет ридер
@@ -209,69 +647,168 @@ class _Readers:
         func_name = 'add_reader'
 
         reader_id = data['reader_id']
-        bus_addr = data['bus_addr']
-        port_number = data['port_number']
-
-        for error, param in \
-                ((Errors.ReaderExists, reader_id),
-                 (Errors.InvalidReaderId, reader_id),
-                 (Errors.InvalidReaderBusAddr, bus_addr),
-                 (Errors.InvalidReaderPortNumber, port_number)):
-            if error.auto_check(func_name, param):
-                return dict(error=error.to_dict())
-
-        reader = Reader(bus_addr, port_number)
+        reader = Reader(data['bus_addr'], data['port_number'])
+        reader.reader_id = reader_id  # для метрик подключения, выполняемого до добавления в реестр
 
-        if 'state' in data:
-            state = data['state']
-            error = Errors.InvalidReaderState
-            if error.auto_check(func_name, state):
+        if data.get('state'):
+            r_code = self._call(reader, reader.connect)
+            if r_code != 0:
+                error = Errors.Error(r_code, reader.get_error_text(r_code))
+                error.log_error(func_name, data=data)
                 return dict(error=error.to_dict())
-            if state:
-                r_code = self[reader_id].connect()
-                if r_code != 0:
-                    error = Errors.Error(r_code, reader.get_error_text(r_code))
-                    error.log_error('add_reader', data=data)
-                    return dict(error=error.to_dict())
 
-        self._update({reader_id: reader})
+        with self._write_lock:
+            # ридер или ридер с тем же адресом добавлен другим потоком
+            error = None
+            if Errors.ReaderExists.auto_check(func_name, reader_id):
+                error = Errors.ReaderExists
+            elif Errors.ReaderAddressIsUsed.auto_check(func_name, data):
+                error = Errors.ReaderAddressIsUsed
+            if error is not None:
+                if reader.connected:
+                    self._call(reader, reader.disconnect)
+                return dict(error=error.to_dict())
+            self._update({reader_id: reader})
 
+        if reader.connected:
+            self._emit_state(reader_id, True)
         self._save_settings()
         return dict(response=0)
 
-    @check_for_errors(Errors.OneOrMoreReadersAreConnected)
+    @check_for_errors(Errors.OneOrMoreReadersAreConnected,
+                      schema=((('data',), Errors.InvalidRequest, lambda x: not isinstance(x, dict)),))
     def update_readers(self, data: dict):
-        """Заменяет все настройки ридеров переданными"""
-        responses = {}
-        errors = {}
+        """
+        Заменяет все настройки ридеров переданными
+        Все изменения сначала проверяются и применяются к ридерам только при отсутствии ошибок (все сразу),
+        настройки записываются в файл один раз, подключение и отключение ридеров выполняется параллельно
 
+        Требуемый формат параметра data:
+            {
+                'идентификатор_ридера': {словарь с параметрами, как для update_reader},
+                ...
+            }
+        """
+        func_name = 'update_readers'
+
+        with self._write_lock:
+            readers = dict(self._readers)
+            errors = {}
+            for reader_id, params in data.items():
+                error = self._check_update(readers, reader_id, params)
+                if error is None and readers[reader_id].connected \
+                        and ('reader_id' in params or 'bus_addr' in params or 'port_number' in params):
+                    error = Errors.ReaderIsConnected  # ридер подключён другим потоком
+                if error is not None:
+                    error.log_error(func_name, reader_id=reader_id, data=params)
+                    errors.update({reader_id: error.to_dict()})
+
+            # новые идентификаторы не должны совпадать с оставшимися и друг с другом
+            renamed = {reader_id: params['reader_id'] for reader_id, params in data.items()
+                       if reader_id not in errors and 'reader_id' in params and params['reader_id'] != reader_id}
+            remaining = set(readers).difference(renamed)
+            new_reader_ids = set()
+            for reader_id, new_reader_id in renamed.items():
+                if new_reader_id in remaining or new_reader_id in new_reader_ids:
+                    error = Errors.ReaderExists
+                    error.log_error(func_name, reader_id=reader_id, data=data[reader_id])
+                    errors.update({reader_id: error.to_dict()})
+                new_reader_ids.add(new_reader_id)
+
+            # адреса ридеров (номер порта, адрес шины) после обновления не должны совпадать
+            addresses = {}
+            for reader_id, reader in readers.items():
+                params = data[reader_id] if reader_id in data and reader_id not in errors else {}
+                address = (params.get('port_number', reader.port_number), params.get('bus_addr', reader.bus_addr))
+                addresses.setdefault(address, []).append(reader_id)
+            for reader_ids in addresses.values():
+                for reader_id in reader_ids if len(reader_ids) > 1 else ():
+                    if reader_id in data and reader_id not in errors \
+                            and ('bus_addr' in data[reader_id] or 'port_number' in data[reader_id]):
+                        error = Errors.ReaderAddressIsUsed
+                        error.log_error(func_name, reader_id=reader_id, data=data[reader_id])
+                        errors.update({reader_id: error.to_dict()})
+
+            if errors:  # ни одно изменение не применяется
+                return dict(error=errors, response={})
+
+            for reader_id, params in data.items():
+                reader = readers[reader_id]
+                if 'bus_addr' in params:
+                    reader.bus_addr = params['bus_addr']
+                if 'port_number' in params:
+                    reader.port_number = params['port_number']
+            for reader_id in renamed:  # сначала все переименованные ридеры удаляются из индексов
+                self._index.remove(reader_id, readers[reader_id])
+            moved = {new_reader_id: readers.pop(reader_id) for reader_id, new_reader_id in renamed.items()}
+            readers.update(moved)
+            for new_reader_id, reader in moved.items():
+                self._index.add(new_reader_id, reader)
+            self._readers_cache = readers
+
+        for reader_id in set(data).union(renamed.values()):
+            self.tag_cache.invalidate(reader_id)
+        self._save_settings()
+
+        # подключение и отключение ридеров
+        futures = {}
+        span = HOOKS.current() if HOOKS.enabled else None
+        for reader_id, params in data.items():
+            new_reader_id = renamed.get(reader_id, reader_id)
+            reader = readers[new_reader_id]
+            if 'state' in params and params['state'] != reader.connected:
+                func = reader.connect if params['state'] else reader.disconnect
+                future = self._executor().submit(self._in_span, span, self._call, reader, func)
+                futures[reader_id] = (new_reader_id, future)
+
+        responses = {}
         for reader_id in data:
-            response = Readers.update_reader(reader_id=reader_id, data=data[reader_id])
-            if 'error' in response:
-                errors.update({reader_id: response['error']})
+            if reader_id not in futures:
+                responses.update({reader_id: 0})
+                continue
+            new_reader_id, future = futures[reader_id]
+            reader = readers[new_reader_id]
+            r_code = future.result()
+            if r_code != 0:
+                error = Errors.Error(r_code, reader.get_error_text(r_code))
+                error.log_error(func_name, reader_id=reader_id, data=data[reader_id])
+                errors.update({reader_id: error.to_dict()})
             else:
-                responses.update({reader_id: response['response']})
+                self._emit_state(new_reader_id, reader.connected)
+                responses.update({reader_id: 0})
 
         return dict(error=errors, response=responses)
 
+    @staticmethod
+    def _check_update(readers: dict, reader_id: str, data: dict) -> Errors.Error or None:
+        """Проверяет параметры обновления ридера (для update_readers), возвращает ошибку или None"""
+        if reader_id not in readers:
+            return Errors.ReaderNotExists
+        return validate_reader_update({'data': data})
+
     @check_for_errors(Errors.ReadersListAlreadyIsEmpty, Errors.OneOrMoreReadersAreConnected)
     def delete_readers(self):
         """Удаляет ридеры"""
         self._readers = {}
+        self.tag_cache.invalidate()
         self._save_settings()
         return dict(response=0)
 
     @check_for_errors(Errors.ReaderNotExists)
     def get_reader(self, reader_id: str):
         """Возвращает настройки и состояние ридера по идентификатору"""
+        reader = self._readers.get(reader_id)
+        if reader is None:  # ридер удалён другим потоком после проверки
+            return dict(error=Errors.ReaderNotExists.to_dict())
         result = {reader_id: {
-            'bus_addr': self[reader_id].bus_addr,
-            'port_number': self[reader_id].port_number,
-            'state': self[reader_id].connected,
+            'bus_addr': reader.bus_addr,
+            'port_number': reader.port_number,
+            'state': reader.connected,
         }}
         return dict(response=result)
 
-    @check_for_errors(Errors.ReaderNotExists)
+    @check_for_errors(Errors.ReaderNotExists, (('data', 'reader_id'), Errors.ReaderExists),
+                      schema=READER_UPDATE_SCHEMA)
     def update_reader(self, reader_id: str, data: dict):
         """
         Обновляет настройки ридера
@@ -282,28 +819,16 @@ class _Readers:
         """
         func_name = 'update_reader'
 
-        # если в запросе нет ни одного параметра на обновление
-        if all(map(lambda x: x not in data, ('reader_id', 'bus_addr', 'port_number', 'state'))):
-            error = Errors.InvalidParameterSet
-            error.log_error(func_name, reader_id=reader_id, data=data)
-            return dict(error=error.to_dict())
-
-        for error, param in (
-                (Errors.ReaderExists, 'reader_id'),
-                (Errors.InvalidReaderId, 'reader_id'),
-                (Errors.InvalidReaderBusAddr, 'bus_addr'),
-                (Errors.InvalidReaderPortNumber, 'port_number'),
-                (Errors.InvalidReaderState, 'state'),):
-            if param in data:
-                if error.auto_check(func_name, data[param]):
-                    return dict(error=error.to_dict())
-
-        reader = self[reader_id]
+        reader = self._readers.get(reader_id)
+        if reader is None:  # ридер удалён или переименован другим потоком после проверки
+            return dict(error=Errors.ReaderNotExists.to_dict())
         connected = reader.connected
+        self.tag_cache.invalidate(reader_id)  # ридер может быть переименован, перенастроен или заменён
 
         if connected and 'state' in data and not data['state']:  # отключить
-            self[reader_id].disconnect()
+            self._call(reader, reader.disconnect)
             connected = False
+            self._emit_state(reader_id, False)
 
         # попытка обновить параметры включенного ридера
         if connected and ('reader_id' in data or 'bus_addr' in data or 'port_number' in data):
@@ -313,22 +838,33 @@ class _Readers:
             return dict(error=error.to_dict())
 
         if not connected:
+            if 'bus_addr' in data or 'port_number' in data:
+                address = (data.get('port_number', reader.port_number), data.get('bus_addr', reader.bus_addr))
+                if set(self.index.at_address(*address)).difference((reader_id,)):
+                    error = Errors.ReaderAddressIsUsed
+                    error.log_error(func_name, reader_id=reader_id, data=data)
+                    return dict(error=error.to_dict())
             if 'reader_id' in data:
                 new_reader_id = data['reader_id']
-                self._update({new_reader_id: self._readers.pop(reader_id)})
+                with self._write_lock:
+                    if self._readers.get(reader_id) is not reader:  # ридер удалён или переименован другим потоком
+                        return dict(error=Errors.ReaderNotExists.to_dict())
+                    if Errors.ReaderExists.auto_check(func_name, new_reader_id):  # ридер добавлен другим потоком
+                        return dict(error=Errors.ReaderExists.to_dict())
+                    self._rename(reader_id, new_reader_id)
                 reader_id = new_reader_id
-                reader = self[reader_id]
             if 'bus_addr' in data:
                 reader.bus_addr = data['bus_addr']
             if 'port_number' in data:
                 reader.port_number = data['port_number']
 
         if not connected and 'state' in data and data['state']:  # подключить
-            r_code = self[reader_id].connect()
+            r_code = self._call(reader, reader.connect)
             if r_code != 0:
                 error = Errors.Error(r_code, reader.get_error_text(r_code))
                 error.log_error(func_name, reader_id=reader_id, data=data)
                 return dict(error=error.to_dict())
+            self._emit_state(reader_id, True)
 
         self._save_settings()
         return dict(response=0)
@@ -336,49 +872,74 @@ class _Readers:
     @check_for_errors(Errors.ReaderNotExists, Errors.ReaderIsConnected)
     def delete_reader(self, reader_id: str):
         """Удаляет ридер"""
-        del self[reader_id]
+        with self._write_lock:
+            if reader_id not in self._readers:  # ридер удалён или переименован другим потоком после проверки
+                return dict(error=Errors.ReaderNotExists.to_dict())
+            del self[reader_id]
+        self.tag_cache.invalidate(reader_id)
         self._save_settings()
         return dict(response=0)
 
     @check_for_errors(Errors.ReaderNotExists, Errors.ReaderIsDisconnected)
     def inventory(self, reader_id: str):
         """Возвращает идентификаторы меток"""
-        reader = self[reader_id]
-        response = reader.inventory()
+        reader = self._readers.get(reader_id)
+        if reader is None:  # ридер удалён или переименован другим потоком после проверки
+            return dict(error=Errors.ReaderNotExists.to_dict())
+        response = self._call_shared(reader, reader.inventory)
         if isinstance(response, int):  # произошла ошибка
             error = Errors.Error(response, reader.get_error_text(response))
             error.log_error('inventory', reader_id=reader_id)
             return dict(error=error.to_dict())
         return dict(response=response)
 
-    @check_for_errors(Errors.ReaderNotExists, Errors.ReaderIsDisconnected)
-    def read_tags(self, reader_id: str, data: list):
+    @check_for_errors(Errors.ReaderNotExists, Errors.ReaderIsDisconnected, schema=READ_TAGS_SCHEMA)
+    def read_tags(self, reader_id: str, data: list, max_age: float = None):
         """
         Возвращает информацию с меток
         Если в параметре data отсутствуют элементы, произойдёт
         считывание с меток, находящихся в зоне действия антенны
+        Данные, полученные не ранее max_age секунд назад (по умолчанию — время хранения в кэше),
+        возвращаются из кэша без обращения к ридеру; max_age=0 — всегда считывать с меток
 
         Требуемый формат параметра data:
             ['1', '2', '3', ...]
         """
         # TEMP нужно будет определиться с форматом данных на метках
-        reader = self[reader_id]
+        reader = self._readers.get(reader_id)
+        if reader is None:  # ридер удалён или переименован другим потоком после проверки
+            return dict(error=Errors.ReaderNotExists.to_dict())
 
         # WARN если в запросе по ключу "data" будет пустой массив, ничего не вернётся
         if data:
-            # TODO валидация значений меток
             tag_ids = data
         else:
-            tag_ids = reader.inventory()
+            tag_ids = self._call_shared(reader, reader.inventory)
             if isinstance(tag_ids, int):
                 error = Errors.Error(tag_ids, reader.get_error_text(tag_ids))
                 error.log_error('read_tags', reader_id=reader_id, data=data)
                 return dict(error=error.to_dict())
 
+        cached = {}
+        for tag_id in tag_ids:
+            tag_data = self.tag_cache.get(reader_id, tag_id, max_age)
+            if tag_data is not None:
+                cached[tag_id] = tag_data
+        missing = [tag_id for tag_id in tag_ids if tag_id not in cached]
+
+        # все метки, которых нет в кэше, считываются за одно обращение к библиотеке
+        results = self._call_shared(reader, self._read_tags_batch, reader_id, reader, tuple(missing)) \
+            if missing else ()
+        if isinstance(results, int):
+            error = Errors.Error(results, reader.get_error_text(results))
+            error.log_error('read_tags', reader_id=reader_id, data=data)
+            return dict(error=error.to_dict())
+        results = dict(zip(missing, results))
+
         responses = {}
         errors = {}
         for tag_id in tag_ids:
-            response = reader.read_tag(tag_id)
+            response = cached[tag_id] if tag_id in cached else results[tag_id]
             if isinstance(response, int):
                 errors.update({tag_id: {'error_code': response, 'error_msg': reader.get_error_text(response)}})
             else:
@@ -393,7 +954,30 @@ class _Readers:
 
         return result
 
-    @check_for_errors(Errors.ReaderNotExists, Errors.ReaderIsDisconnected)
+    def read_tags_cached(self, reader_id: str, data: list, max_age: float = None) -> dict or None:
+        """
+        Возвращает ответ read_tags без обращения к ридеру и его очереди команд: ошибку в параметрах
+        или данные меток, если данные всех меток из data есть в кэше
+        Возвращает None, если данных хотя бы одной метки в кэше нет, data пуст или ридер недоступен:
+        тогда нужно вызвать read_tags
+        """
+        error = self.read_tags.validate(reader_id=reader_id, data=data, max_age=max_age)
+        if error is not None:
+            return error
+        reader = self._readers.get(reader_id)
+        if not data or reader is None or not reader.connected:
+            return None
+        responses = {}
+        for tag_id in data:
+            tag_data = self.tag_cache.get(reader_id, tag_id, max_age)
+            if tag_data is None:
+                return None
+            responses.update({tag_id: tag_data})
+        return dict(response=responses)
+
+    @check_for_errors(Errors.ReaderNotExists, Errors.ReaderIsDisconnected,
+                      schema=(Errors.InvalidTagId,
+                              (None, Errors.InvalidTagData, _is_invalid_write)))
     def write_tags(self, reader_id: str, data: dict, clear=False):
         """
         Записывает информацию в метки
@@ -416,22 +1000,29 @@ class _Readers:
             ]
         """
         # TEMP нужно будет определиться с форматом данных на метках
-        reader = self[reader_id]
+        reader = self._readers.get(reader_id)
+        if reader is None:  # ридер удалён или переименован другим потоком после проверки
+            return dict(error=Errors.ReaderNotExists.to_dict())
 
-        # TODO валидация значений меток
+        if clear:
+            tags = dict.fromkeys(data, '')  # пустая строка для записи в метку
+        else:
+            tags = dict(data)
+
+        # все метки записываются за одно обращение к библиотеке
+        r_codes = self._call(reader, self._write_tags_batch, reader_id, reader, tags)  # TEMP
+        if isinstance(r_codes, int):
+            error = Errors.Error(r_codes, reader.get_error_text(r_codes))
+            error.log_error('write_tags', reader_id=reader_id, data=data)
+            return dict(error=error.to_dict())
 
         responses = {}
         errors = {}
-        for tag_id in data:
-            if clear:
-                tag_data = ''  # пустая строка для записи в метку
-            else:
-                tag_data = data[tag_id]
-            r_code = reader.write_tag(tag_id, tag_data)  # TEMP
+        for (tag_id, tag_data), r_code in zip(tags.items(), r_codes):
             if r_code != 0:
                 error = Errors.Error(r_code, reader.get_error_text(r_code))
                 error.log_error('write_tags', reader_id=reader_id, tag_id=tag_id, tag_data=tag_data)
-                errors.update({tag_id: {'error_code': r_code, 'error_msg': reader.get_error_text(r_code)}})
+                errors.update({tag_id: error.to_dict()})
             else:
                 responses.update({tag_id: r_code})
 
@@ -443,5 +1034,137 @@ class _Readers:
 
         return result
 
+    def get_ports(self):
+        """
+        Возвращает состояние очередей команд по COM-портам: глубину очереди, время ожидания команд
+        и идентификаторы ридеров, использующих порт (для портов, к которым ещё не обращались, статистика нулевая)
+        """
+        stats = self.scheduler.stats()
+        ports = self.index.ports()
+        idle = {'queue_depth': 0, 'busy': False, 'tasks': 0, 'wait_time_avg': 0.0, 'wait_time_max': 0.0}
+        result = {str(port_number): dict(stats.get(port_number, idle), readers=sorted(ports.get(port_number, ())))
+                  for port_number in sorted(set(stats).union(ports))}
+        return dict(response=result)
+
+    def get_stats(self):
+        """
+        Возвращает статистику работы модуля:
+        объединение одинаковых обращений к ридерам (coalescing) и кэш данных меток (tag_cache)
+        """
+        return dict(response={'coalescing': self.flights.stats(), 'tag_cache': self.tag_cache.stats()})
+
+    @staticmethod
+    def get_metrics():
+        """
+        Возвращает метрики (см. metrics.py): длительность и ошибки обращений к ридерам по операциям,
+        количество меток за инвентаризацию, время ожидания в очередях COM-портов, длительность запросов к Web API
+        """
+        return dict(response=METRICS.snapshot())
+
+    def subscribe(self, listener) -> None:
+        """
+        Подписывает функцию listener на события
+        Формат события метки: {'event': 'arrived' или 'departed', 'reader_id': ..., 'tag_id': ..., 'time': ...}
+        Формат события ридера: {'event': 'connected' или 'disconnected', 'reader_id': ..., 'time': ...}
+        """
+        with self._write_lock:
+            self._listeners += (listener,)
+
+    def unsubscribe(self, listener) -> None:
+        """Отписывает функцию listener от событий"""
+        with self._write_lock:
+            self._listeners = tuple(item for item in self._listeners if item != listener)
+
+    def _emit(self, event: dict) -> None:
+        """Публикует событие в шину событий и передаёт его подписчикам"""
+        self.events.publish(event)
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception:
+                logging.exception('[_emit] ошибка в обработчике события')
+
+    def _emit_state(self, reader_id: str, connected: bool) -> None:
+        self._emit({'event': 'connected' if connected else 'disconnected', 'reader_id': reader_id, 'time': time.time()})
+
+    def get_events(self, cursor: int = 0, timeout: float = 0.0):
+        """
+        Возвращает события, опубликованные после события с номером cursor
+        Если таких событий нет, ожидает их появления не дольше timeout секунд
+        """
+        events, cursor = self.events.get(cursor, timeout)
+        return dict(response={'events': events, 'cursor': cursor})
+
+    @check_for_errors(Errors.ReaderNotExists, Errors.ReaderIsDisconnected, schema=(Errors.InvalidScanParameters,))
+    def start_scan(self, reader_id: str, data: dict):
+        """
+        Запускает (или перезапускает с новыми параметрами) фоновую инвентаризацию ридера
+        Сканирование прекращается при отключении ридера
+        Принимает:
+            - reader_id (str)
+            - data (dict): словарь со следущим возможным набором ключей:
+              interval (период инвентаризации, с), missed_rounds (количество инвентаризаций подряд без метки,
+              после которого метка считается ушедшей)
+        """
+        reader = self._readers.get(reader_id)
+        if reader is None:  # ридер удалён или переименован другим потоком после проверки
+            return dict(error=Errors.ReaderNotExists.to_dict())
+
+        def inventory():
+            if not reader.connected or self._readers.get(reader_id) is not reader:
+                return None
+            return self._call_shared(reader, reader.inventory)
+
+        scanner = InventoryScanner(
+            reader_id, inventory, self._emit,
+            data.get('interval', DEF_SCAN_INTERVAL), data.get('missed_rounds', DEF_MISSED_ROUNDS)
+        )
+        with self._write_lock:
+            previous = self._scanners.get(reader_id)
+            if previous is not None:
+                previous.stop(wait=False)
+            self._scanners[reader_id] = scanner
+            scanner.start()
+        return dict(response=0)
+
+    @check_for_errors(Errors.ReaderNotExists)
+    def stop_scan(self, reader_id: str):
+        """Останавливает фоновую инвентаризацию ридера"""
+        with self._write_lock:
+            scanner = self._scanners.pop(reader_id, None)
+        if scanner is not None:
+            scanner.stop()
+        return dict(response=0)
+
+    @check_for_errors(Errors.ReaderNotExists)
+    def get_scan(self, reader_id: str):
+        """Возвращает состояние фоновой инвентаризации ридера и метки, находящиеся в зоне действия антенны"""
+        scanner = self._scanners.get(reader_id)
+        if scanner is None:
+            return dict(response={'active': False, 'tags': ()})
+        return dict(response=scanner.to_dict())
+
+    def inventory_all(self):
+        """Возвращает идентификаторы меток со всех подключенных ридеров (ридеры опрашиваются параллельно)"""
+        tasks = {reader_id: {} for reader_id in self.index.connected()}
+        return self._fan_out(self.inventory, tasks)
+
+    @check_for_errors(schema=((('data',), Errors.InvalidRequest, lambda x: not isinstance(x, dict)),))
+    def read_tags_many(self, data: dict):
+        """
+        Возвращает информацию с меток нескольких ридеров (ридеры опрашиваются параллельно)
+
+        Требуемый формат параметра data:
+            {
+                'идентификатор_ридера': ['1', '2', '3', ...],
+                ...
+            }
+        Пустой список означает считывание с меток, находящихся в зоне действия антенны ридера
+        """
+        tasks = {reader_id: {'data': tag_ids} for reader_id, tag_ids in data.items()}
+        return self._fan_out(self.read_tags, tasks)
+
 
-Readers = _Readers()  # WARN: объект в глобальной области видимости, через который следует работать с ридерами
+# WARN: объект в глобальной области видимости, через который следует работать с ридерами
+# Настройки ридеров читаются при первом обращении к нему, подключение к оборудованию — при первом коннекте ридера
+Readers = _Readers()
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+Логирование без задержек в потоках, работающих с ридерами
+
+Записи лога не форматируются и не выводятся в потоке, где возникли: QueueHandler только кладёт запись в очередь,
+а форматирование и запись в файл/поток выполняет отдельный фоновый поток (QueueListener). Если очередь переполнена,
+запись отбрасывается (количество отброшенных записей выводится при завершении работы), поэтому логирование
+никогда не блокирует обращение к ридеру.
+
+Повторы одной и той же ошибки (один ридер, одна операция, один код ошибки) в течение repeat_interval секунд
+не выводятся: в лог попадает первая ошибка, а следующая после окончания интервала — с количеством пропущенных
+повторов. Вывод возможен в текстовом виде или в виде JSON (по одному объекту на строку).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+
+__all__ = ('setup_logging', 'shutdown_logging', 'CallArgs', 'RepeatFilter', 'TextFormatter', 'JsonFormatter')
+
+# "[MODULE] LEVEL: 0000-00-00 00:00:00,000   MSG"
+DEF_LOG_FORMAT = '[%(module)s] %(levelname)s: %(asctime)-15s   %(message)s'
+DEF_REPEAT_INTERVAL = 10.0  # интервал объединения повторов одной ошибки по умолчанию, с
+DEF_QUEUE_SIZE = 10000  # максимальное количество записей, ожидающих вывода
+MAX_REPEAT_KEYS = 10000  # максимальное количество отслеживаемых ошибок (ридер, операция, код)
+
+_handler = None  # _QueueHandler, установленный setup_logging
+_listener = None  # фоновый поток записи лога
+_lock = threading.Lock()
+
+
+class CallArgs(object):
+    """Параметры вызова для сообщения лога; текст вида "1, 'a', key='value'" формируется только при выводе"""
+    __slots__ = ('args', 'kwargs')
+
+    def __init__(self, args: tuple, kwargs: dict):
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return ', '.join(tuple(map(repr, self.args))
+                         + tuple('{}={!r}'.format(key, value) for key, value in self.kwargs.items()))
+
+
+class RepeatFilter(logging.Filter):
+    """
+    Пропускает повторы ошибки в течение interval секунд после её вывода
+    Ошибкой считается запись с атрибутом error_code (задаётся через extra), повторами — записи с теми же
+    reader_id, func_name и error_code. Запись, выведенная после окончания интервала, получает атрибут repeated —
+    количество пропущенных повторов
+    Принимает:
+        - interval (float): интервал объединения повторов, с; 0 — повторы не объединяются
+    """
+    def __init__(self, interval: float = DEF_REPEAT_INTERVAL):
+        super().__init__()
+        self.interval = interval
+        self._windows = {}  # {(reader_id, func_name, error_code): [время вывода ошибки, количество пропущенных]}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        error_code = getattr(record, 'error_code', None)
+        if error_code is None or self.interval <= 0:
+            return True
+        key = (getattr(record, 'reader_id', None), getattr(record, 'func_name', None), error_code)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is not None and record.created - window[0] < self.interval:
+                window[1] += 1
+                return False
+            if window is None and len(self._windows) >= MAX_REPEAT_KEYS:
+                self._prune(record.created)
+            self._windows[key] = [record.created, 0]
+        if window is not None and window[1]:
+            record.repeated = window[1]
+        return True
+
+    def _prune(self, now: float) -> None:
+        # удаляются ошибки, интервал которых истёк без повторов; если таких нет — все
+        expired = [key for key, (start, repeated) in self._windows.items()
+                   if now - start >= self.interval and not repeated]
+        for key in expired or list(self._windows):
+            del self._windows[key]
+
+    def drain(self) -> list:
+        """Возвращает [((reader_id, func_name, error_code), количество пропущенных повторов), ...] и сбрасывает их"""
+        with self._lock:
+            result = [(key, window[1]) for key, window in self._windows.items() if window[1]]
+            self._windows = {}
+        return result
+
+
+class TextFormatter(logging.Formatter):
+    """Текстовый вывод; к записи, объединившей повторы ошибки, добавляется их количество"""
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        result = super().formatMessage(record)
+        repeated = getattr(record, 'repeated', None)
+        if repeated:
+            result += ' [повторов пропущено: {}]'.format(repeated)
+        return result
+
+
+class JsonFormatter(logging.Formatter):
+    """Вывод в виде JSON: по одному объекту на строку"""
+    FIELDS = ('reader_id', 'func_name', 'error_code', 'repeated')  # необязательные поля записи
+
+    def format(self, record: logging.LogRecord) -> str:
+        result = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'module': record.module,
+            'message': record.getMessage(),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                result[field] = value
+        if record.exc_info:
+            result['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(result, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, не форматирующий записи и не блокирующийся при переполнении очереди"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0  # количество отброшенных записей
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # запись форматируется в фоновом потоке; параметры сообщения передаются как есть
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # при остановке очередь может быть заполнена: ожидается, пока фоновый поток освободит место
+        self.queue.put(self._sentinel)
+
+
+def setup_logging(level: int = logging.WARNING, json_format: bool = False,
+                  repeat_interval: float = DEF_REPEAT_INTERVAL, handlers: list = None,
+                  queue_size: int = DEF_QUEUE_SIZE, force: bool = False) -> bool:
+    """
+    Настраивает корневой логгер: записи передаются через очередь фоновому потоку, который выводит их в handlers
+    Как и logging.basicConfig, ничего не делает, если у корневого логгера уже есть обработчики (кроме force=True)
+    Принимает:
+        - level (int): уровень логирования
+        - json_format (bool): выводить записи в виде JSON
+        - repeat_interval (float): интервал объединения повторов одной ошибки, с; 0 — не объединять
+        - handlers (list): обработчики, выполняющие вывод (по умолчанию — вывод в stderr)
+        - queue_size (int): максимальное количество записей, ожидающих вывода
+        - force (bool): заменить существующие обработчики корневого логгера
+    Возвращает:
+        - (bool) - была ли выполнена настройка
+    """
+    global _handler, _listener
+    root = logging.getLogger()
+    with _lock:
+        if root.handlers and not force:
+            return False
+        _stop()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+            handler.close()
+
+        formatter = JsonFormatter() if json_format else TextFormatter(DEF_LOG_FORMAT)
+        handlers = handlers or [logging.StreamHandler()]
+        for handler in handlers:
+            handler.setFormatter(formatter)
+        _handler = _QueueHandler(queue.Queue(queue_size))
+        _handler.addFilter(RepeatFilter(repeat_interval))
+        _listener = _QueueListener(_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        root.addHandler(_handler)
+        root.setLevel(level)
+    return True
+
+
+def _stop() -> None:
+    """Останавливает фоновый поток, выводит оставшиеся записи и подключает обработчики к логгеру напрямую"""
+    global _handler, _listener
+    if _listener is None:
+        return
+    root = logging.getLogger()
+    root.removeHandler(_handler)
+    _listener.stop()  # записи, уже стоящие в очереди, выводятся
+    # записи, сделанные после остановки фонового потока, выводятся сразу
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    repeat_filter = _handler.filters[0]
+    for (reader_id, func_name, error_code), repeated in repeat_filter.drain():
+        logging.warning('[%s] ошибка %s ридера %r: повторов пропущено: %d', func_name, error_code, reader_id, repeated)
+    if _handler.dropped:
+        logging.warning('[logs] записей лога отброшено из-за переполнения очереди: %d', _handler.dropped)
+    _handler = _listener = None
+
+
+def shutdown_logging() -> None:
+    """Выводит все записи, ожидающие в очереди, и останавливает фоновый поток (выполняется при завершении работы)"""
+    with _lock:
+        _stop()
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Метрики работы с ридерами
+
+Для каждого ридера и каждой операции с библиотекой (connect, inventory, read_tag, write_tag и др.) собираются
+гистограммы длительности вызовов и счётчики ошибок по кодам, а также количество меток за одну инвентаризацию,
+время ожидания команд в очередях COM-портов и длительность запросов к Web API. Метрики доступны в виде словаря
+(METRICS.snapshot()) и в текстовом формате Prometheus (METRICS.render(), GET /metrics).
+
+Сбор метрик можно отключить переменной окружения RFID_METRICS=0 или присвоением METRICS.enabled = False:
+тогда каждый вызов обходится одной проверкой флага.
+"""
+import bisect
+import os
+import threading
+
+__all__ = ('Histogram', 'Metrics', 'METRICS')
+
+# границы интервалов гистограмм длительности, с
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# границы интервалов гистограммы количества меток за одну инвентаризацию
+TAG_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram(object):
+    """Гистограмма с фиксированными границами интервалов (как histogram в Prometheus)"""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последний интервал — больше всех границ (+Inf)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        """Возвращает [(граница интервала, количество значений не больше неё), ...], последняя граница — '+Inf'"""
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': {str(bound): count for bound, count in self.cumulative()},
+        }
+
+
+class Metrics(object):
+    """
+    Реестр метрик
+    Принимает:
+        - enabled (bool): собирать ли метрики
+    """
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Сбрасывает все метрики"""
+        with self._lock:
+            self._calls = {}  # {(ридер, операция): Histogram длительности}
+            self._errors = {}  # {(ридер, операция, код): количество}
+            self._tags = {}  # {ридер: Histogram количества меток за инвентаризацию}
+            self._queue_wait = {}  # {номер порта: Histogram времени ожидания в очереди}
+            self._requests = {}  # {(маршрут, метод): Histogram длительности запроса}
+            self._responses = {}  # {(маршрут, метод, код ответа HTTP): количество}
+
+    @staticmethod
+    def _histogram(index: dict, key, buckets: tuple) -> Histogram:
+        histogram = index.get(key)
+        if histogram is None:
+            histogram = index[key] = Histogram(buckets)
+        return histogram
+
+    def observe_call(self, reader: str, operation: str, duration: float, r_codes=()) -> None:
+        """
+        Учитывает вызов библиотеки
+        Принимает:
+            - reader (str): идентификатор ридера
+            - operation (str): название операции
+            - duration (float): длительность вызова, с
+            - r_codes (iterable): ненулевые коды ошибок, возвращённые вызовом (для пакетных операций — по меткам)
+        """
+        with self._lock:
+            self._histogram(self._calls, (reader, operation), DURATION_BUCKETS).observe(duration)
+            for r_code in r_codes:
+                key = (reader, operation, r_code)
+                self._errors[key] = self._errors.get(key, 0) + 1
+
+    def observe_tags(self, reader: str, count: int) -> None:
+        """Учитывает количество меток, найденных за одну инвентаризацию"""
+        with self._lock:
+            self._histogram(self._tags, reader, TAG_COUNT_BUCKETS).observe(count)
+
+    def observe_queue_wait(self, port_number: int, wait_time: float) -> None:
+        """Учитывает время ожидания команды в очереди COM-порта"""
+        with self._lock:
+            self._histogram(self._queue_wait, port_number, DURATION_BUCKETS).observe(wait_time)
+
+    def observe_request(self, route: str, method: str, status: int, duration: float) -> None:
+        """Учитывает запрос к Web API"""
+        with self._lock:
+            self._histogram(self._requests, (route, method), DURATION_BUCKETS).observe(duration)
+            key = (route, method, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def snapshot(self) -> dict:
+        """
+        Возвращает метрики в виде словаря:
+            {
+                'calls': {ридер: {операция: {'count': ..., 'sum': ..., 'buckets': {...}}}},
+                'errors': {ридер: {операция: {код: количество}}},
+                'inventory_tags': {ридер: гистограмма},
+                'queue_wait': {номер порта: гистограмма},
+                'requests': {маршрут: {метод: гистограмма}},
+                'responses': {маршрут: {метод: {код ответа HTTP: количество}}},
+            }
+        """
+        with self._lock:
+            result = {'calls': {}, 'errors': {}, 'requests': {}, 'responses': {}}
+            for (reader, operation), histogram in self._calls.items():
+                result['calls'].setdefault(reader, {})[operation] = histogram.to_dict()
+            for (reader, operation, r_code), count in self._errors.items():
+                result['errors'].setdefault(reader, {}).setdefault(operation, {})[r_code] = count
+            result['inventory_tags'] = {reader: histogram.to_dict() for reader, histogram in self._tags.items()}
+            result['queue_wait'] = {str(port): histogram.to_dict() for port, histogram in self._queue_wait.items()}
+            for (route, method), histogram in self._requests.items():
+                result['requests'].setdefault(route, {})[method] = histogram.to_dict()
+            for (route, method, status), count in self._responses.items():
+                result['responses'].setdefault(route, {}).setdefault(method, {})[status] = count
+        return result
+
+    def render(self) -> str:
+        """Возвращает метрики в текстовом формате Prometheus"""
+        lines = []
+        with self._lock:
+            self._render_histograms(lines, 'rfid_reader_call_duration_seconds',
+                                    'Длительность вызовов библиотеки RFID', ('reader', 'operation'), self._calls)
+            self._render_counters(lines, 'rfid_reader_errors_total',
+                                  'Количество ошибок библиотеки RFID по кодам', ('reader', 'operation', 'code'),
+                                  self._errors)
+            self._render_histograms(lines, 'rfid_inventory_tags',
+                                    'Количество меток за одну инвентаризацию', ('reader',), self._tags)
+            self._render_histograms(lines, 'rfid_port_queue_wait_seconds',
+                                    'Время ожидания команды в очереди COM-порта', ('port',), self._queue_wait)
+            self._render_histograms(lines, 'rfid_http_request_duration_seconds',
+                                    'Длительность запросов к Web API', ('route', 'method'), self._requests)
+            self._render_counters(lines, 'rfid_http_requests_total',
+                                  'Количество запросов к Web API', ('route', 'method', 'status'), self._responses)
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _labels(names: tuple, values) -> str:
+        values = values if isinstance(values, tuple) else (values,)
+        return ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+                                         .replace('\n', '\\n'))
+                        for name, value in zip(names, values))
+
+    def _render_histograms(self, lines: list, name: str, help_text: str, label_names: tuple, index: dict) -> None:
+        lines.append('# HELP {} {}'.format(name, help_text))
+        lines.append('# TYPE {} histogram'.format(name))
+        for key, histogram in sorted(index.items(), key=lambda item: str(item[0])):
+            labels = self._labels(label_names, key)
+            for bound, count in histogram.cumulative():
+                lines.append('{}_bucket{{{},le="{}"}} {}'.format(name, labels, bound, count))
+            lines.append('{}_sum{{{}}} {}'.format(name, labels, histogram.sum))
+            lines.append('{}_count{{{}}} {}'.format(name, labels, histogram.count))
+
+    def _render_counters(self, lines: list, name: str, help_text: str, label_names: tuple, index: dict) -> None:
+        lines.append('# HELP {} {}'.format(name, help_text))
+        lines.append('# TYPE {} counter'.format(name))
+        for key, count in sorted(index.items(), key=lambda item: str(item[0])):
+            lines.append('{}{{{}}} {}'.format(name, self._labels(label_names, key), count))
+
+
+METRICS = Metrics(enabled=os.environ.get('RFID_METRICS', '1') != '0')
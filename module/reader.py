@@ -1,85 +1,375 @@
 import ctypes
+import functools
 import os
+import threading
+import time
 
-__all__ = ('Reader',)
+from error_codes import error_codes
+from hooks import HOOKS
+from metrics import METRICS
 
+__all__ = ('Reader', 'get_library', 'load_library', 'set_backend')
 
-RFID_LIB = ctypes.CDLL(os.getcwd() + r'\RFID.dll')  # подключение библиотеки для работы с RFID-ридером
-# определение возвращаемых функциями типов данных
-RFID_LIB.new_reader.restype = ctypes.c_void_p  # WARN: хранение FEDM_ISCReaderModule* в void*
-RFID_LIB.connect_reader.restype = ctypes.c_int
-RFID_LIB.inventory.restype = ctypes.c_int
-RFID_LIB.read_tag.restype = ctypes.c_int
-RFID_LIB.write_tag.restype = ctypes.c_int
-RFID_LIB.get_error_text.restype = ctypes.c_char_p
+# путь к RFID.dll; по умолчанию библиотека ищется рядом с модулем
+RFID_LIB_PATH = os.environ.get('RFID_LIB_PATH') \
+    or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'RFID.dll')
+# библиотека для работы с RFID-ридером; подключается при первом обращении к оборудованию (см. get_library)
+RFID_LIB = None
+# функции RFID.dll, без которых возможна работа с ридером через read_tag, write_tag и inventory
+OPTIONAL_FUNCTIONS = ('inventory_ex', 'get_inventory', 'set_table_size', 'read_tags_batch', 'write_tags_batch')
 
-DEF_AMOUNT_OF_TAGS = 10  # количество меток на паллете по умолчанию
+
+def load_library(path: str) -> ctypes.CDLL:
+    """Подключает библиотеку для работы с RFID-ридером и определяет возвращаемые её функциями типы данных"""
+    lib = ctypes.CDLL(path)
+    lib.new_reader.restype = ctypes.c_void_p  # WARN: хранение FEDM_ISCReaderModule* в void*
+    lib.connect_reader.restype = ctypes.c_int
+    lib.inventory.restype = ctypes.c_int
+    lib.read_tag.restype = ctypes.c_int
+    lib.write_tag.restype = ctypes.c_int
+    lib.get_error_text.restype = ctypes.c_char_p
+    # функции, которых нет в RFID.dll, собранной до их добавления; без них Reader использует функции выше
+    for name in OPTIONAL_FUNCTIONS:
+        if hasattr(lib, name):
+            getattr(lib, name).restype = ctypes.c_int
+    return lib
+
+
+def _has(lib, name: str) -> bool:
+    """Есть ли в библиотеке функция name (см. OPTIONAL_FUNCTIONS)"""
+    return getattr(lib, name, None) is not None
+
+
+def get_library():
+    """
+    Возвращает библиотеку для работы с ридерами, подключая её при первом вызове
+    Переменные окружения:
+        - RFID_BACKEND=simulator: вместо RFID.dll используется simulator.SimulatedLib
+        - RFID_LIB_PATH: путь к RFID.dll
+    """
+    global RFID_LIB
+    if RFID_LIB is None:
+        if os.environ.get('RFID_BACKEND') == 'simulator':
+            from simulator import SimulatedLib
+            RFID_LIB = SimulatedLib()
+        else:
+            RFID_LIB = load_library(RFID_LIB_PATH)
+    return RFID_LIB
+
+
+def set_backend(backend) -> None:
+    """
+    Заменяет библиотеку, через которую ведётся работа с ридерами
+    Принимает:
+        - backend: объект с теми же функциями, что и RFID.dll (например, simulator.SimulatedLib())
+    Ридеры, обращавшиеся к оборудованию до замены, продолжают работать через предыдущую библиотеку
+    """
+    global RFID_LIB
+    RFID_LIB = backend
+
+
+# фрагменты текста, которым FEIG SDK отвечает на неизвестный ему код ошибки
+UNKNOWN_ERROR_MARKERS = ('unknown error code', 'Unknown Errorcode', 'Unknown error code', 'Unknown Program Error')
+INVALID_ERROR_TEXT = 'Невалидный код ошибки: {0}'
+
+
+def _is_known_error_text(text: str) -> bool:
+    return len(text) > 0 and not any(marker in text for marker in UNKNOWN_ERROR_MARKERS)
+
+
+# тексты ошибок по кодам: строятся один раз из таблицы error_codes.py (см. gen_error_codes.py),
+# к библиотеке обращаются только за кодами, которых в таблице нет, и запоминают ответ
+ERROR_TEXTS = {code: text for code, text in error_codes.items() if _is_known_error_text(text)}
+
+
+DEF_AMOUNT_OF_TAGS = 10  # количество меток на паллете по умолчанию (начальный размер буфера под идентификаторы)
+DEF_TABLE_SIZE = 100  # размер таблицы меток ридера по умолчанию (см. connect_reader в dllmain.cpp)
 TAG_SIZE = 224  # объём доступной памяти для записи в используемый тип меток
+TAG_ID_SIZE = 32  # размер буфера под идентификатор одной метки
 
-# TODO
-# (пока не действует)
 # Принципы работы:
-# экземпляр класса FEDM_ISCReaderModule создаётся при коннекте ридера и удаляется при дисконнекте
+# экземпляр класса FEDM_ISCReaderModule создаётся при первом обращении к оборудованию (как правило, при коннекте)
+# TODO: удалять экземпляр FEDM_ISCReaderModule при дисконнекте
 
 # TODO: cписок ошибок ридера - в отдельный файл
 
 
+def _locked(method):
+    """Декоратор: выполняет метод ридера под его блокировкой (обращения к библиотеке и общим буферам)"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _r_code(result) -> int:
+    """Код результата для трассировки: код ошибки или 0"""
+    return result if isinstance(result, int) else 0
+
+
+def _traced(operation: str):
+    """Декоратор: сообщает о начале и окончании операции ридера (layer='reader', см. hooks.py)"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not HOOKS.enabled:
+                return method(self, *args, **kwargs)
+            tag_id = args[0] if operation in ('read_tag', 'write_tag') else None
+            return HOOKS.call('reader', operation, self.name, tag_id, _r_code, method, (self,) + args, kwargs)
+        return wrapper
+    return decorator
+
+
+def _measured(operation: str):
+    """
+    Декоратор: учитывает в метриках (см. metrics.py) длительность обращения к библиотеке и возвращённые коды ошибок
+    и сообщает о начале и окончании обращения (layer='library', см. hooks.py)
+    Принимает:
+        - operation (str): название операции в метриках
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not METRICS.enabled and not HOOKS.enabled:
+                return method(self, *args, **kwargs)
+            span = None
+            if HOOKS.enabled:
+                span = HOOKS.start('library', operation, self.name,
+                                   args[0] if operation in ('read_tag', 'write_tag') else None)
+            start = time.perf_counter()
+            try:
+                result = method(self, *args, **kwargs)
+            except BaseException as e:
+                if span is not None:
+                    HOOKS.finish(span, error=e)
+                raise
+            duration = time.perf_counter() - start
+            if span is not None:
+                HOOKS.finish(span, _r_code(result))
+            if not METRICS.enabled:
+                return result
+            if isinstance(result, int):
+                r_codes = (result,) if result != 0 else ()
+            elif isinstance(result, tuple):  # пакетные операции и инвентаризация
+                r_codes = tuple(r_code for r_code in result if isinstance(r_code, int) and r_code != 0)
+                if operation == 'inventory':
+                    METRICS.observe_tags(self.name, len(result))
+            else:
+                r_codes = ()
+            METRICS.observe_call(self.name, operation, duration, r_codes)
+            return result
+        return wrapper
+    return decorator
+
+
 class Reader(object):
     """Класс для управления ридером"""
-    def __init__(self, bus_addr: int, port_number: int):
-        self.bus_addr = bus_addr  # адрес шины
-        self.port_number = port_number  # номер COM-порта
-        self.connected = False
-        self._reader = RFID_LIB.new_reader()  # указатель на объект ридера или None
+    def __init__(self, bus_addr: int, port_number: int, table_size: int = DEF_TABLE_SIZE):
+        # функция, вызываемая при изменении адреса или состояния ридера: observer(ридер, атрибут, старое, новое)
+        # (используется индексами реестра ридеров, см. index.py)
+        self.observer = None
+        self.reader_id = None  # идентификатор ридера в реестре (задаётся индексами реестра, см. index.py)
+        self._bus_addr = bus_addr  # адрес шины
+        self._port_number = port_number  # номер COM-порта
+        self.table_size = table_size  # максимальное количество меток за одну инвентаризацию
+        self._connected = False
+        # блокировка ридера: обращения к одному ридеру из разных потоков выполняются по очереди,
+        # к разным ридерам — параллельно (ctypes отпускает GIL на время вызова библиотеки)
+        self.lock = threading.RLock()
+        self._reader = None  # указатель на объект ридера; создаётся при первом обращении к оборудованию
+        self._lib = None  # библиотека, создавшая объект ридера
+        # буферы для обмена данными с библиотекой; создаются при первом обращении и переиспользуются между вызовами
+        self._tag_ids_buf = None  # непрерывная область под идентификаторы меток
+        self._tag_ids_ptrs = None  # массив указателей на ячейки _tag_ids_buf (unsigned char ** в dllmain.cpp)
+        self._tag_ids_capacity = 0  # количество ячеек в _tag_ids_buf
+        self._tag_data_buf = None  # буфер под данные одной метки
+        self._batch_data_buf = None  # буфер под данные нескольких меток (пакетные операции)
+        self._batch_r_codes = None  # коды результатов пакетных операций по каждой метке
+        self._batch_capacity = 0  # количество меток, на которое рассчитаны буферы пакетных операций
+
+    def _notify(self, attr: str, old, new) -> None:
+        if self.observer is not None and old != new:
+            self.observer(self, attr, old, new)
+
+    @property
+    def bus_addr(self) -> int:
+        """Адрес шины"""
+        return self._bus_addr
+
+    @bus_addr.setter
+    def bus_addr(self, value: int):
+        old, self._bus_addr = self._bus_addr, value
+        self._notify('bus_addr', old, value)
 
-    # @property
-    # def connected(self):
-    #     """Подключен ли ридер"""
-    #     return self._reader is not None
+    @property
+    def port_number(self) -> int:
+        """Номер COM-порта"""
+        return self._port_number
+
+    @port_number.setter
+    def port_number(self, value: int):
+        old, self._port_number = self._port_number, value
+        self._notify('port_number', old, value)
+
+    @property
+    def connected(self) -> bool:
+        """Подключен ли ридер"""
+        return self._connected
+
+    @connected.setter
+    def connected(self, value: bool):
+        old, self._connected = self._connected, value
+        self._notify('connected', old, value)
+
+    @property
+    def name(self) -> str:
+        """Идентификатор ридера в реестре или, если ридер не добавлен в реестр, адрес (номер_порта:адрес_шины)"""
+        if self.reader_id is not None:
+            return self.reader_id
+        return '{}:{}'.format(self.port_number, self.bus_addr)
 
     def __del__(self):
-        self.disconnect()
+        if self._reader is not None:
+            self.disconnect()
 
     def __repr__(self):
         return 'Reader(bus_addr={!r}, port_number={!r})/{}/'\
             .format(self.bus_addr, self.port_number, 'connected' if self.connected else 'disconnected')
 
+    def _handle(self) -> int:
+        """Возвращает указатель на объект ридера, создавая его при первом вызове"""
+        if self._reader is None:
+            with self.lock:
+                if self._reader is None:
+                    self._lib = get_library()
+                    self._reader = self._lib.new_reader()
+        return self._reader
+
+    def _library(self):
+        """Возвращает библиотеку, которой принадлежит объект ридера"""
+        self._handle()
+        return self._lib
+
+    @_locked
+    @_measured('connect')
     def connect(self) -> int:
         """Производит соединение с ридером"""
-        r_code = RFID_LIB.connect_reader(
-            self._reader,
+        r_code = self._library().connect_reader(
+            self._handle(),
             ctypes.c_ubyte(self.bus_addr),  # c_ubyte = unsigned char
             ctypes.c_int(self.port_number),
         )
+        if r_code == 0 and self.table_size != DEF_TABLE_SIZE and _has(self._library(), 'set_table_size'):
+            r_code = self._library().set_table_size(self._handle(), ctypes.c_int(self.table_size))
         if r_code == 0:
             self.connected = True
             return 0
         else:
             return r_code
 
+    @_locked
+    @_measured('disconnect')
     def disconnect(self) -> int:
         """Производит разъединение с ридером"""
-        RFID_LIB.disconnect_reader(self._reader)
+        if self._reader is not None:
+            self._lib.disconnect_reader(self._reader)
         self.connected = False
         # self._reader = None  # удаляем экземпляр ридера
         return 0
 
+    def _tag_data_buffer(self) -> ctypes.Array:
+        """Возвращает буфер под данные метки, создавая его при первом вызове"""
+        if self._tag_data_buf is None:
+            self._tag_data_buf = ctypes.create_string_buffer(TAG_SIZE)
+        return self._tag_data_buf
+
+    def _batch_buffers(self, capacity: int) -> None:
+        """Увеличивает буферы пакетных операций до capacity меток (буферы никогда не уменьшаются)"""
+        if capacity <= self._batch_capacity:
+            return
+        self._batch_data_buf = ctypes.create_string_buffer(TAG_SIZE * capacity)
+        self._batch_r_codes = (ctypes.c_int * capacity)()
+        self._batch_capacity = capacity
+
+    def _tag_ids_buffers(self, capacity: int) -> None:
+        """Увеличивает буфер под идентификаторы меток до capacity ячеек (буфер никогда не уменьшается)"""
+        if capacity <= self._tag_ids_capacity:
+            return
+        self._tag_ids_buf = ctypes.create_string_buffer(TAG_ID_SIZE * capacity)
+        address = ctypes.addressof(self._tag_ids_buf)
+        self._tag_ids_ptrs = (ctypes.c_void_p * capacity)(*(address + i * TAG_ID_SIZE for i in range(capacity)))
+        self._tag_ids_capacity = capacity
+
+    @_locked
+    @_measured('inventory')
     def inventory(self) -> tuple or int:
         """
-        Возвращает идентификаторы меток
+        Возвращает идентификаторы всех меток в зоне действия антенны (но не больше table_size)
+        Буфер под идентификаторы расширяется по мере необходимости, при этом повторной инвентаризации не происходит
         Возвращает:
             - (tuple) - идентификаторы меток
             - (int) - код ошибки
         """
-        tag_ids = (ctypes.c_char_p * DEF_AMOUNT_OF_TAGS)()
-        tag_ids[:] = tuple(('\0' * 32).encode('utf-8') for _ in range(DEF_AMOUNT_OF_TAGS))
+        lib = self._library()
+        if not _has(lib, 'inventory_ex'):
+            return self._inventory_legacy(lib)
+        self._tag_ids_buffers(min(DEF_AMOUNT_OF_TAGS, self.table_size))
+        capacity = self._tag_ids_capacity
+        tag_count = ctypes.c_int(0)
+
+        r_code = lib.inventory_ex(self._handle(), self._tag_ids_ptrs, ctypes.c_int(capacity), ctypes.byref(tag_count))
+        if r_code != 0:
+            return r_code
 
-        r_code = RFID_LIB.inventory(self._reader, tag_ids)
+        tag_count = min(tag_count.value, self.table_size)
+        if tag_count > capacity:
+            # не все идентификаторы поместились: дочитываем их из таблицы ридера
+            self._tag_ids_buffers(min(max(tag_count, capacity * 2), self.table_size))
+            lib.get_inventory(self._handle(), self._tag_ids_ptrs, ctypes.c_int(self._tag_ids_capacity))
+
+        raw = self._tag_ids_buf.raw
+        tag_ids = (raw[i:i + TAG_ID_SIZE].split(b'\0', 1)[0] for i in range(0, TAG_ID_SIZE * tag_count, TAG_ID_SIZE))
+        return tuple(tag_id.decode('ascii') for tag_id in tag_ids if tag_id)
+
+    def _inventory_legacy(self, lib) -> tuple or int:
+        """Инвентаризация через функцию inventory (RFID.dll без inventory_ex): количество меток не возвращается"""
+        # inventory записывает все идентификаторы из таблицы ридера, не проверяя размер массива: буфер выделяется под
+        # всю таблицу; без set_table_size её размер в библиотеке — DEF_TABLE_SIZE, независимо от table_size
+        self._tag_ids_buffers(max(self.table_size, DEF_TABLE_SIZE))
+        ctypes.memset(ctypes.addressof(self._tag_ids_buf), 0, TAG_ID_SIZE * self._tag_ids_capacity)
+        r_code = lib.inventory(self._handle(), self._tag_ids_ptrs)
+        if r_code != 0:
+            return r_code
+        raw = self._tag_ids_buf.raw
+        tag_ids = (raw[i:i + TAG_ID_SIZE].split(b'\0', 1)[0]
+                   for i in range(0, TAG_ID_SIZE * self._tag_ids_capacity, TAG_ID_SIZE))
+        return tuple(tag_id.decode('ascii') for tag_id in tag_ids if tag_id)[:self.table_size]
+
+    @_locked
+    @_measured('read_tag')
+    def read_tag_bytes(self, tag_id: str or bytes, copy: bool = True) -> bytes or memoryview or int:
+        """
+        Возвращает данные с метки без перекодирования
+        Принимает:
+            - tag_id (str or bytes): идентификатор метки
+            - copy (bool): если False, возвращается memoryview на внутренний буфер ридера,
+              действительный до следующего обращения к ридеру
+        Возвращает:
+            - (bytes or memoryview) - информация с метки (TAG_SIZE байт)
+            - (int) - код ошибки
+        """
+        if isinstance(tag_id, str):
+            tag_id = tag_id.encode('ascii')
+        buf = self._tag_data_buffer()
+
+        r_code = self._library().read_tag(self._handle(), ctypes.c_char_p(tag_id), buf)
         if r_code == 0:
-            return tuple(tag_id.decode('ascii') for tag_id in tag_ids)
+            return buf.raw if copy else memoryview(buf).cast('B')
         else:
             return r_code
 
+    @_traced('read_tag')
     def read_tag(self, tag_id: str) -> str or int:
         """
         Возвращает данные с метки
@@ -89,39 +379,160 @@ class Reader(object):
             - (str) - информация с метки
             - (int) - код ошибки
         """
-        tag_id = tag_id.encode('ascii')
-        tag_data = ('\0' * TAG_SIZE).encode('cp866')
+        tag_data = self.read_tag_bytes(tag_id)
+        if isinstance(tag_data, int):
+            return tag_data
+        return tag_data.decode('cp866')
 
-        r_code = RFID_LIB.read_tag(self._reader, ctypes.c_char_p(tag_id), ctypes.c_char_p(tag_data))
-        if r_code == 0:
-            return tag_data.decode('cp866')
-        else:
-            return r_code
+    @_locked
+    @_measured('read_tags_batch')
+    def read_tags_batch_bytes(self, tag_ids) -> tuple or int:
+        """
+        Возвращает данные с нескольких меток без перекодирования за одно обращение к библиотеке
+        Принимает:
+            - tag_ids (list or tuple): идентификаторы меток (str or bytes)
+        Возвращает:
+            - (tuple) - для каждой метки в порядке tag_ids: данные (bytes) или код ошибки (int)
+            - (int) - код ошибки, общий для всех меток
+        """
+        count = len(tag_ids)
+        if count == 0:
+            return ()
+        self._batch_buffers(count)
+        serial_numbers = (ctypes.c_char_p * count)(
+            *(tag_id.encode('ascii') if isinstance(tag_id, str) else tag_id for tag_id in tag_ids)
+        )
+
+        lib = self._library()
+        if _has(lib, 'read_tags_batch'):
+            r_code = lib.read_tags_batch(
+                self._handle(), serial_numbers, ctypes.c_int(count), self._batch_data_buf, self._batch_r_codes
+            )
+            if r_code != 0:
+                return r_code
+        else:  # RFID.dll без пакетных функций: по одному вызову read_tag на метку
+            address = ctypes.addressof(self._batch_data_buf)
+            for i in range(count):
+                self._batch_r_codes[i] = lib.read_tag(
+                    self._handle(), serial_numbers[i], ctypes.c_void_p(address + i * TAG_SIZE)
+                )
 
+        raw = self._batch_data_buf.raw
+        return tuple(
+            raw[i * TAG_SIZE:(i + 1) * TAG_SIZE] if self._batch_r_codes[i] == 0 else self._batch_r_codes[i]
+            for i in range(count)
+        )
+
+    @_traced('read_tags_batch')
+    def read_tags_batch(self, tag_ids) -> tuple or int:
+        """
+        Возвращает данные с нескольких меток за одно обращение к библиотеке
+        Принимает:
+            - tag_ids (list or tuple): идентификаторы меток (str)
+        Возвращает:
+            - (tuple) - для каждой метки в порядке tag_ids: информация с метки (str) или код ошибки (int)
+            - (int) - код ошибки, общий для всех меток
+        """
+        results = self.read_tags_batch_bytes(tag_ids)
+        if isinstance(results, int):
+            return results
+        return tuple(result if isinstance(result, int) else result.decode('cp866') for result in results)
+
+    @_locked
+    @_measured('write_tag')
+    def write_tag_bytes(self, tag_id: str or bytes, data: bytes or bytearray or memoryview) -> int:
+        """
+        Записывает данные в метку без перекодирования
+        Принимает:
+            - tag_id (str or bytes): идентификатор метки
+            - data (bytes-like): данные для записи; лишние байты отбрасываются, недостающие дополняются нулями
+        Возвращает:
+            - (int) - код результата
+        """
+        if isinstance(tag_id, str):
+            tag_id = tag_id.encode('ascii')
+        buf = self._tag_data_buffer()
+
+        data = memoryview(data).cast('B')[:TAG_SIZE]
+        size = len(data)
+        buf[:size] = data
+        ctypes.memset(ctypes.addressof(buf) + size, 0, TAG_SIZE - size)
+
+        r_code = self._library().write_tag(self._handle(), ctypes.c_char_p(tag_id), buf)
+        return r_code
+
+    @_traced('write_tag')
     def write_tag(self, tag_id: str, data: str) -> int:
         """
         Записывает данные в метку
         Принимает:
             - tag_id (str): идентификатор метки
-            - data (list or tuple): содержит в себе данные для меток (str)
+            - data (str): данные для метки
         Возвращает:
             - (int) - код результата
         """
-        tag_id = tag_id.encode('ascii')
-        data = data[:TAG_SIZE].ljust(TAG_SIZE, '\0')  # удаляются лишние символы или дополняется нулевыми символами
-        data = data.encode('cp866')
-        r_code = RFID_LIB.write_tag(self._reader, ctypes.c_char_p(tag_id), ctypes.c_char_p(data))
-        return r_code
+        return self.write_tag_bytes(tag_id, data[:TAG_SIZE].encode('cp866'))
+
+    @_locked
+    @_measured('write_tags_batch')
+    def write_tags_batch_bytes(self, tags) -> tuple or int:
+        """
+        Записывает данные в несколько меток без перекодирования за одно обращение к библиотеке
+        Принимает:
+            - tags (list or tuple): пары (идентификатор метки (str or bytes), данные (bytes-like));
+              лишние байты данных отбрасываются, недостающие дополняются нулями
+        Возвращает:
+            - (tuple) - коды результатов для каждой метки в порядке tags
+            - (int) - код ошибки, общий для всех меток
+        """
+        count = len(tags)
+        if count == 0:
+            return ()
+        self._batch_buffers(count)
+        buf = self._batch_data_buf
+        address = ctypes.addressof(buf)
+        ctypes.memset(address, 0, TAG_SIZE * count)
+        serial_numbers = (ctypes.c_char_p * count)()
+        for i, (tag_id, data) in enumerate(tags):
+            serial_numbers[i] = tag_id.encode('ascii') if isinstance(tag_id, str) else tag_id
+            data = memoryview(data).cast('B')[:TAG_SIZE]
+            buf[i * TAG_SIZE:i * TAG_SIZE + len(data)] = data
+
+        lib = self._library()
+        if _has(lib, 'write_tags_batch'):
+            r_code = lib.write_tags_batch(self._handle(), serial_numbers, ctypes.c_int(count), buf, self._batch_r_codes)
+            if r_code != 0:
+                return r_code
+        else:  # RFID.dll без пакетных функций: по одному вызову write_tag на метку
+            for i in range(count):
+                self._batch_r_codes[i] = lib.write_tag(
+                    self._handle(), serial_numbers[i], ctypes.c_void_p(address + i * TAG_SIZE)
+                )
+        return tuple(self._batch_r_codes[:count])
+
+    @_traced('write_tags_batch')
+    def write_tags_batch(self, tags: dict) -> tuple or int:
+        """
+        Записывает данные в несколько меток за одно обращение к библиотеке
+        Принимает:
+            - tags (dict): {идентификатор метки (str): данные для метки (str)}
+        Возвращает:
+            - (tuple) - коды результатов для каждой метки в порядке tags
+            - (int) - код ошибки, общий для всех меток
+        """
+        return self.write_tags_batch_bytes(
+            tuple((tag_id, data[:TAG_SIZE].encode('cp866')) for tag_id, data in tags.items())
+        )
 
     def get_error_text(self, code: int) -> str:
         """Возвращает текст ошибки по соответствующему коду"""
-        text = RFID_LIB.get_error_text(self._reader, ctypes.c_int(code)).decode('ascii')
-        if len(text) == 0 or \
-           'unknown error code' in text or \
-           'Unknown Errorcode' in text or \
-           'Unknown error code' in text or \
-           'Unknown Program Error' in text:
-            text = 'Невалидный код ошибки: {0}'.format(code)
+        text = ERROR_TEXTS.get(code)
+        if text is None:  # кода нет в таблице: запрос к библиотеке
+            with self.lock:  # как и остальные обращения к библиотеке по дескриптору ридера
+                text = self._library().get_error_text(self._handle(), ctypes.c_int(code)).decode('ascii')
+            if not _is_known_error_text(text):
+                text = INVALID_ERROR_TEXT.format(code)
+            ERROR_TEXTS[code] = text
         return text
 
 
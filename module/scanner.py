@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Фоновая непрерывная инвентаризация
+
+InventoryScanner периодически проводит инвентаризацию одного ридера, хранит текущий набор меток в зоне действия
+антенны и сообщает только об изменениях: метка появилась (arrived) или пропала (departed) — после того, как
+её не было видно missed_rounds инвентаризаций подряд.
+"""
+import logging
+import threading
+import time
+
+__all__ = ('InventoryScanner',)
+
+DEF_SCAN_INTERVAL = 1.0  # период инвентаризации по умолчанию, с
+DEF_MISSED_ROUNDS = 3  # количество инвентаризаций подряд без метки, после которого метка считается ушедшей
+
+
+class InventoryScanner(object):
+    """
+    Фоновая инвентаризация одного ридера
+    Принимает:
+        - reader_id (str): идентификатор ридера (передаётся в события)
+        - inventory: функция без параметров, проводящая инвентаризацию; возвращает tuple с идентификаторами меток,
+          int с кодом ошибки или None, если ридер больше недоступен (сканирование при этом прекращается)
+        - listener: функция, вызываемая для каждого события (dict)
+        - interval (float): период инвентаризации, с
+        - missed_rounds (int): количество инвентаризаций подряд без метки, после которого метка считается ушедшей
+    Формат события:
+        {'event': 'arrived' или 'departed', 'reader_id': ..., 'tag_id': ..., 'time': время UNIX}
+    """
+    def __init__(self, reader_id: str, inventory, listener,
+                 interval=DEF_SCAN_INTERVAL, missed_rounds=DEF_MISSED_ROUNDS):
+        self.reader_id = reader_id
+        self.interval = interval
+        self.missed_rounds = missed_rounds
+        self._inventory = inventory
+        self._listener = listener
+        # {идентификатор метки: количество инвентаризаций подряд, в которых метки не было}
+        # WARN: словарь заменяется целиком после каждой инвентаризации, на месте не изменяется
+        self._tags = {}
+        self.rounds = 0  # количество проведённых инвентаризаций
+        self.errors = 0  # количество инвентаризаций, завершившихся ошибкой
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='scan-{}'.format(reader_id), daemon=True)
+
+    @property
+    def active(self) -> bool:
+        return self._thread.is_alive() and not self._stop_event.is_set()
+
+    @property
+    def tags(self) -> tuple:
+        """Идентификаторы меток, находящихся в зоне действия антенны"""
+        return tuple(self._tags)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        """Останавливает сканирование (текущая инвентаризация будет завершена)"""
+        self._stop_event.set()
+        if wait and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def to_dict(self) -> dict:
+        return {
+            'active': self.active,
+            'interval': self.interval,
+            'missed_rounds': self.missed_rounds,
+            'rounds': self.rounds,
+            'errors': self.errors,
+            'tags': self.tags,
+        }
+
+    def _emit(self, event: str, tag_id: str) -> None:
+        try:
+            self._listener({'event': event, 'reader_id': self.reader_id, 'tag_id': tag_id, 'time': time.time()})
+        except Exception:
+            logging.exception('[InventoryScanner] ошибка в обработчике события')
+
+    def _update(self, tag_ids) -> None:
+        """Обновляет набор меток по результатам инвентаризации и сообщает об изменениях"""
+        seen = set(tag_ids)
+        tags = {}
+        for tag_id, missed in self._tags.items():
+            if tag_id in seen:
+                tags[tag_id] = 0
+            elif missed + 1 < self.missed_rounds:
+                tags[tag_id] = missed + 1
+            else:
+                self._emit('departed', tag_id)
+        for tag_id in tag_ids:
+            if tag_id not in tags:
+                tags[tag_id] = 0
+                self._emit('arrived', tag_id)
+        self._tags = tags
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            started = time.monotonic()
+            try:
+                result = self._inventory()
+            except Exception:
+                logging.exception('[InventoryScanner] ошибка инвентаризации ридера %s', self.reader_id)
+                result = -1
+            if result is None:  # ридер отключён или удалён
+                self._stop_event.set()
+                break
+            self.rounds += 1
+            if isinstance(result, int):  # ошибка не считается пропуском меток
+                self.errors += 1
+            else:
+                self._update(result)
+            self._stop_event.wait(max(0.0, self.interval - (time.monotonic() - started)))
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Планировщик команд для ридеров с учётом COM-портов
+
+Несколько ридеров на одной шине RS-485 используют один COM-порт, поэтому обращаться к ним одновременно нельзя,
+а к ридерам на разных портах — можно. Для каждого номера порта заводится отдельный поток-исполнитель со своей
+очередью команд: команды для всех адресов шины этого порта выполняются строго по очереди, команды для разных
+портов — параллельно.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from hooks import HOOKS
+from metrics import METRICS
+
+__all__ = ('PortScheduler',)
+
+
+class _PortWorker(object):
+    """Поток-исполнитель команд для одного COM-порта"""
+    def __init__(self, port_number: int):
+        self.port_number = port_number
+        self.queue = queue.Queue()
+        self.busy = False  # выполняется ли команда в данный момент
+        self.tasks = 0  # количество выполненных команд
+        self.wait_time_total = 0.0  # суммарное время ожидания команд в очереди, с
+        self.wait_time_max = 0.0  # максимальное время ожидания команды в очереди, с
+        self.thread = threading.Thread(target=self._run, name='port-{}'.format(port_number), daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:  # сигнал завершения работы
+                break
+            future, func, args, kwargs, enqueued_at, span = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            wait_time = time.perf_counter() - enqueued_at
+            self.wait_time_total += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+            if METRICS.enabled:
+                METRICS.observe_queue_wait(self.port_number, wait_time)
+            self.busy = True
+            result = error = None
+            try:
+                if span is not None:  # команда выполняется как часть операции вызвавшего потока (см. hooks.py)
+                    with HOOKS.attach(span):
+                        result = func(*args, **kwargs)
+                else:
+                    result = func(*args, **kwargs)
+            except BaseException as e:
+                error = e
+            self.busy = False
+            self.tasks += 1
+            # результат передаётся после обновления статистики, чтобы вызывающий видел её актуальной
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            'queue_depth': self.queue.qsize(),
+            'busy': self.busy,
+            'tasks': self.tasks,
+            'wait_time_avg': self.wait_time_total / self.tasks if self.tasks else 0.0,
+            'wait_time_max': self.wait_time_max,
+        }
+
+
+class PortScheduler(object):
+    """Очереди команд к ридерам: по одному потоку-исполнителю на каждый номер COM-порта"""
+    def __init__(self):
+        self._workers = {}  # {номер порта: _PortWorker}
+        self._lock = threading.Lock()
+
+    def _worker(self, port_number: int) -> _PortWorker:
+        with self._lock:
+            worker = self._workers.get(port_number)
+            if worker is None:
+                worker = self._workers[port_number] = _PortWorker(port_number)
+            return worker
+
+    def submit(self, port_number: int, func, *args, **kwargs) -> Future:
+        """
+        Ставит команду в очередь COM-порта
+        Принимает:
+            - port_number (int): номер COM-порта ридера
+            - func: функция, обращающаяся к ридеру; *args, **kwargs - её параметры
+        Возвращает:
+            - (Future) - результат выполнения команды
+        """
+        future = Future()
+        span = HOOKS.current() if HOOKS.enabled else None
+        self._worker(port_number).queue.put((future, func, args, kwargs, time.perf_counter(), span))
+        return future
+
+    def call(self, port_number: int, func, *args, **kwargs):
+        """
+        Выполняет команду в очереди COM-порта и возвращает её результат
+        Если вызвана из потока-исполнителя того же порта, команда выполняется сразу (без постановки в очередь)
+        """
+        worker = self._worker(port_number)
+        if threading.current_thread() is worker.thread:
+            return func(*args, **kwargs)
+        return self.submit(port_number, func, *args, **kwargs).result()
+
+    def in_worker(self, port_number: int) -> bool:
+        """Вызвана ли функция из потока-исполнителя COM-порта port_number"""
+        worker = self._workers.get(port_number)
+        return worker is not None and threading.current_thread() is worker.thread
+
+    def stats(self) -> dict:
+        """
+        Возвращает состояние очередей по каждому COM-порту:
+        {номер порта: {'queue_depth': ..., 'busy': ..., 'tasks': ..., 'wait_time_avg': ..., 'wait_time_max': ...}}
+        """
+        with self._lock:
+            workers = tuple(self._workers.values())
+        return {worker.port_number: worker.stats() for worker in workers}
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Останавливает потоки-исполнители после выполнения уже поставленных в очередь команд"""
+        with self._lock:
+            workers = tuple(self._workers.values())
+            self._workers = {}
+        for worker in workers:
+            worker.queue.put(None)
+        if wait:
+            for worker in workers:
+                worker.thread.join()
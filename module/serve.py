@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""
+Запуск веб-сервера (server.py) для постоянной работы
+
+Вместо отладочного сервера Flask (app.run(debug=True): один поток, перезапуск при изменении файлов) запросы
+обрабатываются пулом из заданного количества потоков, а соединения остаются открытыми между запросами (keep-alive).
+Все потоки работают в одном процессе: ридеры, их очереди команд и кэш меток существуют в единственном экземпляре,
+а COM-порт может быть открыт только одним процессом, поэтому несколько процессов-обработчиков не используются.
+
+При получении сигнала завершения (Ctrl+C, SIGTERM) сервер прекращает приём соединений, дожидается окончания
+обрабатываемых запросов (не дольше graceful_timeout секунд), закрывает простаивающие соединения, отключает ридеры
+и записывает изменённые настройки (см. Readers.shutdown).
+
+    python serve.py --host 0.0.0.0 --port 5000 --threads 32
+    python serve.py --debug    # отладочный сервер Flask
+
+Параметры по умолчанию задаются переменными окружения RFID_HOST, RFID_PORT, RFID_THREADS, RFID_KEEP_ALIVE,
+RFID_GRACEFUL_TIMEOUT.
+"""
+import argparse
+import logging
+import os
+import queue
+import signal
+import socket
+import threading
+import time
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from logic import Readers
+
+__all__ = ('ThreadPoolWSGIServer', 'serve')
+
+DEF_HOST = '127.0.0.1'  # адрес, на котором принимаются соединения
+DEF_PORT = 5000
+DEF_THREADS = 16  # количество потоков, обрабатывающих запросы
+DEF_KEEP_ALIVE = 5.0  # время ожидания следующего запроса в открытом соединении, с (0 — соединения не сохраняются)
+DEF_BACKLOG = 128  # длина очереди соединений, ещё не принятых сервером
+DEF_GRACEFUL_TIMEOUT = 10.0  # время ожидания окончания обрабатываемых запросов при завершении работы, с
+
+
+class _RequestHandler(WSGIRequestHandler):
+    """Обработчик соединения: отмечает время обработки запроса и закрывает соединение при остановке сервера"""
+    access_log = False  # выводить ли в лог каждый запрос
+
+    def run_wsgi(self):
+        self.server._set_busy(self.connection, True)
+        try:
+            return super().run_wsgi()
+        finally:
+            self.server._set_busy(self.connection, False)
+
+    def handle_one_request(self):
+        super().handle_one_request()
+        if self.server.stopping:
+            self.close_connection = True
+
+    def log_request(self, *args, **kwargs):
+        if self.access_log:
+            super().log_request(*args, **kwargs)
+
+
+class ThreadPoolWSGIServer(BaseWSGIServer):
+    """
+    WSGI-сервер, обрабатывающий соединения пулом потоков
+    Соединение занимает поток, пока открыто (в том числе между запросами в пределах keep_alive секунд и на всё время
+    потока событий /events/stream/); соединения сверх количества потоков ожидают в очереди
+    Принимает:
+        - host (str), port (int): адрес, на котором принимаются соединения (port=0 — любой свободный)
+        - app: WSGI-приложение
+        - threads (int): количество потоков
+        - keep_alive (float): время ожидания следующего запроса в открытом соединении, с; 0 — закрывать соединение
+          после каждого запроса
+        - backlog (int): длина очереди соединений, ещё не принятых сервером
+        - access_log (bool): выводить ли в лог каждый запрос
+    """
+    multithread = True
+
+    def __init__(self, host: str, port: int, app, threads: int = DEF_THREADS, keep_alive: float = DEF_KEEP_ALIVE,
+                 backlog: int = DEF_BACKLOG, access_log: bool = False):
+        self.request_queue_size = backlog
+        handler = type('RequestHandler', (_RequestHandler,), {
+            'protocol_version': 'HTTP/1.1' if keep_alive > 0 else 'HTTP/1.0',
+            'timeout': keep_alive if keep_alive > 0 else None,
+            'access_log': access_log,
+        })
+        super().__init__(host, port, app, handler)
+        self.stopping = False
+        self._queue = queue.Queue()  # принятые соединения, ожидающие свободного потока
+        # {сокет соединения: True — обрабатывается запрос, False — ожидается следующий запрос, None — первый запрос}
+        self._connections = {}
+        self._condition = threading.Condition()
+        self._workers = [threading.Thread(target=self._work, name='http-{}'.format(number), daemon=True)
+                         for number in range(threads)]
+        for worker in self._workers:
+            worker.start()
+
+    def process_request(self, request, client_address):
+        self._queue.put((request, client_address))
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            if item is None:  # сигнал завершения работы
+                break
+            request, client_address = item
+            with self._condition:
+                self._connections[request] = None
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                with self._condition:
+                    del self._connections[request]
+                    self._condition.notify_all()
+                self.shutdown_request(request)
+
+    def _set_busy(self, connection, busy: bool) -> None:
+        with self._condition:
+            self._connections[connection] = busy
+            self._condition.notify_all()
+
+    def stop(self, timeout: float = DEF_GRACEFUL_TIMEOUT) -> bool:
+        """
+        Прекращает приём соединений, дожидается окончания обрабатываемых запросов (не дольше timeout секунд)
+        и закрывает простаивающие соединения
+        Вызывается из потока, отличного от выполняющего serve_forever
+        Возвращает:
+            - (bool) - все ли соединения закрыты до истечения timeout
+        """
+        self.stopping = True
+        self.shutdown()
+        self.server_close()
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._connections or not self._queue.empty():
+                for connection, busy in self._connections.items():
+                    if busy is False:  # соединение ожидает следующего запроса
+                        try:
+                            connection.shutdown(socket.SHUT_RDWR)
+                        except OSError:
+                            pass
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(min(remaining, 0.1))
+            finished = not self._connections
+        for _ in self._workers:
+            self._queue.put(None)
+        return finished
+
+
+def serve(app, host: str = DEF_HOST, port: int = DEF_PORT, threads: int = DEF_THREADS,
+          keep_alive: float = DEF_KEEP_ALIVE, backlog: int = DEF_BACKLOG,
+          graceful_timeout: float = DEF_GRACEFUL_TIMEOUT, access_log: bool = False) -> None:
+    """
+    Запускает сервер и обрабатывает запросы до получения сигнала завершения (SIGINT, SIGTERM, в Windows — SIGBREAK),
+    после чего останавливает сервер, отключает ридеры и записывает изменённые настройки
+    Параметры — см. ThreadPoolWSGIServer; graceful_timeout — время ожидания окончания обрабатываемых запросов, с
+    """
+    server = ThreadPoolWSGIServer(host, port, app, threads, keep_alive, backlog, access_log)
+    stopper = threading.Thread(target=server.stop, args=(graceful_timeout,), name='http-stop')
+
+    def on_signal(signum, frame):
+        if not stopper.is_alive() and not server.stopping:
+            stopper.start()
+
+    for name in ('SIGINT', 'SIGTERM', 'SIGBREAK'):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), on_signal)
+
+    print('Сервер запущен: http://{}:{}/ (потоков: {}, keep-alive: {:g} с)'.format(
+        host, server.server_port, threads, keep_alive))
+    server.serve_forever()
+    stopper.join()
+    if server._connections:
+        logging.warning('[serve] соединений не закрыто за %g с: %d', graceful_timeout, len(server._connections))
+    Readers.shutdown()
+    print('Сервер остановлен')
+
+
+def main(app=None):
+    if app is None:
+        from server import app
+
+    parser = argparse.ArgumentParser(description='Запуск веб-сервера RFID-модуля')
+    parser.add_argument('--host', default=os.environ.get('RFID_HOST', DEF_HOST),
+                        help='адрес, на котором принимаются соединения (0.0.0.0 — все адреса)')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('RFID_PORT', DEF_PORT)))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('RFID_THREADS', DEF_THREADS)),
+                        help='количество потоков, обрабатывающих запросы')
+    parser.add_argument('--keep-alive', type=float, default=float(os.environ.get('RFID_KEEP_ALIVE', DEF_KEEP_ALIVE)),
+                        help='время ожидания следующего запроса в открытом соединении, с (0 — не сохранять '
+                             'соединения)')
+    parser.add_argument('--backlog', type=int, default=DEF_BACKLOG,
+                        help='длина очереди соединений, ещё не принятых сервером')
+    parser.add_argument('--graceful-timeout', type=float,
+                        default=float(os.environ.get('RFID_GRACEFUL_TIMEOUT', DEF_GRACEFUL_TIMEOUT)),
+                        help='время ожидания окончания обрабатываемых запросов при завершении работы, с')
+    parser.add_argument('--access-log', action='store_true', help='выводить в лог каждый запрос')
+    parser.add_argument('--debug', action='store_true', help='запустить отладочный сервер Flask')
+    args = parser.parse_args()
+
+    if args.debug:
+        app.run(host=args.host, port=args.port, debug=True)
+        return
+    serve(app, args.host, args.port, args.threads, args.keep_alive, args.backlog, args.graceful_timeout,
+          args.access_log)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,52 @@
 # -*- coding: utf-8 -*-
+import json
 import os.path
-from flask import Flask, jsonify, request, send_from_directory, redirect, url_for
-from logic import Readers
+import time
+from flask import Flask, Response, g, jsonify, request, send_from_directory, redirect, url_for
+from hooks import HOOKS
+from logic import Readers, Errors
+from metrics import METRICS
 
 # Полезные ссылки:
 # Representational state transfer — https://en.wikipedia.org/wiki/Representational_state_transfer
 
 app = Flask(__name__)
 
+EVENTS_MAX_TIMEOUT = 60.0  # максимальное время ожидания событий в одном запросе (long-poll), с
+EVENTS_HEARTBEAT = 15.0  # период отправки пустых сообщений в поток событий (SSE), чтобы соединение не закрывалось, с
+
+
+def request_route() -> str:
+    """Шаблон URL запроса, например /readers/<reader_id>/"""
+    return request.url_rule.rule if request.url_rule is not None else 'unknown'
+
+
+@app.before_request
+def start_timer():
+    if METRICS.enabled:
+        g.request_start = time.perf_counter()
+    if HOOKS.enabled:
+        g.span = HOOKS.start('http', '{} {}'.format(request.method, request_route()),
+                             (request.view_args or {}).get('reader_id'))
+
+
+@app.after_request
+def record_request(response):
+    """Учитывает длительность и код ответа запроса в метриках"""
+    start = g.get('request_start')
+    if start is not None:
+        METRICS.observe_request(request_route(), request.method, response.status_code, time.perf_counter() - start)
+    g.status_code = response.status_code
+    return response
+
+
+@app.teardown_request
+def finish_span(error):
+    """Завершает операцию запроса (см. hooks.py), в том числе при ошибке обработки"""
+    span = g.pop('span', None)
+    if span is not None:
+        HOOKS.finish(span, g.get('status_code'), error)
+
 
 @app.route('/')
 def index_redirect():
@@ -51,6 +90,9 @@ def add_reader():
     # curl -i -H "Content-Type: application/json" -X POST -d "{"""reader_id""": """1""", """bus_addr""": 1, """port_number""": 1}" http://localhost:5000/readers/
 
     http_code = 201     # создан новый ресурс (с настройками)
+    error = Readers.add_reader.validate(data=request.json)
+    if error is not None:
+        return jsonify(error), 400     # ошибка в запросе, ошибки в названиях полей, передан не json
     response = Readers.add_reader(data=request.json)
 
     if 'error' in response:
@@ -65,9 +107,12 @@ def update_readers():
     # curl -i -H "Content-Type: application/json" -X PUT -d "{"""bus_addr""": 23, """port_number""": 1}" http://localhost:5000/readers/
 
     http_code = 200     # настройки обновлены
+    error = Readers.update_readers.validate(data=request.json)
+    if error is not None:
+        return jsonify(error), 400     # передан не json
     response = Readers.update_readers(data=request.json)
 
-    if 'error' in response:
+    if response.get('error'):
         http_code = 400     # ошибка в запросе, ошибки в названиях полей, передан не json
 
     return jsonify(response), http_code
@@ -106,6 +151,9 @@ def update_reader(reader_id):
     # curl -i -H "Content-Type: application/json" -X PUT -d "{"""reader_id""": """1""", """bus_addr""": 23, """port_number""": 1}" http://localhost:5000/readers/1/
 
     http_code = 200     # настройки обновлены
+    error = Readers.update_reader.validate(reader_id=reader_id, data=request.json)
+    if error is not None:
+        return jsonify(error), 400     # ошибка в запросе, ошибки в названиях полей, передан не json
     response = Readers.update_reader(reader_id=reader_id, data=request.json)
 
     if 'error' in response:
@@ -132,6 +180,45 @@ def delete_reader(reader_id):
     return jsonify(response), http_code
 
 
+@app.route('/ports/', methods=['GET'])
+def get_ports():
+    """Возвращает состояние очередей команд по COM-портам"""
+    # curl -i http://localhost:5000/ports/
+
+    http_code = 200     # состояние возвращено
+    response = Readers.get_ports()
+
+    return jsonify(response), http_code
+
+
+@app.route('/readers/tags/inventory/', methods=['GET'])
+def inventory_all():
+    """Возвращает идентификаторы меток со всех подключенных ридеров"""
+    # curl -i http://localhost:5000/readers/tags/inventory/
+
+    http_code = 200     # идентификаторы возвращены
+    response = Readers.inventory_all()
+
+    return jsonify(response), http_code
+
+
+@app.route('/readers/tags/', methods=['GET'])
+def read_tags_many():
+    """Возвращает информацию с меток нескольких ридеров"""
+    # curl -i -H "Content-Type: application/json" -X GET -d "{"""1""": [], """2""": ["""E004"""]}" http://localhost:5000/readers/tags/
+
+    http_code = 200     # информация возвращена
+    error = Readers.read_tags_many.validate(data=request.json)
+    if error is not None:
+        return jsonify(error), 400     # ошибка в запросе, передан не json
+    response = Readers.read_tags_many(data=request.json)
+
+    if 'error_code' in response.get('error', {}):
+        http_code = 400     # ошибка в запросе, передан не json
+
+    return jsonify(response), http_code
+
+
 # Эта функция, скорее всего, не нужна
 @app.route('/readers/<reader_id>/tags/inventory/', methods=['GET'])
 def inventory(reader_id):
@@ -147,14 +234,71 @@ def inventory(reader_id):
     return jsonify(response), http_code
 
 
+@app.route('/readers/<reader_id>/scan/', methods=['GET'])
+def get_scan(reader_id):
+    """Возвращает состояние фоновой инвентаризации ридера и метки в зоне действия антенны"""
+    # curl -i http://localhost:5000/readers/1/scan/
+
+    http_code = 200     # состояние возвращено
+    response = Readers.get_scan(reader_id=reader_id)
+
+    if 'error' in response:
+        http_code = 404     # Ридер не найден
+
+    return jsonify(response), http_code
+
+
+@app.route('/readers/<reader_id>/scan/', methods=['PUT'])
+def start_scan(reader_id):
+    """Запускает фоновую инвентаризацию ридера"""
+    # curl -i -H "Content-Type: application/json" -X PUT -d "{"""interval""": 0.5, """missed_rounds""": 3}" http://localhost:5000/readers/1/scan/
+
+    http_code = 200     # сканирование запущено
+    data = request.get_json(silent=True) or {}
+    error = Readers.start_scan.validate(reader_id=reader_id, data=data)
+    if error is not None:
+        return jsonify(error), 400     # некорректные параметры сканирования
+    response = Readers.start_scan(reader_id=reader_id, data=data)
+
+    if 'error' in response:
+        if response['error']['error_code'] == Errors.ReaderNotExists.code:
+            http_code = 404     # Ридер не найден
+        else:
+            http_code = 400     # ошибка в запросе, ридер отключён
+
+    return jsonify(response), http_code
+
+
+@app.route('/readers/<reader_id>/scan/', methods=['DELETE'])
+def stop_scan(reader_id):
+    """Останавливает фоновую инвентаризацию ридера"""
+    # curl -i -X DELETE http://localhost:5000/readers/1/scan/
+
+    http_code = 200     # сканирование остановлено
+    response = Readers.stop_scan(reader_id=reader_id)
+
+    if 'error' in response:
+        http_code = 404     # Ридер не найден
+
+    return jsonify(response), http_code
+
+
 @app.route('/readers/<reader_id>/tags/', methods=['GET'])
 def read_tags(reader_id):
     """Возвращает информацию с меток"""
+    # ?max_age=10 — допустимый возраст данных из кэша, с; ?fresh=true — считать данные с меток, минуя кэш
 
     http_code = 200     # информация возвращена
-    response = Readers.read_tags(reader_id=reader_id, data=request.json)
-
-    if 'error' in response:
+    max_age = request.args.get('max_age', type=float)
+    if request.args.get('fresh', '').lower() in ('1', 'true', 'yes'):
+        max_age = 0.0
+    error = Readers.read_tags.validate(reader_id=reader_id, data=request.json, max_age=max_age)
+    if error is not None:
+        return jsonify(error), 400     # некорректные идентификаторы меток
+    response = Readers.read_tags(reader_id=reader_id, data=request.json, max_age=max_age)
+
+    # ошибки отдельных меток ({идентификатор_метки: ошибка}) возвращаются вместе с данными остальных меток
+    if 'error_code' in response.get('error', {}):
         if response['error']['error_code'] == 0:
             http_code = 404     # Ридер не найден
         else:
@@ -168,9 +312,13 @@ def write_tags(reader_id):
     """Записывает информацию в метки"""
 
     http_code = 200     # информация записана
+    error = Readers.write_tags.validate(reader_id=reader_id, data=request.json)
+    if error is not None:
+        return jsonify(error), 400     # некорректные идентификаторы меток или данные для записи
     response = Readers.write_tags(reader_id=reader_id, data=request.json)
 
-    if 'error' in response:
+    # ошибки отдельных меток ({идентификатор_метки: ошибка}) возвращаются вместе с данными остальных меток
+    if 'error_code' in response.get('error', {}):
         if response['error']['error_code'] == 0:
             http_code = 404     # Ридер не найден
         else:
@@ -185,9 +333,13 @@ def clear_tags(reader_id):
     # curl -i -X DELETE http://localhost:5000/readers/tags/
 
     http_code = 200     # информация удалена
+    error = Readers.write_tags.validate(reader_id=reader_id, data=request.json, clear=True)
+    if error is not None:
+        return jsonify(error), 400     # некорректные идентификаторы меток
     response = Readers.write_tags(reader_id=reader_id, data=request.json, clear=True)
 
-    if 'error' in response:
+    # ошибки отдельных меток ({идентификатор_метки: ошибка}) возвращаются вместе с данными остальных меток
+    if 'error_code' in response.get('error', {}):
         if response['error']['error_code'] == 0:
             http_code = 404     # Ридер не найден
         else:
@@ -196,5 +348,59 @@ def clear_tags(reader_id):
     return jsonify(response), http_code
 
 
+@app.route('/stats/', methods=['GET'])
+def get_stats():
+    """Возвращает статистику объединения обращений к ридерам и кэша данных меток"""
+    # curl -i http://localhost:5000/stats/
+
+    http_code = 200     # статистика возвращена
+    response = Readers.get_stats()
+
+    return jsonify(response), http_code
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Возвращает метрики в текстовом формате Prometheus"""
+    # curl -i http://localhost:5000/metrics
+
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/events/', methods=['GET'])
+def get_events():
+    """Возвращает события, опубликованные после курсора; при их отсутствии ожидает новые события (long-poll)"""
+    # curl -i "http://localhost:5000/events/?cursor=42&timeout=30"
+
+    cursor = request.args.get('cursor', 0, type=int)
+    timeout = min(max(request.args.get('timeout', 0.0, type=float), 0.0), EVENTS_MAX_TIMEOUT)
+    return jsonify(Readers.get_events(cursor=cursor, timeout=timeout)), 200
+
+
+@app.route('/events/stream/', methods=['GET'])
+def stream_events():
+    """Поток событий в формате Server-Sent Events"""
+    # curl -N http://localhost:5000/events/stream/
+    # curl -N -H "Last-Event-ID: 42" http://localhost:5000/events/stream/
+
+    # без курсора передаются только новые события; после переподключения браузер сам передаёт Last-Event-ID
+    cursor = request.headers.get('Last-Event-ID', type=int)
+    if cursor is None:
+        cursor = request.args.get('cursor', Readers.events.cursor, type=int)
+
+    def stream(cursor):
+        yield 'retry: 1000\n\n'
+        while True:
+            events, cursor = Readers.events.get(cursor, EVENTS_HEARTBEAT)
+            if not events:
+                yield ': heartbeat\n\n'
+            for event in events:
+                yield 'id: {}\nevent: {}\ndata: {}\n\n'.format(event['id'], event['event'], json.dumps(event))
+
+    return Response(stream(cursor), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    # пул потоков, keep-alive и корректное завершение работы (см. serve.py); отладочный сервер — с параметром --debug
+    import serve
+    serve.main(app)
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+"""
+Программная имитация библиотеки RFID.dll
+
+Объект SimulatedLib повторяет набор экспортируемых функций RFID.dll (new_reader, connect_reader, disconnect_reader,
+inventory, read_tag, write_tag, get_error_text) с теми же аргументами, поэтому может быть подставлен вместо
+библиотеки в reader.py (см. reader.set_backend или переменную окружения RFID_BACKEND=simulator).
+Используется для нагрузочного тестирования и профилирования без подключенного оборудования.
+"""
+import ctypes
+import random
+import threading
+import time
+
+from error_codes import error_codes
+
+__all__ = ('SimulatedLib',)
+
+SIM_TAG_SIZE = 224  # объём памяти метки (56 блоков по 4 байта, как в dllmain.cpp)
+SIM_UID_LENGTH = 16  # длина идентификатора метки ISO 15693 в шестнадцатеричном виде
+SIM_SNR_SIZE = 32  # размер строки под идентификатор метки (SNR_SIZE в dllmain.cpp)
+SIM_TABLE_SIZE = 100  # размер таблицы меток по умолчанию (DEF_TABLE_SIZE в dllmain.cpp)
+
+# коды ошибок, возвращаемые симулятором в тех же ситуациях, что и FEIG SDK
+SIM_ERROR_NO_READER = -120  # Error in Module FEDM: No reader found
+SIM_ERROR_NOT_CONNECTED = -138  # Error in Module FEDM: Reader object is not connected with a communication port
+SIM_ERROR_TAG_NOT_FOUND = -152  # Error in Module FEDM: TagHandler type could not be identified
+
+
+def _value(arg):
+    """Возвращает значение аргумента, переданного как ctypes-объект или как обычное значение Python"""
+    return arg.value if hasattr(arg, 'value') else arg
+
+
+def _set_out(arg, value) -> None:
+    """Записывает значение в выходной параметр, переданный через ctypes.byref или ctypes.pointer"""
+    obj = arg._obj if hasattr(arg, '_obj') else arg.contents
+    obj.value = value
+
+
+def _address(arg) -> int:
+    """Возвращает адрес буфера, переданного в функцию (c_char_p, create_string_buffer и т.п.)"""
+    return ctypes.cast(arg, ctypes.c_void_p).value
+
+
+class _SimReader(object):
+    """Состояние одного имитируемого ридера"""
+    def __init__(self):
+        self.bus_addr = None
+        self.port_number = None
+        self.connected = False
+        self.table_size = SIM_TABLE_SIZE
+        self.table = ()  # идентификаторы меток, найденные последней инвентаризацией
+
+
+class SimulatedLib(object):
+    """
+    Имитация RFID.dll
+
+    Принимает:
+        - latency (float or dict): задержка каждого вызова в секундах;
+          словарь вида {'inventory': 0.05, 'read_tag': 0.02, ...} задаёт задержку для отдельных функций
+        - tags_per_reader (int): количество меток, создаваемых в поле ридера при первом подключении
+        - error_rate (float): вероятность (0..1) возврата случайной ошибки при вызове функции
+        - error_pool (tuple, необяз.): коды ошибок для случайной подстановки;
+          по умолчанию — все ненулевые коды из error_codes.error_codes
+        - seed (int, необяз.): начальное значение генератора случайных чисел
+    """
+    def __init__(self, latency=0.0, tags_per_reader=10, error_rate=0.0, error_pool=None, seed=None):
+        self.latency = latency
+        self.tags_per_reader = tags_per_reader
+        self.error_rate = error_rate
+        self.error_pool = tuple(error_pool) if error_pool is not None \
+            else tuple(code for code in error_codes if code != 0)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._handles = {}  # {дескриптор: _SimReader}
+        self._next_handle = 1
+        # метки в поле ридеров: {(bus_addr, port_number): {идентификатор метки: данные (bytes)}}
+        self._fields = {}
+        # ошибки, которые будут возвращены следующими вызовами: {имя функции: [код, ...]}
+        self._injected = {}
+        # количество вызовов каждой функции
+        self.calls = {}
+
+    # НАСТРОЙКА СИМУЛЯТОРА
+
+    def set_tags(self, bus_addr: int, port_number: int, tags) -> None:
+        """
+        Задаёт метки в поле ридера
+        Принимает:
+            - bus_addr (int), port_number (int): адрес ридера
+            - tags (dict or iterable): {идентификатор: данные (str or bytes)} или перечень идентификаторов
+        """
+        if not isinstance(tags, dict):
+            tags = dict.fromkeys(tags, b'')
+        field = {}
+        for tag_id, data in tags.items():
+            if isinstance(data, str):
+                data = data.encode('cp866')
+            field[tag_id] = data[:SIM_TAG_SIZE].ljust(SIM_TAG_SIZE, b'\0')
+        with self._lock:
+            self._fields[(bus_addr, port_number)] = field
+
+    def get_tags(self, bus_addr: int, port_number: int) -> dict:
+        """Возвращает копию меток в поле ридера"""
+        with self._lock:
+            return dict(self._fields.get((bus_addr, port_number), {}))
+
+    def inject_error(self, func_name: str, code: int, times: int = 1) -> None:
+        """Заставляет следующие times вызовов функции func_name вернуть код ошибки code"""
+        with self._lock:
+            self._injected.setdefault(func_name, []).extend([code] * times)
+
+    def random_uid(self) -> str:
+        """Возвращает случайный идентификатор метки ISO 15693"""
+        return 'E004' + ''.join(self._random.choice('0123456789ABCDEF') for _ in range(SIM_UID_LENGTH - 4))
+
+    # ВСПОМОГАТЕЛЬНЫЕ МЕТОДЫ
+
+    def _call(self, func_name: str) -> int:
+        """Учитывает вызов, выдерживает задержку и возвращает внедрённый код ошибки (0 при его отсутствии)"""
+        latency = self.latency.get(func_name, 0.0) if isinstance(self.latency, dict) else self.latency
+        if latency:
+            time.sleep(latency)
+        with self._lock:
+            self.calls[func_name] = self.calls.get(func_name, 0) + 1
+            injected = self._injected.get(func_name)
+            if injected:
+                return injected.pop(0)
+            if self.error_rate and self.error_pool and self._random.random() < self.error_rate:
+                return self._random.choice(self.error_pool)
+        return 0
+
+    def _reader(self, handle) -> _SimReader or None:
+        return self._handles.get(_value(handle))
+
+    def _field(self, reader: _SimReader) -> dict:
+        """Возвращает метки в поле ридера, при необходимости заполняя его случайными метками"""
+        key = (reader.bus_addr, reader.port_number)
+        if key not in self._fields:
+            self._fields[key] = {self.random_uid(): b'\0' * SIM_TAG_SIZE for _ in range(self.tags_per_reader)}
+        return self._fields[key]
+
+    # ФУНКЦИИ RFID.dll
+
+    def new_reader(self) -> int:
+        with self._lock:
+            handle = self._next_handle
+            self._next_handle += 1
+            self._handles[handle] = _SimReader()
+        return handle
+
+    def connect_reader(self, handle, bus_addr, port_number) -> int:
+        r_code = self._call('connect_reader')
+        reader = self._reader(handle)
+        if reader is None:
+            return SIM_ERROR_NO_READER
+        if r_code != 0:
+            return r_code
+        with self._lock:
+            reader.bus_addr = _value(bus_addr)
+            reader.port_number = _value(port_number)
+            reader.connected = True
+            reader.table_size = SIM_TABLE_SIZE
+            self._field(reader)
+        return 0
+
+    def disconnect_reader(self, handle) -> None:
+        reader = self._reader(handle)
+        if reader is not None:
+            reader.connected = False
+
+    def inventory(self, handle, snr_array) -> int:
+        r_code = self._call('inventory')
+        reader = self._reader(handle)
+        if reader is None or not reader.connected:
+            return SIM_ERROR_NOT_CONNECTED
+        if r_code != 0:
+            return r_code
+        with self._lock:
+            tag_ids = tuple(self._field(reader))
+        # как и RFID.dll, записывает в переданные строки всю таблицу ридера, не зная размера массива; запись за его
+        # пределы в RFID.dll портит память, здесь — вызывает исключение
+        tag_ids = tag_ids[:reader.table_size]
+        if len(tag_ids) > len(snr_array):
+            raise IndexError('inventory: таблица ридера ({} меток) не помещается в массив из {} строк'.format(
+                len(tag_ids), len(snr_array)))
+        slots = ctypes.cast(snr_array, ctypes.POINTER(ctypes.c_void_p))
+        for idx, tag_id in enumerate(tag_ids):
+            ctypes.memmove(slots[idx], tag_id.encode('ascii'), len(tag_id))
+        return 0
+
+    def set_table_size(self, handle, table_size) -> int:
+        reader = self._reader(handle)
+        if reader is None:
+            return SIM_ERROR_NO_READER
+        reader.table_size = _value(table_size)
+        return 0
+
+    def get_inventory(self, handle, snr_array, capacity) -> int:
+        reader = self._reader(handle)
+        if reader is None:
+            return 0
+        slots = ctypes.cast(snr_array, ctypes.POINTER(ctypes.c_void_p))
+        for idx, tag_id in enumerate(reader.table[:_value(capacity)]):
+            tag_id = tag_id.encode('ascii')[:SIM_SNR_SIZE - 1]
+            ctypes.memmove(slots[idx], tag_id + b'\0', len(tag_id) + 1)
+        return len(reader.table)
+
+    def inventory_ex(self, handle, snr_array, capacity, tag_count) -> int:
+        _set_out(tag_count, 0)
+        r_code = self._call('inventory_ex')
+        reader = self._reader(handle)
+        if reader is None or not reader.connected:
+            return SIM_ERROR_NOT_CONNECTED
+        if r_code != 0:
+            return r_code
+        with self._lock:
+            reader.table = tuple(self._field(reader))[:reader.table_size]
+        _set_out(tag_count, self.get_inventory(handle, snr_array, capacity))
+        return 0
+
+    def read_tag(self, handle, serial_number, read_data) -> int:
+        r_code = self._call('read_tag')
+        reader = self._reader(handle)
+        if reader is None or not reader.connected:
+            return SIM_ERROR_NOT_CONNECTED
+        if r_code != 0:
+            return r_code
+        tag_id = _value(serial_number).decode('ascii')
+        with self._lock:
+            data = self._field(reader).get(tag_id)
+        if data is None:
+            return SIM_ERROR_TAG_NOT_FOUND
+        ctypes.memmove(_address(read_data), data, SIM_TAG_SIZE)
+        return 0
+
+    def read_tags_batch(self, handle, serial_numbers, count, read_data, r_codes) -> int:
+        r_code = self._call('read_tags_batch')
+        reader = self._reader(handle)
+        if reader is None or not reader.connected:
+            return SIM_ERROR_NOT_CONNECTED
+        if r_code != 0:
+            return r_code
+        address = _address(read_data)
+        r_codes = ctypes.cast(r_codes, ctypes.POINTER(ctypes.c_int))
+        with self._lock:
+            field = self._field(reader)
+            for i in range(_value(count)):
+                data = field.get(serial_numbers[i].decode('ascii'))
+                if data is None:
+                    r_codes[i] = SIM_ERROR_TAG_NOT_FOUND
+                else:
+                    ctypes.memmove(address + i * SIM_TAG_SIZE, data, SIM_TAG_SIZE)
+                    r_codes[i] = 0
+        return 0
+
+    def write_tag(self, handle, serial_number, write_data) -> int:
+        r_code = self._call('write_tag')
+        reader = self._reader(handle)
+        if reader is None or not reader.connected:
+            return SIM_ERROR_NOT_CONNECTED
+        if r_code != 0:
+            return r_code
+        tag_id = _value(serial_number).decode('ascii')
+        data = ctypes.string_at(_address(write_data), SIM_TAG_SIZE)
+        with self._lock:
+            field = self._field(reader)
+            if tag_id not in field:
+                return SIM_ERROR_TAG_NOT_FOUND
+            field[tag_id] = data
+        return 0
+
+    def write_tags_batch(self, handle, serial_numbers, count, write_data, r_codes) -> int:
+        r_code = self._call('write_tags_batch')
+        reader = self._reader(handle)
+        if reader is None or not reader.connected:
+            return SIM_ERROR_NOT_CONNECTED
+        if r_code != 0:
+            return r_code
+        address = _address(write_data)
+        r_codes = ctypes.cast(r_codes, ctypes.POINTER(ctypes.c_int))
+        with self._lock:
+            field = self._field(reader)
+            for i in range(_value(count)):
+                tag_id = serial_numbers[i].decode('ascii')
+                if tag_id not in field:
+                    r_codes[i] = SIM_ERROR_TAG_NOT_FOUND
+                else:
+                    field[tag_id] = ctypes.string_at(address + i * SIM_TAG_SIZE, SIM_TAG_SIZE)
+                    r_codes[i] = 0
+        return 0
+
+    def get_error_text(self, handle, code) -> bytes:
+        code = _value(code)
+        text = error_codes.get(code, 'Unknown error code ({})'.format(code))
+        return text.encode('ascii', 'replace')
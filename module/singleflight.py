@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+"""
+Объединение одинаковых одновременных обращений к ридерам
+
+Если несколько клиентов одновременно запрашивают одно и то же (инвентаризацию одного ридера, чтение одних и тех же
+меток), к оборудованию достаточно обратиться один раз. SingleFlight выполняет первый вызов с данным ключом, а
+вызовы с тем же ключом, пришедшие до его завершения, ждут и получают тот же результат.
+"""
+import threading
+from concurrent.futures import Future
+
+__all__ = ('SingleFlight',)
+
+
+class SingleFlight(object):
+    """Выполнение одинаковых одновременных вызовов за одно обращение"""
+    def __init__(self):
+        self._flights = {}  # {ключ: Future выполняемого вызова}
+        self._lock = threading.Lock()
+        self._stats = {}  # {операция: [количество вызовов, количество объединённых вызовов]}
+
+    def do(self, key: tuple, func, *args):
+        """
+        Выполняет func(*args) или, если вызов с тем же ключом уже выполняется, дожидается его результата
+        Принимает:
+            - key (tuple): ключ вызова; первый элемент — название операции (для статистики)
+            - func: функция, *args - её параметры
+        Возвращает:
+            - результат func (исключение, возникшее в func, передаётся всем ожидающим)
+        """
+        with self._lock:
+            stats = self._stats.setdefault(key[0], [0, 0])
+            stats[0] += 1
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = self._flights[key] = Future()
+            else:
+                stats[1] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args)
+        except BaseException as e:
+            self._land(key, future)
+            future.set_exception(e)
+            raise
+        self._land(key, future)
+        future.set_result(result)
+        return result
+
+    def land(self, key: tuple) -> None:
+        """
+        Завершает приём вызовов с ключом key в выполняемый вызов, не дожидаясь его результата: вызовы, пришедшие
+        позже, выполняются заново
+        Вызывается из func, как только результат обращения к оборудованию получен (например, в потоке COM-порта до
+        выполнения следующей команды), чтобы вызов, начатый после следующей команды, не получил устаревший результат
+        """
+        with self._lock:
+            self._flights.pop(key, None)
+
+    def _land(self, key: tuple, future: Future) -> None:
+        # ключ удаляется до передачи результата: вызовы, пришедшие позже, обратятся к оборудованию заново;
+        # если ключ уже снят (land), под ним может выполняться новый вызов — его не удаляем
+        with self._lock:
+            if self._flights.get(key) is future:
+                del self._flights[key]
+
+    def stats(self) -> dict:
+        """Возвращает статистику по операциям: {операция: {'calls': ..., 'shared': ...}}"""
+        with self._lock:
+            return {operation: {'calls': calls, 'shared': shared}
+                    for operation, (calls, shared) in sorted(self._stats.items())}
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+import unittest
+
+from async_readers import AsyncReaders
+from logic import Readers, Errors
+from test_simulator import SimulatedReadersTestCase
+
+
+class TestAsyncReaders(SimulatedReadersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.readers = AsyncReaders()
+
+    def tearDown(self):
+        self.readers.close()
+        super().tearDown()
+
+    def run_async(self, coro):
+        loop = asyncio.new_event_loop()  # asyncio.run появился только в Python 3.7
+        try:
+            return loop.run_until_complete(coro)
+        finally:
+            loop.close()
+
+    def test_inventory(self):
+        response = self.run_async(self.readers.inventory(reader_id='0'))
+        self.assertEqual(response, Readers.inventory(reader_id='0'))
+        response = self.run_async(self.readers.inventory(reader_id='9'))
+        self.assertEqual(response, dict(error=Errors.ReaderNotExists.to_dict()))
+
+    def test_read_write_tags(self):
+        async def scenario():
+            tag_id = (await self.readers.inventory(reader_id='1'))['response'][0]
+            await self.readers.write_tags(reader_id='1', data={tag_id: 'асинхронно'})
+            return tag_id, await self.readers.read_tags(reader_id='1', data=[tag_id])
+        tag_id, response = self.run_async(scenario())
+        self.assertEqual(response['response'][tag_id].rstrip('\0'), 'асинхронно')
+
+    def test_cached_read_skips_port_queue(self):
+        tag_id = Readers.inventory(reader_id='0')['response'][0]
+        Readers.write_tags(reader_id='0', data={tag_id: 'кэш'})
+        # очередь COM-порта занята медленной командой: данные из кэша возвращаются, не дожидаясь её
+        busy = Readers.scheduler.submit(Readers['0'].port_number, time.sleep, 0.5)
+        start = time.perf_counter()
+        response = self.run_async(self.readers.read_tags(reader_id='0', data=[tag_id], timeout=2))
+        self.assertLess(time.perf_counter() - start, 0.25)
+        self.assertEqual(response['response'][tag_id].rstrip('\0'), 'кэш')
+        busy.result()
+
+    def test_many_clients(self):
+        async def scenario():
+            return await asyncio.gather(*(self.readers.inventory_all() for _ in range(200)))
+        results = self.run_async(scenario())
+        self.assertTrue(all(result == results[0] for result in results))
+        self.assertEqual(sorted(results[0]['response']), ['0', '1', '2'])
+
+    def test_timeout(self):
+        self.lib.latency = {'inventory_ex': 0.2}
+        response = self.run_async(self.readers.inventory(reader_id='0', timeout=0.01))
+        self.assertEqual(response, dict(error=Errors.OperationTimeout.to_dict()))
+
+    def test_manage(self):
+        response = self.run_async(self.readers.add_reader(data={'reader_id': '5', 'bus_addr': 5, 'port_number': 5,
+                                                                'state': True}))
+        self.assertEqual(response, {'response': 0})
+        self.assertTrue(self.run_async(self.readers.get_reader(reader_id='5'))['response']['5']['state'])
+
+
+if __name__ == '__main__':
+    unittest.main()
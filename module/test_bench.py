@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import unittest
+
+from bench import logic_bench, http_load
+from bench.stats import percentile, summarize, compare, save_baseline, load_baseline
+from logic import Readers
+
+
+class TestStats(unittest.TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_summarize(self):
+        result = summarize([0.001] * 9 + [0.1], elapsed=0.5, errors=1)
+        self.assertEqual((result['ops'], result['errors'], result['ops_per_sec']), (10, 1, 20.0))
+        self.assertAlmostEqual(result['p50'], 1.0)
+        self.assertAlmostEqual(result['p99'], 100.0)
+
+    def test_compare(self):
+        base = {'a': {'ops_per_sec': 100.0, 'p99': 10.0}, 'b': {'ops_per_sec': 100.0, 'p99': 0.01}}
+        results = {'a': {'ops_per_sec': 70.0, 'p99': 13.0}, 'b': {'ops_per_sec': 95.0, 'p99': 0.05},
+                   'c': {'ops_per_sec': 1.0, 'p99': 1.0}}
+        regressions = compare(results, base, tolerance=0.2)
+        self.assertEqual(len(regressions), 2)  # ops/s и p99 замера a; рост p99 замера b в пределах погрешности
+        self.assertTrue(all(regression.startswith('a:') for regression in regressions))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'baseline.json')
+            save_baseline(path, base, {'iterations': 10})
+            self.assertEqual(load_baseline(path), base)
+
+
+class TestLogicBench(unittest.TestCase):
+    def test_run(self):
+        results = logic_bench.run(readers=(2,), tags=(3,), latency=(0.0,), iterations=4, warmup=1)
+        self.assertEqual(len(results), len(logic_bench.SCENARIOS))
+        for name, result in results.items():
+            self.assertEqual((result['ops'], result['errors']), (4, 0), name)
+        self.assertIsNone(Readers._readers_cache)  # состояние Readers восстановлено
+
+
+class TestHttpLoad(unittest.TestCase):
+    def test_parse_mix(self):
+        self.assertEqual(dict(http_load.parse_mix('inventory=4,read,clear=0.5')),
+                         {'inventory': 4.0, 'read': 1.0, 'clear': 0.5})
+        with self.assertRaises(ValueError):
+            http_load.parse_mix('inventory=1,unknown=1')
+
+    def test_run_load(self):
+        mix = http_load.parse_mix('readers=1,inventory=1,read=1,write=1,clear=1')
+        with http_load.LocalServer(readers=2, tags=3, latency=0.0) as server:
+            results = http_load.run_load(server.url, mix, clients=4, requests=50)
+        self.assertEqual(list(results), list(mix) + ['total'])
+        self.assertEqual(results['total']['ops'], 50)
+        self.assertEqual(sum(results[name]['ops'] for name in mix), 50)
+        self.assertEqual(results['total']['error_rate'], 0.0)
+        self.assertEqual(results['total']['statuses'], {'200': 50})
+        self.assertIsNone(Readers._readers_cache)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import time
+import unittest
+
+from cache import TagCache, ENTRY_OVERHEAD
+
+
+class TestTagCache(unittest.TestCase):
+    def test_get_put(self):
+        cache = TagCache(ttl=10)
+        self.assertIsNone(cache.get('1', 'a'))
+        cache.put('1', 'a', 'data')
+        self.assertEqual(cache.get('1', 'a'), 'data')
+        self.assertIsNone(cache.get('2', 'a'))
+        self.assertIsNone(cache.get('1', 'a', max_age=0))
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+    def test_ttl(self):
+        cache = TagCache(ttl=0.05)
+        cache.put('1', 'a', 'data')
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('1', 'a', max_age=0.01))
+        self.assertEqual(cache.get('1', 'a'), 'data')
+        self.assertEqual(cache.get('1', 'a', max_age=3600), 'data')
+        time.sleep(0.04)
+        self.assertIsNone(cache.get('1', 'a', max_age=3600))  # допустимый возраст не превышает ttl
+        self.assertEqual(cache.stats()['entries'], 0)
+
+        cache.put('1', 'a', 'data')
+        time.sleep(0.06)
+        cache.put('1', 'b', 'data')  # устаревшие записи удаляются и без обращения к ним
+        self.assertEqual(cache.stats()['entries'], 1)
+
+    def test_disabled(self):
+        cache = TagCache(ttl=0)
+        cache.put('1', 'a', 'data')
+        self.assertIsNone(cache.get('1', 'a'))
+
+    def test_lru(self):
+        size = ENTRY_OVERHEAD + 2 + 4
+        cache = TagCache(ttl=10, max_bytes=size * 2)
+        cache.put('1', 'a', 'aaaa')
+        cache.put('1', 'b', 'bbbb')
+        cache.get('1', 'a')
+        cache.put('1', 'c', 'cccc')  # вытесняется давно не использованная метка b
+        self.assertIsNone(cache.get('1', 'b'))
+        self.assertEqual(cache.get('1', 'a'), 'aaaa')
+        self.assertEqual(cache.get('1', 'c'), 'cccc')
+        self.assertEqual(cache.stats()['size'], size * 2)
+
+    def test_invalidate(self):
+        cache = TagCache(ttl=10)
+        for reader_id in ('1', '2'):
+            for tag_id in ('a', 'b'):
+                cache.put(reader_id, tag_id, 'data')
+        cache.invalidate('1', 'a')
+        self.assertIsNone(cache.get('1', 'a'))
+        cache.invalidate('1')
+        self.assertIsNone(cache.get('1', 'b'))
+        self.assertEqual(cache.stats()['entries'], 2)
+        cache.put('1', 'a', 'data')
+        cache.invalidate(tag_id='a')  # данные метки, полученные через все ридеры
+        self.assertEqual((cache.get('1', 'a'), cache.get('2', 'a'), cache.get('2', 'b')), (None, None, 'data'))
+        cache.invalidate()
+        self.assertEqual(cache.stats(), {'entries': 0, 'size': 0, 'hits': 1, 'misses': 4})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import unittest
+
+from events import EventBus
+
+
+class TestEventBus(unittest.TestCase):
+    def setUp(self):
+        self.bus = EventBus(capacity=3)
+
+    def test_cursor(self):
+        self.assertEqual(self.bus.get(), ([], 0))
+        self.assertEqual(self.bus.publish({'event': 'a'}), 1)
+        self.bus.publish({'event': 'b'})
+        events, cursor = self.bus.get(0)
+        self.assertEqual(events, [{'event': 'a', 'id': 1}, {'event': 'b', 'id': 2}])
+        self.assertEqual(cursor, 2)
+        self.assertEqual(self.bus.get(1), ([{'event': 'b', 'id': 2}], 2))
+        self.assertEqual(self.bus.get(cursor), ([], 2))
+
+    def test_overflow(self):
+        for i in range(5):
+            self.bus.publish({'event': i})
+        # вытесненные события пропускаются
+        self.assertEqual([event['event'] for event in self.bus.get(0)[0]], [2, 3, 4])
+        self.assertEqual([event['event'] for event in self.bus.get(3)[0]], [3, 4])
+        # курсор из прошлого запуска
+        self.assertEqual([event['event'] for event in self.bus.get(42)[0]], [2, 3, 4])
+
+    def test_wait(self):
+        threading.Timer(0.05, self.bus.publish, ({'event': 'a'},)).start()
+        start = time.perf_counter()
+        events, cursor = self.bus.get(0, timeout=2.0)
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual((events, cursor), ([{'event': 'a', 'id': 1}], 1))
+
+    def test_timeout(self):
+        start = time.perf_counter()
+        self.assertEqual(self.bus.get(0, timeout=0.05), ([], 0))
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from hooks import Hooks, SpanExporter
+
+
+class TestHooks(unittest.TestCase):
+    def setUp(self):
+        self.hooks = Hooks()
+        self.started = []
+        self.finished = []
+        self.hooks.add(before=self.started.append, after=self.finished.append)
+
+    def test_nesting(self):
+        self.assertTrue(self.hooks.enabled)
+        outer = self.hooks.start('logic', 'read_tags', '1')
+        result = self.hooks.call('library', 'read_tag', '1', 'E004', lambda r: r, lambda: -4031)
+        self.hooks.finish(outer, 0)
+        self.assertEqual(result, -4031)
+        self.assertIsNone(self.hooks.current())
+        inner, outer = self.finished
+        self.assertEqual([span.operation for span in self.started], ['read_tags', 'read_tag'])
+        self.assertIs(inner.parent, outer)
+        self.assertEqual((inner.trace_id, inner.tag_id, inner.r_code), (outer.span_id, 'E004', -4031))
+        self.assertGreaterEqual(outer.duration, inner.duration)
+        self.assertEqual(inner.to_dict()['parent_id'], outer.span_id)
+
+    def test_call_arguments(self):
+        # параметры функции передаются отдельно от параметров операции: reader_id не конфликтует
+        result = self.hooks.call('logic', 'get_reader', '1', None, lambda r: 0, lambda *args, **kwargs: (args, kwargs),
+                                 ('a',), {'reader_id': '2'})
+        self.assertEqual(result, (('a',), {'reader_id': '2'}))
+        self.assertEqual(self.finished[0].reader_id, '1')
+
+    def test_attach(self):
+        outer = self.hooks.start('logic', 'inventory_all')
+
+        def work():
+            with self.hooks.attach(outer):
+                self.hooks.call('library', 'inventory', '1', None, lambda r: 0, lambda: ())
+
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+        self.hooks.finish(outer, 0)
+        self.assertIs(self.finished[0].parent, outer)
+
+    def test_error(self):
+        def fail():
+            raise ValueError('ошибка')
+
+        with self.assertRaises(ValueError):
+            self.hooks.call('reader', 'read_tag', '1', 'E004', lambda r: 0, fail)
+        self.assertIsInstance(self.finished[0].error, ValueError)
+        self.assertIsNone(self.hooks.current())
+
+    def test_remove(self):
+        self.hooks.remove(before=self.started.append, after=self.finished.append)
+        self.assertFalse(self.hooks.enabled)
+
+    def test_hook_error(self):
+        self.hooks.add(after=lambda span: 1 / 0)
+        with self.assertLogs(level='ERROR'):
+            self.hooks.call('logic', 'inventory', '1', None, lambda r: 0, lambda: None)
+        self.assertEqual(len(self.finished), 1)
+
+
+class TestSpanExporter(unittest.TestCase):
+    def test_export(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'trace.jsonl')
+            hooks = Hooks()
+            exporter = SpanExporter(path)
+            hooks.add(after=exporter)
+            span = hooks.start('http', 'GET /readers/<reader_id>/tags/', '1')
+            hooks.call('library', 'read_tag', '1', b'E004', lambda r: 0, lambda: b'')
+            hooks.finish(span, 200)
+            exporter.close()
+            with open(path, encoding='utf-8') as file:
+                records = [json.loads(line) for line in file]
+        self.assertEqual([(record['layer'], record['r_code']) for record in records], [('library', 0), ('http', 200)])
+        self.assertEqual(records[0]['parent_id'], records[1]['span_id'])
+        self.assertEqual(records[0]['tag_id'], "b'E004'")
+
+
+if __name__ == '__main__':
+    unittest.main()
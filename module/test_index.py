@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from index import ReaderIndex
+from reader import Reader
+
+
+class TestReaderIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = ReaderIndex()
+        self.readers = {str(i): Reader(i, i % 2) for i in range(4)}
+        self.index.reset(self.readers)
+
+    def test_ports(self):
+        self.assertEqual({port: sorted(ids) for port, ids in self.index.ports().items()},
+                         {0: ['0', '2'], 1: ['1', '3']})
+        self.assertEqual(self.index.at_address(1, 3), ('3',))
+        self.assertEqual(self.index.at_address(0, 3), ())
+
+    def test_reader_changes(self):
+        reader = self.readers['3']
+        reader.port_number = 0
+        reader.bus_addr = 2
+        self.assertEqual(sorted(self.index.on_port(0)), ['0', '2', '3'])
+        self.assertEqual(sorted(self.index.at_address(0, 2)), ['2', '3'])
+        self.assertEqual(self.index.at_address(1, 3), ())
+        self.assertFalse(self.index.any_connected())
+        reader.connected = True  # как после успешного подключения
+        self.assertEqual(self.index.connected(), ('3',))
+        reader.connected = False
+        self.assertFalse(self.index.any_connected())
+
+    def test_rename_remove(self):
+        reader = self.readers['1']
+        reader.connected = True
+        self.index.add('5', reader)
+        self.assertEqual(self.index.connected(), ('5',))
+        self.assertEqual(sorted(self.index.on_port(1)), ['3', '5'])
+        self.index.remove('5', reader)
+        self.assertIsNone(reader.observer)
+        self.assertEqual(self.index.on_port(1), ('3',))
+        self.assertFalse(self.index.any_connected())
+        reader.port_number = 0  # удалённый ридер на индексы не влияет
+        self.assertEqual(sorted(self.index.on_port(0)), ['0', '2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import io
+import json
+import logging
+import unittest
+
+import logs
+from logs import CallArgs, JsonFormatter, RepeatFilter, TextFormatter
+
+
+def make_record(created=0.0, **extra):
+    record = logging.LogRecord('logic', logging.WARNING, __file__, 1, '[%s(%s)] %s',
+                               ('write_tags', CallArgs(('1',), {'tag_id': 'a'}), 'ошибка'), None)
+    record.created = created
+    record.__dict__.update(extra)
+    return record
+
+
+class TestRepeatFilter(unittest.TestCase):
+    def test_repeats(self):
+        repeat_filter = RepeatFilter(interval=10)
+        error = dict(reader_id='1', func_name='write_tags', error_code=-4031)
+        self.assertTrue(repeat_filter.filter(make_record(0, **error)))
+        self.assertFalse(repeat_filter.filter(make_record(1, **error)))
+        self.assertFalse(repeat_filter.filter(make_record(2, **error)))
+        self.assertTrue(repeat_filter.filter(make_record(1, **dict(error, reader_id='2'))))
+        self.assertTrue(repeat_filter.filter(make_record(3)))  # не ошибка
+        record = make_record(11, **error)
+        self.assertTrue(repeat_filter.filter(record))
+        self.assertEqual(record.repeated, 2)
+        self.assertFalse(repeat_filter.filter(make_record(12, **error)))
+        self.assertEqual(repeat_filter.drain(), [(('1', 'write_tags', -4031), 1)])
+
+    def test_disabled(self):
+        repeat_filter = RepeatFilter(interval=0)
+        for _ in range(3):
+            self.assertTrue(repeat_filter.filter(make_record(0, error_code=1)))
+
+
+class TestFormatters(unittest.TestCase):
+    def test_lazy_args(self):
+        class Arg:
+            formatted = 0
+
+            def __repr__(self):
+                Arg.formatted += 1
+                return 'arg'
+
+        args = CallArgs((Arg(),), {'data': Arg()})
+        self.assertEqual(Arg.formatted, 0)
+        self.assertEqual(str(args), 'arg, data=arg')
+        self.assertEqual(Arg.formatted, 2)
+
+    def test_text(self):
+        record = make_record(repeated=5)
+        self.assertEqual(TextFormatter('%(message)s').format(record),
+                         "[write_tags('1', tag_id='a')] ошибка [повторов пропущено: 5]")
+
+    def test_json(self):
+        result = json.loads(JsonFormatter().format(make_record(reader_id='1', error_code=-4031)))
+        self.assertEqual(result['message'], "[write_tags('1', tag_id='a')] ошибка")
+        self.assertEqual((result['reader_id'], result['error_code'], result['level']), ('1', -4031, 'WARNING'))
+        self.assertNotIn('repeated', result)
+
+
+class TestSetupLogging(unittest.TestCase):
+    def setUp(self):
+        self.root = logging.getLogger()
+        self.prev = self.root.handlers[:], self.root.level
+        logs.shutdown_logging()
+        self.root.handlers = []
+
+    def tearDown(self):
+        logs.shutdown_logging()
+        self.root.handlers, level = self.prev
+        self.root.setLevel(level)
+
+    def test_queue(self):
+        stream = io.StringIO()
+        self.assertTrue(logs.setup_logging(json_format=True, handlers=[logging.StreamHandler(stream)]))
+        self.assertFalse(logs.setup_logging())  # уже настроено
+        for _ in range(100):
+            logging.warning('ошибка %d', 1, extra={'reader_id': '1', 'func_name': 'inventory', 'error_code': 1})
+        logging.warning('готово')
+        logs.shutdown_logging()  # ожидающие записи выводятся, пропущенные повторы подсчитываются
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual([line['message'] for line in lines[:2]], ['ошибка 1', 'готово'])
+        self.assertIn('повторов пропущено: 99', lines[2]['message'])
+
+    def test_overflow(self):
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        logs.setup_logging(handlers=[handler], queue_size=1)
+        handler.acquire()  # фоновый поток не может вывести запись
+        try:
+            for i in range(10):
+                logging.warning('запись %d', i)  # не блокируется
+        finally:
+            handler.release()
+        logs.shutdown_logging()
+        self.assertIn('записей лога отброшено из-за переполнения очереди', stream.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from metrics import Histogram, Metrics
+
+
+class TestHistogram(unittest.TestCase):
+    def test_observe(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(), [(0.1, 2), (1.0, 3), ('+Inf', 4)])
+        self.assertEqual((histogram.count, histogram.sum), (4, 2.65))
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+        self.metrics.observe_call('1', 'write_tags_batch', 0.02, (-4031, -4031))
+        self.metrics.observe_call('1', 'write_tags_batch', 0.2)
+        self.metrics.observe_tags('1', 3)
+        self.metrics.observe_queue_wait(2, 0.001)
+        self.metrics.observe_request('/readers/<reader_id>/', 'GET', 404, 0.003)
+
+    def test_snapshot(self):
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot['calls']['1']['write_tags_batch']['count'], 2)
+        self.assertEqual(snapshot['errors'], {'1': {'write_tags_batch': {-4031: 2}}})
+        self.assertEqual(snapshot['inventory_tags']['1']['buckets']['5'], 1)
+        self.assertEqual(snapshot['queue_wait']['2']['count'], 1)
+        self.assertEqual(snapshot['responses'], {'/readers/<reader_id>/': {'GET': {404: 1}}})
+        self.metrics.reset()
+        self.assertEqual(self.metrics.snapshot()['calls'], {})
+
+    def test_render(self):
+        lines = self.metrics.render().splitlines()
+        self.assertIn('# TYPE rfid_reader_call_duration_seconds histogram', lines)
+        self.assertIn('rfid_reader_call_duration_seconds_bucket{reader="1",operation="write_tags_batch",le="0.025"} 1',
+                      lines)
+        self.assertIn('rfid_reader_call_duration_seconds_count{reader="1",operation="write_tags_batch"} 2', lines)
+        self.assertIn('rfid_reader_errors_total{reader="1",operation="write_tags_batch",code="-4031"} 2', lines)
+        self.assertIn('rfid_port_queue_wait_seconds_count{port="2"} 1', lines)
+        self.assertIn('rfid_http_requests_total{route="/readers/<reader_id>/",method="GET",status="404"} 1', lines)
+
+    def test_label_escaping(self):
+        metrics = Metrics()
+        metrics.observe_tags('a"b\\', 0)
+        self.assertIn('rfid_inventory_tags_count{reader="a\\"b\\\\"} 1', metrics.render().splitlines())
+
+
+if __name__ == '__main__':
+    unittest.main()
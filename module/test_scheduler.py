@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import unittest
+
+from scheduler import PortScheduler
+
+
+class TestPortScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = PortScheduler()
+        self.lock = threading.Lock()
+        self.active = {}  # количество одновременно выполняемых команд по портам
+        self.max_active = {}
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def command(self, port_number, delay=0.02):
+        with self.lock:
+            self.active[port_number] = self.active.get(port_number, 0) + 1
+            self.max_active[port_number] = max(self.max_active.get(port_number, 0), self.active[port_number])
+        time.sleep(delay)
+        with self.lock:
+            self.active[port_number] -= 1
+        return port_number
+
+    def test_serial_per_port_parallel_across_ports(self):
+        start = time.perf_counter()
+        futures = [self.scheduler.submit(port_number, self.command, port_number)
+                   for port_number in (1, 2, 3, 4) for _ in range(3)]
+        self.assertEqual([future.result() for future in futures], [1, 1, 1, 2, 2, 2, 3, 3, 3, 4, 4, 4])
+        elapsed = time.perf_counter() - start
+        self.assertEqual(self.max_active, {1: 1, 2: 1, 3: 1, 4: 1})
+        self.assertLess(elapsed, 12 * 0.02)  # порты обслуживаются параллельно
+
+    def test_reentrant_call(self):
+        result = self.scheduler.call(1, lambda: self.scheduler.call(1, lambda: 42))
+        self.assertEqual(result, 42)
+
+    def test_exception(self):
+        with self.assertRaises(ZeroDivisionError):
+            self.scheduler.call(1, lambda: 1 / 0)
+
+    def test_stats(self):
+        for _ in range(3):
+            self.scheduler.submit(5, self.command, 5)
+        stats = self.scheduler.stats()[5]
+        self.assertGreater(stats['queue_depth'] + stats['busy'], 0)
+        self.scheduler.call(5, lambda: None)
+        stats = self.scheduler.stats()[5]
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['tasks'], 4)
+        self.assertGreater(stats['wait_time_max'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+import http.client
+import json
+import os
+import threading
+import time
+import unittest
+
+from logic import Readers
+from serve import ThreadPoolWSGIServer
+from server import app
+from test_simulator import SimulatedReadersTestCase
+
+
+class TestThreadPoolWSGIServer(SimulatedReadersTestCase):
+    def setUp(self):
+        super().setUp()
+        self.server = ThreadPoolWSGIServer('127.0.0.1', 0, app, threads=4, keep_alive=5)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        if not self.server.stopping:
+            self.server.stop(timeout=1)
+        self.thread.join()
+        super().tearDown()
+
+    def connect(self) -> http.client.HTTPConnection:
+        return http.client.HTTPConnection('127.0.0.1', self.server.server_port, timeout=5)
+
+    def get(self, connection: http.client.HTTPConnection, path: str) -> tuple:
+        connection.request('GET', path)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read().decode('utf-8'))
+
+    def test_keep_alive(self):
+        connection = self.connect()
+        self.assertEqual(self.get(connection, '/readers/0/tags/inventory/')[0], 200)
+        sock = connection.sock
+        for _ in range(5):
+            status, body = self.get(connection, '/readers/0/tags/inventory/')
+            self.assertEqual((status, len(body['response'])), (200, 3))
+        self.assertIs(connection.sock, sock)  # все запросы выполнены в одном соединении
+
+        # простаивающее соединение закрывается сразу, не дожидаясь окончания keep-alive
+        start = time.perf_counter()
+        self.assertTrue(self.server.stop(timeout=2))
+        self.assertLess(time.perf_counter() - start, 1)
+        connection.close()
+
+    def test_concurrent_requests(self):
+        results = []
+
+        def client():
+            connection = self.connect()
+            results.extend(self.get(connection, '/readers/{}/tags/inventory/'.format(i % 3))[0] for i in range(10))
+            connection.close()
+
+        clients = [threading.Thread(target=client) for _ in range(8)]  # клиентов больше, чем потоков сервера
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        self.assertEqual(results, [200] * 80)
+
+    def test_stop_waits_for_requests(self):
+        self.lib.latency = {'inventory_ex': 0.3}
+        results = []
+        connection = self.connect()
+        thread = threading.Thread(target=lambda: results.append(self.get(connection, '/readers/0/tags/inventory/')))
+        thread.start()
+        time.sleep(0.1)
+        self.assertTrue(self.server.stop(timeout=2))
+        thread.join()
+        self.assertEqual(results[0][0], 200)
+        connection.close()
+
+
+class TestReadersShutdown(SimulatedReadersTestCase):
+    def test_shutdown(self):
+        Readers.flush()
+        Readers.save_delay, save_delay = 60, Readers.save_delay
+        try:
+            Readers.update_reader(reader_id='3', data={'bus_addr': 7})
+            Readers.start_scan(reader_id='0', data={'interval': 0.01})
+            cursor = Readers.events.cursor
+            Readers.shutdown()
+        finally:
+            Readers.save_delay = save_delay
+
+        self.assertEqual(Readers.index.connected(), ())
+        self.assertFalse(Readers.get_scan(reader_id='0')['response']['active'])
+        with open(Readers.file) as file:
+            self.assertIn('bus_addr = 7', file.read())
+        events = Readers.events.get(cursor)[0]
+        self.assertEqual(sorted(event['reader_id'] for event in events if event['event'] == 'disconnected'),
+                         ['0', '1', '2'])
+        # после завершения работы ридеры можно подключить снова
+        self.assertEqual(Readers.update_reader(reader_id='0', data={'state': True}), dict(response=0))
+        self.assertTrue(os.path.exists(Readers.file))
+
+
+if __name__ == '__main__':
+    unittest.main()
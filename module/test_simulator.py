@@ -0,0 +1,509 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import reader
+from hooks import HOOKS
+from logic import Readers, Errors
+from metrics import METRICS
+from reader import Reader, TAG_SIZE
+from simulator import SimulatedLib
+
+
+class TestSimulator(unittest.TestCase):
+    def setUp(self):
+        self.lib = SimulatedLib(tags_per_reader=3, seed=1)
+        self.prev_lib = reader.RFID_LIB
+        reader.set_backend(self.lib)
+        self.reader = Reader(1, 1)
+
+    def tearDown(self):
+        reader.set_backend(self.prev_lib)
+
+    def test_lazy_handle(self):
+        self.assertNotIn('new_reader', self.lib.calls)  # указатель на ридер создаётся только при коннекте
+        self.reader.connect()
+        self.assertEqual(self.lib.calls['connect_reader'], 1)
+
+    def test_connect(self):
+        self.assertEqual(self.reader.connect(), 0)
+        self.assertTrue(self.reader.connected)
+
+    def test_inventory(self):
+        self.lib.set_tags(1, 1, ('E0040000000000A1', 'E0040000000000A2'))
+        self.assertNotEqual(self.reader.inventory(), 0)  # ридер не подключён
+        self.reader.connect()
+        self.assertEqual(self.reader.inventory(), ('E0040000000000A1', 'E0040000000000A2'))
+
+    def test_inventory_capacity(self):
+        tag_ids = tuple('E004{:012X}'.format(i) for i in range(150))
+        self.lib.set_tags(1, 1, tag_ids)
+        self.reader.connect()
+        self.assertEqual(self.reader.inventory(), tag_ids[:100])  # ограничено размером таблицы ридера
+        self.assertEqual(self.lib.calls['inventory_ex'], 1)  # без повторной инвентаризации
+
+        big_reader = Reader(1, 1, table_size=200)
+        big_reader.connect()
+        self.assertEqual(big_reader.inventory(), tag_ids)
+
+    def test_write_read_tag(self):
+        self.reader.connect()
+        tag_id = self.reader.inventory()[0]
+        self.assertEqual(self.reader.write_tag(tag_id, 'данные'), 0)
+        tag_data = self.reader.read_tag(tag_id)
+        self.assertEqual(len(tag_data), TAG_SIZE)
+        self.assertEqual(tag_data.rstrip('\0'), 'данные')
+
+    def test_write_read_tag_bytes(self):
+        self.reader.connect()
+        tag_id = self.reader.inventory()[0]
+        self.assertEqual(self.reader.write_tag_bytes(tag_id, memoryview(b'\x01\x02\x03')), 0)
+        self.assertEqual(self.reader.read_tag_bytes(tag_id), b'\x01\x02\x03'.ljust(TAG_SIZE, b'\0'))
+        view = self.reader.read_tag_bytes(tag_id.encode('ascii'), copy=False)
+        self.assertIsInstance(view, memoryview)
+        self.assertEqual(bytes(view[:3]), b'\x01\x02\x03')
+
+    def test_read_tags_batch(self):
+        self.lib.set_tags(1, 1, {'E0040000000000A1': 'раз', 'E0040000000000A2': 'два'})
+        self.reader.connect()
+        results = self.reader.read_tags_batch(('E0040000000000A2', 'E0040000000000FF', 'E0040000000000A1'))
+        self.assertEqual(results[0].rstrip('\0'), 'два')
+        self.assertIsInstance(results[1], int)  # метки нет в поле ридера
+        self.assertEqual(results[2].rstrip('\0'), 'раз')
+        self.assertEqual(self.lib.calls['read_tags_batch'], 1)
+        self.assertNotIn('read_tag', self.lib.calls)
+
+    def test_write_tags_batch(self):
+        self.lib.set_tags(1, 1, ('E0040000000000A1', 'E0040000000000A2'))
+        self.reader.connect()
+        r_codes = self.reader.write_tags_batch({'E0040000000000A1': 'раз', 'E0040000000000FF': 'нет',
+                                                'E0040000000000A2': 'два'})
+        self.assertEqual(r_codes[0], 0)
+        self.assertNotEqual(r_codes[1], 0)  # метки нет в поле ридера
+        self.assertEqual(r_codes[2], 0)
+        self.assertEqual(self.reader.read_tag('E0040000000000A2').rstrip('\0'), 'два')
+        self.assertEqual(self.lib.calls['write_tags_batch'], 1)
+
+    def test_legacy_library(self):
+        # RFID.dll, собранная без функций из reader.OPTIONAL_FUNCTIONS
+        for name in reader.OPTIONAL_FUNCTIONS:
+            setattr(self.lib, name, None)
+        self.lib.set_tags(1, 1, ('E0040000000000A1', 'E0040000000000A2'))
+        legacy_reader = Reader(1, 1, table_size=50)
+        self.assertEqual(legacy_reader.connect(), 0)
+        self.assertEqual(legacy_reader.inventory(), ('E0040000000000A1', 'E0040000000000A2'))
+        r_codes = legacy_reader.write_tags_batch({'E0040000000000A1': 'раз', 'E0040000000000FF': 'нет'})
+        self.assertEqual(r_codes[0], 0)
+        self.assertNotEqual(r_codes[1], 0)
+        results = legacy_reader.read_tags_batch(('E0040000000000A1', 'E0040000000000FF'))
+        self.assertEqual(results[0].rstrip('\0'), 'раз')
+        self.assertIsInstance(results[1], int)
+        self.assertEqual((self.lib.calls['inventory'], self.lib.calls['read_tag'], self.lib.calls['write_tag']),
+                         (1, 2, 2))
+
+        # без set_table_size таблица в библиотеке — DEF_TABLE_SIZE меток, даже если table_size меньше
+        tag_ids = tuple('E0040000000001{:02X}'.format(i) for i in range(30))
+        self.lib.set_tags(2, 1, tag_ids)
+        small_reader = Reader(2, 1, table_size=20)
+        self.assertEqual(small_reader.connect(), 0)
+        self.assertEqual(small_reader.inventory(), tag_ids[:20])
+
+    def test_injected_error(self):
+        self.reader.connect()
+        self.lib.inject_error('read_tag', -4032)
+        self.assertEqual(self.reader.read_tag(self.reader.inventory()[0]), -4032)
+        self.assertEqual(self.reader.get_error_text(-4032), 'FEISC: (-4032) busy timeout')
+
+    def test_error_text(self):
+        native_calls = []
+        get_error_text = self.lib.get_error_text
+        # обращение к библиотеке выполняется под блокировкой ридера
+        self.lib.get_error_text = lambda *args: native_calls.append(self.reader.lock._is_owned()) or \
+            get_error_text(*args)
+        self.assertEqual(self.reader.get_error_text(-4032), 'FEISC: (-4032) busy timeout')
+        self.assertEqual(native_calls, [])  # код есть в error_codes.py
+        self.assertEqual(self.reader.get_error_text(-9999), 'Невалидный код ошибки: -9999')
+        self.assertEqual(self.reader.get_error_text(-9999), 'Невалидный код ошибки: -9999')
+        self.assertEqual(native_calls, [True])  # ответ библиотеки запоминается
+        reader.ERROR_TEXTS.pop(-9999)
+
+    def test_error_rate(self):
+        self.lib.error_rate = 1.0
+        self.lib.error_pool = (-4031,)
+        self.assertEqual(self.reader.connect(), -4031)
+        self.assertFalse(self.reader.connected)
+
+
+class SimulatedReadersTestCase(unittest.TestCase):
+    """Основа для тестов объекта Readers из logic.py с программной имитацией RFID.dll"""
+    def setUp(self):
+        self.lib = SimulatedLib(tags_per_reader=3, seed=1)
+        self.prev_lib = reader.RFID_LIB
+        reader.set_backend(self.lib)
+        self.prev_file = Readers.file
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        Readers.file = os.path.join(self.tmp_dir.name, 'reader_settings.ini')
+        Readers._readers = {}
+        Readers.tag_cache.invalidate()
+        for i in range(4):
+            Readers.add_reader(data={'reader_id': str(i), 'bus_addr': i, 'port_number': i % 2})
+            Readers.update_reader(reader_id=str(i), data={'state': i != 3})
+
+    def tearDown(self):
+        for reader_id in Readers:
+            Readers[reader_id].disconnect()
+        Readers.flush()
+        Readers._readers = None
+        Readers.file = self.prev_file
+        self.tmp_dir.cleanup()
+        reader.set_backend(self.prev_lib)
+
+
+class TestReadersSimulator(SimulatedReadersTestCase):
+    def test_inventory_all(self):
+        result = Readers.inventory_all()
+        self.assertEqual(result['error'], {})
+        self.assertEqual(sorted(result['response']), ['0', '1', '2'])  # ридер 3 отключён
+        for reader_id in result['response']:
+            self.assertEqual(result['response'][reader_id], Readers.inventory(reader_id=reader_id)['response'])
+
+    def test_read_tags_many(self):
+        result = Readers.read_tags_many(data={'0': [], '3': [], '9': []})
+        self.assertEqual(len(result['response']['0']), 3)
+        self.assertEqual(result['error']['3'], Errors.ReaderIsDisconnected.to_dict())
+        self.assertEqual(result['error']['9'], Errors.ReaderNotExists.to_dict())
+        self.assertEqual(Readers.read_tags_many(data=None), dict(error=Errors.InvalidRequest.to_dict()))
+
+    def test_scan(self):
+        events = []
+        Readers.subscribe(events.append)
+        self.lib.set_tags(0, 0, ('E0040000000000A1', 'E0040000000000A2'))
+        self.assertEqual(Readers.start_scan(reader_id='3', data={}),
+                         dict(error=Errors.ReaderIsDisconnected.to_dict()))
+        self.assertEqual(Readers.start_scan(reader_id='0', data={'interval': 0}),
+                         dict(error=Errors.InvalidScanParameters.to_dict()))
+        self.assertEqual(Readers.start_scan(reader_id='0', data={'interval': 0.01, 'missed_rounds': 2}),
+                         {'response': 0})
+        self.wait_for(lambda: len(events) == 2)
+        self.lib.set_tags(0, 0, ('E0040000000000A2', 'E0040000000000A3'))
+        self.wait_for(lambda: len(events) == 4)
+        scan = Readers.get_scan(reader_id='0')['response']
+        self.assertTrue(scan['active'])
+        self.assertEqual(sorted(scan['tags']), ['E0040000000000A2', 'E0040000000000A3'])
+        Readers.stop_scan(reader_id='0')
+        Readers.unsubscribe(events.append)
+        self.assertFalse(Readers.get_scan(reader_id='0')['response']['active'])
+        self.assertEqual([(event['event'], event['tag_id']) for event in events], [
+            ('arrived', 'E0040000000000A1'), ('arrived', 'E0040000000000A2'),
+            ('arrived', 'E0040000000000A3'), ('departed', 'E0040000000000A1'),
+        ])
+
+    def test_tag_cache(self):
+        tag_id = Readers.inventory(reader_id='0')['response'][0]
+        Readers.write_tags(reader_id='0', data={tag_id: 'cached'})
+        calls = self.lib.calls.get('read_tags_batch', 0)
+        response = Readers.read_tags(reader_id='0', data=[tag_id])['response']
+        self.assertEqual(response[tag_id].rstrip('\0'), 'cached')
+        self.assertEqual(len(response[tag_id]), TAG_SIZE)
+        self.assertEqual(self.lib.calls.get('read_tags_batch', 0), calls)  # данные из кэша
+        self.lib.set_tags(0, 0, {tag_id: 'changed'})  # изменение метки в обход модуля
+        self.assertEqual(Readers.read_tags(reader_id='0', data=[tag_id])['response'][tag_id].rstrip('\0'), 'cached')
+        response = Readers.read_tags(reader_id='0', data=[tag_id], max_age=0)['response']
+        self.assertEqual(response[tag_id].rstrip('\0'), 'changed')
+        self.assertEqual(self.lib.calls['read_tags_batch'], calls + 1)
+        Readers.write_tags(reader_id='0', data=[tag_id], clear=True)
+        self.assertEqual(Readers.read_tags(reader_id='0', data=[tag_id])['response'][tag_id], '\0' * TAG_SIZE)
+        self.assertEqual(self.lib.calls['read_tags_batch'], calls + 1)
+
+    def test_tag_cache_other_reader(self):
+        # метка переместилась от ридера 0 к ридеру 1 и перезаписана через него
+        self.lib.set_tags(0, 0, {'E0040000000000A1': 'old'})
+        self.assertEqual(Readers.read_tags(reader_id='0', data=['E0040000000000A1'])['response']['E0040000000000A1']
+                         .rstrip('\0'), 'old')
+        self.lib.set_tags(1, 1, {'E0040000000000A1': 'old'})
+        Readers.write_tags(reader_id='1', data={'E0040000000000A1': 'new'})
+        self.lib.set_tags(0, 0, {'E0040000000000A1': 'new'})  # метка вернулась к ридеру 0
+        calls = self.lib.calls['read_tags_batch']
+        self.assertEqual(Readers.read_tags(reader_id='0', data=['E0040000000000A1'])['response']['E0040000000000A1']
+                         .rstrip('\0'), 'new')
+        self.assertEqual(self.lib.calls['read_tags_batch'], calls + 1)
+
+    def test_tag_cache_updated_on_port(self):
+        # кэш обновляется в потоке COM-порта, пока порт занят: чтение, выполненное до записи, не может
+        # сохранить в кэш свои данные после записанных
+        threads = []
+        put = Readers.tag_cache.put
+        Readers.tag_cache.put = lambda *args: threads.append(threading.current_thread().name) or put(*args)
+        try:
+            tag_id = Readers.inventory(reader_id='0')['response'][0]
+            Readers.read_tags(reader_id='0', data=[tag_id], max_age=0)
+            Readers.write_tags(reader_id='0', data={tag_id: 'new'})
+        finally:
+            del Readers.tag_cache.put
+        self.assertEqual(threads, ['port-0', 'port-0'])
+        self.assertEqual(Readers.read_tags(reader_id='0', data=[tag_id])['response'][tag_id].rstrip('\0'), 'new')
+
+    def test_coalescing(self):
+        self.lib.latency = {'inventory_ex': 0.05}
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(Readers.inventory(reader_id='0')))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.lib.calls['inventory_ex'], 1)
+        self.assertEqual(len(set(result['response'] for result in results)), 1)
+        self.assertGreaterEqual(Readers.flights.stats()['inventory']['shared'], 3)
+
+    def test_save_settings(self):
+        Readers.flush()
+        with open(Readers.file) as file:
+            saved = file.read()
+        save_delay, Readers.save_delay = Readers.save_delay, 10.0
+        try:
+            Readers.add_reader(data={'reader_id': '4', 'bus_addr': 4, 'port_number': 0})
+            Readers.update_reader(reader_id='4', data={'bus_addr': 5})
+            with open(Readers.file) as file:
+                self.assertEqual(file.read(), saved)  # запись отложена
+            Readers.flush()
+        finally:
+            Readers.save_delay = save_delay
+        self.assertEqual(Readers._read_settings()['4'].bus_addr, 5)
+        self.assertEqual(os.listdir(self.tmp_dir.name), ['reader_settings.ini'])  # временный файл заменил исходный
+
+    def test_save_settings_failure(self):
+        Readers.flush()
+        with open(Readers.file) as file:
+            saved = file.read()
+
+        def mkstemp(*args, **kwargs):
+            raise OSError('нет места на диске')
+
+        save_delay, Readers.save_delay = Readers.save_delay, 10.0
+        tempfile.mkstemp, original = mkstemp, tempfile.mkstemp
+        try:
+            self.assertEqual(Readers.update_reader(reader_id='3', data={'bus_addr': 5}), dict(response=0))
+            with self.assertLogs(level='ERROR'):
+                Readers.flush()
+        finally:
+            tempfile.mkstemp = original
+        try:
+            with open(Readers.file) as file:
+                self.assertEqual(file.read(), saved)
+            Readers.flush()  # неудавшаяся запись повторяется
+        finally:
+            Readers.save_delay = save_delay
+        self.assertEqual(Readers._read_settings()['3'].bus_addr, 5)
+
+    def test_update_readers(self):
+        for reader_id in ('0', '1', '2'):
+            Readers.update_reader(reader_id=reader_id, data={'state': False})
+        # ошибка в одном из ридеров: не применяется ни одно изменение
+        result = Readers.update_readers(data={'0': {'bus_addr': 10}, '1': {'bus_addr': 256}, '2': {'reader_id': '3'}})
+        self.assertEqual(result, {'response': {}, 'error': {'1': Errors.InvalidReaderBusAddr.to_dict(),
+                                                            '2': Errors.ReaderExists.to_dict()}})
+        self.assertEqual(Readers['0'].bus_addr, 0)
+
+        writes = []
+        write_settings = Readers._write_settings
+        Readers._write_settings = lambda file: writes.append(file) or write_settings(file)
+        try:
+            result = Readers.update_readers(data={
+                '0': {'reader_id': '1', 'state': True},  # ридеры 0 и 1 меняются идентификаторами
+                '1': {'reader_id': '0', 'bus_addr': 10},
+                '2': {'state': True},
+                '3': {'port_number': 1, 'state': True},
+            })
+            Readers.flush()
+        finally:
+            del Readers._write_settings
+        self.assertEqual(result, {'response': {'0': 0, '1': 0, '2': 0, '3': 0}, 'error': {}})
+        self.assertEqual(len(writes), 1)
+        self.assertEqual((Readers['0'].bus_addr, Readers['0'].connected), (10, False))
+        self.assertEqual((Readers['1'].bus_addr, Readers['1'].connected), (0, True))
+        self.assertEqual((Readers['3'].port_number, Readers['3'].connected), (1, True))
+        self.assertEqual(Readers._read_settings()['0'].bus_addr, 10)
+
+    def test_validation(self):
+        data = {'reader_id': '4', 'bus_addr': 4, 'port_number': 0}
+        self.assertIsNone(Readers.add_reader.validate(data=data))
+        self.assertEqual(Readers.add_reader.validate(data=dict(data, bus_addr=256)),
+                         dict(error=Errors.InvalidReaderBusAddr.to_dict()))
+        self.assertEqual(Readers.add_reader.validate(data=[]), dict(error=Errors.InvalidParameterSet.to_dict()))
+        # проверки, требующие обращения к ридерам, выполняются только при вызове метода
+        self.assertIsNone(Readers.add_reader.validate(data=dict(data, reader_id='0')))
+        self.assertEqual(Readers.add_reader(data=dict(data, reader_id='0')), dict(error=Errors.ReaderExists.to_dict()))
+        self.assertEqual(Readers.update_reader(reader_id='9', data={}), dict(error=Errors.InvalidParameterSet.to_dict()))
+        self.assertEqual(Readers.update_reader(reader_id='9', data={'state': True}),
+                         dict(error=Errors.ReaderNotExists.to_dict()))
+
+        self.assertIsNone(Readers.read_tags.validate(reader_id='0', data=None))
+        for tag_ids in ([1], ['E004' * 8], [''], 'E004'):
+            self.assertEqual(Readers.read_tags(reader_id='0', data=tag_ids), dict(error=Errors.InvalidTagId.to_dict()))
+        for max_age in (-1, float('nan'), float('inf')):
+            self.assertEqual(Readers.read_tags(reader_id='0', data=[], max_age=max_age),
+                             dict(error=Errors.InvalidRequest.to_dict()))
+        for tags in ({'E004': 'x' * (TAG_SIZE + 1)}, {'E004': 1}, {'E004': '\u20ac'}, ['E004'], ('E004',)):
+            self.assertEqual(Readers.write_tags(reader_id='0', data=tags), dict(error=Errors.InvalidTagData.to_dict()))
+        self.assertIsNone(Readers.write_tags.validate(reader_id='0', data=['E004'], clear=True))
+        # при очистке значения не проверяются (так очищает метку gui.py)
+        self.assertIsNone(Readers.write_tags.validate(reader_id='0', data={'E004': 0}, clear=True))
+        self.assertEqual(Readers.read_tags(reader_id='0', data=['E004\u20ac']), dict(error=Errors.InvalidTagId.to_dict()))
+
+    def test_reader_removed_after_check(self):
+        # ридер удалён другим потоком между проверкой декоратора и обращением к нему: ошибка, а не KeyError
+        readers_type = type(Readers)
+        for method, kwargs in (('update_reader', {'data': {'state': False}}), ('delete_reader', {}),
+                               ('inventory', {}), ('read_tags', {'data': []}), ('write_tags', {'data': {}}),
+                               ('start_scan', {'data': {}})):
+            unchecked = getattr(readers_type, method).__wrapped__
+            self.assertEqual(unchecked(Readers, reader_id='9', **kwargs), dict(error=Errors.ReaderNotExists.to_dict()),
+                             method)
+        del Readers['9']
+
+    def test_index(self):
+        self.assertEqual(sorted(Readers.index.connected()), ['0', '1', '2'])
+        Readers.update_reader(reader_id='0', data={'state': False})
+        self.assertEqual(sorted(Readers.index.connected()), ['1', '2'])
+        self.assertEqual(Readers.update_readers(data={}), dict(error=Errors.OneOrMoreReadersAreConnected.to_dict()))
+        for reader_id in ('1', '2'):
+            Readers.update_reader(reader_id=reader_id, data={'state': False})
+        self.assertFalse(Readers.index.any_connected())
+
+        # адрес (номер порта, адрес шины) не может использоваться двумя ридерами
+        self.assertEqual(Readers.add_reader(data={'reader_id': '4', 'bus_addr': 1, 'port_number': 1}),
+                         dict(error=Errors.ReaderAddressIsUsed.to_dict()))
+        self.assertEqual(Readers.update_reader(reader_id='0', data={'port_number': 1, 'bus_addr': 3}),
+                         dict(error=Errors.ReaderAddressIsUsed.to_dict()))
+        self.assertEqual(Readers.update_reader(reader_id='0', data={'bus_addr': 0}), {'response': 0})
+        result = Readers.update_readers(data={'0': {'bus_addr': 5}, '2': {'bus_addr': 5}})
+        self.assertEqual(result['error'], {'0': Errors.ReaderAddressIsUsed.to_dict(),
+                                           '2': Errors.ReaderAddressIsUsed.to_dict()})
+        # ридеры 1 и 3 меняются адресами, ридеры 0 и 2 — идентификаторами
+        result = Readers.update_readers(data={'1': {'bus_addr': 3}, '3': {'bus_addr': 1},
+                                              '0': {'reader_id': '2'}, '2': {'reader_id': '0'}})
+        self.assertEqual(result, {'response': {'0': 0, '1': 0, '2': 0, '3': 0}, 'error': {}})
+        self.assertEqual(Readers.index.at_address(1, 3), ('1',))
+        self.assertEqual(Readers.index.at_address(0, 0), ('2',))
+        self.assertEqual(sorted(Readers.index.on_port(0)), ['0', '2'])
+        self.assertEqual(Readers.get_ports()['response']['1']['readers'], ['1', '3'])
+
+    def test_metrics(self):
+        METRICS.reset()
+        Readers.inventory(reader_id='0')
+        self.lib.inject_error('read_tags_batch', -4031)
+        Readers.read_tags(reader_id='0', data=['E0040000000000A1'], max_age=0)
+        METRICS.enabled = False
+        try:
+            Readers.inventory(reader_id='1')
+        finally:
+            METRICS.enabled = True
+        snapshot = Readers.get_metrics()['response']
+        self.assertEqual(sorted(snapshot['calls']), ['0'])  # метки ридера — идентификатор в реестре
+        self.assertEqual(snapshot['calls']['0']['inventory']['count'], 1)
+        self.assertEqual(snapshot['inventory_tags']['0']['count'], 1)
+        self.assertEqual(snapshot['errors'], {'0': {'read_tags_batch': {-4031: 1}}})
+        self.assertGreaterEqual(snapshot['queue_wait']['0']['count'], 2)
+
+    def test_hooks(self):
+        spans = []
+        HOOKS.add(after=spans.append)
+        try:
+            tag_id = Readers.inventory(reader_id='0')['response'][0]
+            Readers.write_tags(reader_id='0', data={tag_id: 'data'})
+        finally:
+            HOOKS.remove(after=spans.append)
+        write = [span for span in spans if span.trace_id == spans[-1].trace_id]
+        self.assertEqual([(span.layer, span.operation) for span in write], [
+            ('logic', 'check_for_errors'),
+            ('library', 'write_tags_batch'),  # выполняется в потоке COM-порта
+            ('reader', 'write_tags_batch'),
+            ('logic', 'write_tags'),
+        ])
+        self.assertEqual({span.reader_id for span in write}, {'0'})
+        self.assertIs(write[1].parent, write[2])
+
+    def test_state_events(self):
+        cursor = Readers.events.cursor
+        Readers.update_reader(reader_id='3', data={'state': True})
+        Readers.update_reader(reader_id='3', data={'state': False})
+        response = Readers.get_events(cursor=cursor)['response']
+        self.assertEqual([(event['event'], event['reader_id']) for event in response['events']],
+                         [('connected', '3'), ('disconnected', '3')])
+        self.assertEqual(response['cursor'], cursor + 2)
+
+    @staticmethod
+    def wait_for(condition, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+    def test_concurrent_registry(self):
+        errors = []
+
+        def mutate(n):
+            try:
+                for i in range(20):
+                    reader_id = 'r{}_{}'.format(n, i)
+                    Readers.add_reader(data={'reader_id': reader_id, 'bus_addr': i, 'port_number': 10 + n})
+                    Readers.update_reader(reader_id=reader_id, data={'reader_id': reader_id + 'x'})
+                    Readers.delete_reader(reader_id=reader_id + 'x')
+            except Exception as e:
+                errors.append(e)
+
+        def read():
+            try:
+                for _ in range(200):
+                    Readers.get_readers()
+                    Readers.inventory(reader_id='0')
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=mutate, args=(n,)) for n in range(4)] + \
+                  [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(Readers.get_readers()['response']), ['0', '1', '2', '3'])
+
+
+class TestServerSimulator(SimulatedReadersTestCase):
+    def setUp(self):
+        super().setUp()
+        import server
+        self.client = server.app.test_client()
+
+    def test_tag_errors(self):
+        self.lib.set_tags(0, 0, ('E0040000000000A1',))
+        # метки E0040000000000FF нет в поле ридера: ошибка возвращается вместе с данными остальных меток
+        for method, data in (('GET', ['E0040000000000A1', 'E0040000000000FF']),
+                             ('PUT', {'E0040000000000A1': 'a', 'E0040000000000FF': 'b'}),
+                             ('DELETE', ['E0040000000000A1', 'E0040000000000FF'])):
+            response = self.client.open('/readers/0/tags/', method=method, json=data)
+            self.assertEqual(response.status_code, 200, method)
+            body = response.get_json()
+            self.assertIn('E0040000000000A1', body['response'])
+            self.assertIn('E0040000000000FF', body['error'])
+
+    def test_write_list(self):
+        # список меток допустим только для очистки
+        response = self.client.put('/readers/0/tags/', json=['E0040000000000A1'])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json(), dict(error=Errors.InvalidTagData.to_dict()))
+        self.assertEqual(self.client.delete('/readers/0/tags/', json=['E0040000000000A1']).status_code, 200)
+
+    def test_max_age(self):
+        for max_age in ('nan', 'inf', '-1'):
+            response = self.client.get('/readers/0/tags/?max_age=' + max_age, json=[])
+            self.assertEqual(response.status_code, 400, max_age)
+        self.assertEqual(self.client.get('/readers/0/tags/?max_age=1.5', json=[]).status_code, 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
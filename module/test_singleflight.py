@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import unittest
+
+from singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.flights = SingleFlight()
+        self.calls = 0
+
+    def slow(self, value, delay=0.05):
+        self.calls += 1
+        time.sleep(delay)
+        return value
+
+    def run_concurrently(self, count, key, func, *args):
+        results = [None] * count
+
+        def target(i):
+            try:
+                results[i] = self.flights.do(key, func, *args)
+            except Exception as e:
+                results[i] = e
+
+        threads = [threading.Thread(target=target, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_shared(self):
+        self.assertEqual(self.run_concurrently(5, ('op', 1), self.slow, 'a'), ['a'] * 5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flights.stats(), {'op': {'calls': 5, 'shared': 4}})
+
+    def test_sequential(self):
+        self.flights.do(('op', 1), self.slow, 'a', 0)
+        self.flights.do(('op', 1), self.slow, 'a', 0)
+        self.assertEqual(self.calls, 2)
+
+    def test_different_keys(self):
+        threads = [threading.Thread(target=self.flights.do, args=(('op', i), self.slow, i)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 3)
+
+    def test_land(self):
+        key = ('op', 1)
+        landed = threading.Event()
+        release = threading.Event()
+
+        def leader():
+            self.calls += 1
+            self.flights.land(key)  # результат получен, но ещё не передан
+            landed.set()
+            release.wait(1)
+            return 'old'
+
+        thread = threading.Thread(target=self.flights.do, args=(key, leader))
+        thread.start()
+        landed.wait(1)
+        second = threading.Thread(target=self.flights.do, args=(key, self.slow, 'new', 0.1))
+        second.start()
+        time.sleep(0.02)
+        release.set()  # первый вызов завершается, пока второй ещё выполняется
+        thread.join()
+        # вызов, пришедший после land, выполнен заново; завершение первого вызова не снимает ключ второго
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(self.run_concurrently(1, key, self.slow, 'other', 0)[0], 'new')
+        second.join()
+        self.assertEqual(self.flights.stats(), {'op': {'calls': 3, 'shared': 1}})
+
+    def test_exception(self):
+        def fail():
+            time.sleep(0.05)
+            raise ValueError('fail')
+
+        results = self.run_concurrently(3, ('op',), fail)
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        self.assertEqual(self.flights.stats(), {'op': {'calls': 3, 'shared': 2}})
+
+
+if __name__ == '__main__':
+    unittest.main()